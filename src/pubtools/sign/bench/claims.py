@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import json
+import platform
+import time
+from typing import Any, Dict
+
+import click
+
+from ..signers.msgsigner import MsgSigner
+
+DEFAULT_SIZE = 100000
+
+
+def run_claims_benchmark(size: int = DEFAULT_SIZE, repeat: int = 3) -> Dict[str, Any]:
+    """Compare per-digest and batch creation of manifest claims.
+
+    Best duration of the repeats is reported for both builders and outputs are
+    checked to be identical.
+
+    :param size: Number of digests
+    :type size: int
+    :param repeat: Number of repeats of each measurement
+    :type repeat: int
+    :return: Dict[str, Any]
+    """
+    digests = [f"sha256:{x:064x}" for x in range(size)]
+    references = [f"registry.example.com/bench/repo:tag-{x}" for x in range(size)]
+
+    def _per_digest():
+        return [
+            MsgSigner.create_manifest_claim_message("bench-key", digest, reference)
+            for digest, reference in zip(digests, references)
+        ]
+
+    def _batch():
+        return MsgSigner.create_manifest_claim_messages("bench-key", digests, references)
+
+    results = {}
+    outputs = {}
+    for name, builder in (("per_digest", _per_digest), ("batch", _batch)):
+        durations = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            outputs[name] = builder()
+            durations.append(time.perf_counter() - started)
+        duration = min(durations)
+        results[name] = {"duration": duration, "throughput": size / duration}
+    return {
+        "benchmark": "claims",
+        "python": platform.python_version(),
+        "size": size,
+        "identical": outputs["per_digest"] == outputs["batch"],
+        "speedup": results["per_digest"]["duration"] / results["batch"]["duration"],
+        "results": results,
+    }
+
+
+@click.command()
+@click.option("--size", type=int, default=DEFAULT_SIZE, show_default=True, help="Number of digests")
+@click.option(
+    "--repeat", type=int, default=3, show_default=True, help="Number of repeats of each builder"
+)
+@click.option("--output", type=click.Path(dir_okay=False), help="Write report to this file")
+def claims(size, repeat, output):
+    """Measure speed of manifest claims creation."""
+    report = run_claims_benchmark(size, repeat=repeat)
+    report_json = json.dumps(report, indent=2)
+    if output:
+        with open(output, "w") as f:
+            f.write(report_json)
+    click.echo(report_json)
+    if not report["identical"]:
+        raise click.ClickException("Batch claims differ from per-digest claims")
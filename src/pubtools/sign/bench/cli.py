@@ -0,0 +1,20 @@
+import click
+
+from .claims import claims
+from .compare import compare
+from .memory import memory
+
+
+@click.group()
+def bench():
+    """Run pubtools-sign benchmarks."""
+
+
+bench.add_command(claims)
+bench.add_command(memory)
+bench.add_command(compare)
+
+
+def bench_main():
+    """Entry point method for benchmarks."""
+    bench()
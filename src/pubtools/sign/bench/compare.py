@@ -0,0 +1,206 @@
+from __future__ import annotations
+
+import dataclasses
+import json
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import click
+
+DEFAULT_TOLERANCE = 0.1
+KINDS = ("throughput", "latency", "memory", "rss")
+
+
+@dataclasses.dataclass
+class MetricComparison:
+    """Comparison of one benchmark metric between baseline and current run."""
+
+    name: str
+    kind: str
+    baseline: float
+    current: float
+    change: float
+    regression: bool
+
+    def to_dict(self):
+        """Return dict representation of MetricComparison."""
+        return dataclasses.asdict(self)
+
+
+def metric_kind(name: str) -> Optional[str]:
+    """Return kind of the metric or None when the metric is not compared.
+
+    Throughput is better when higher, latency and memory metrics are better when lower.
+    Memory traced by tracemalloc is deterministic, unlike resident set size (rss) which
+    depends on the allocator and the rest of the process.
+
+    :param name: metric name, last part of the path in the report
+    :type name: str
+    :return: Optional[str]
+    """
+    if name == "throughput":
+        return "throughput"
+    if name == "duration" or "latency" in name:
+        return "latency"
+    if "rss" in name:
+        return "rss"
+    if name.endswith("bytes") or name == "bytes_per_message":
+        return "memory"
+    return None
+
+
+def _metrics(results: Dict[str, Any], prefix: str = "") -> Iterator[Tuple[str, str, float]]:
+    for key, value in results.items():
+        path = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            yield from _metrics(value, path)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            kind = metric_kind(key)
+            if kind:
+                yield path, kind, value
+
+
+def _failed_results(results: Dict[str, Any], prefix: str = "") -> Iterator[str]:
+    for key, value in results.items():
+        path = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            if value.get("status", "ok") != "ok":
+                yield f"{path}: {value.get('error_message') or value['status']}"
+            yield from _failed_results(value, path)
+
+
+def compare_reports(
+    baseline: Dict[str, Any],
+    current: Dict[str, Any],
+    tolerances: Dict[str, float],
+    kinds: Tuple[str, ...] = KINDS,
+) -> List[MetricComparison]:
+    """Compare metrics of two benchmark reports.
+
+    Raises ValueError when the reports come from different Python versions, whose
+    allocations differ, a benchmark of the current report didn't finish with ok
+    status or a compared baseline metric is missing in the current report.
+
+    :param baseline: Baseline benchmark report
+    :type baseline: Dict[str, Any]
+    :param current: Benchmark report of the new run
+    :type current: Dict[str, Any]
+    :param tolerances: Allowed relative change (0.1 = 10%) for each metric kind
+    :type tolerances: Dict[str, float]
+    :param kinds: Kinds of compared metrics
+    :type kinds: Tuple[str, ...]
+    :return: List[MetricComparison]
+    """
+    if baseline.get("benchmark") != current.get("benchmark"):
+        raise ValueError(
+            f"Cannot compare {current.get('benchmark')} report with "
+            f"{baseline.get('benchmark')} baseline"
+        )
+    if baseline.get("python") != current.get("python"):
+        raise ValueError(
+            f"Cannot compare report of Python {current.get('python')} with baseline of "
+            f"Python {baseline.get('python')}"
+        )
+    failed = list(_failed_results(current["results"]))
+    if failed:
+        raise ValueError("Benchmark failed: " + ", ".join(failed))
+    current_metrics = {path: value for path, _, value in _metrics(current["results"])}
+    baseline_metrics = [metric for metric in _metrics(baseline["results"]) if metric[1] in kinds]
+    missing = [path for path, _, _ in baseline_metrics if path not in current_metrics]
+    if missing:
+        raise ValueError("Metric(s) missing in the current report: " + ", ".join(missing))
+    comparisons = []
+    for path, kind, baseline_value in baseline_metrics:
+        current_value = current_metrics[path]
+        if baseline_value:
+            change = (current_value - baseline_value) / baseline_value
+        else:
+            change = 0.0 if not current_value else float("inf")
+        if kind == "throughput":
+            regression = change < -tolerances[kind]
+        else:
+            regression = change > tolerances[kind]
+        comparisons.append(
+            MetricComparison(
+                name=path,
+                kind=kind,
+                baseline=baseline_value,
+                current=current_value,
+                change=change,
+                regression=regression,
+            )
+        )
+    return comparisons
+
+
+def _load_report(fname):
+    with open(fname) as f:
+        return json.load(f)
+
+
+@click.command()
+@click.argument("baseline", type=click.Path(exists=True, dir_okay=False))
+@click.argument("current", type=click.Path(exists=True, dir_okay=False))
+@click.option(
+    "--tolerance",
+    type=float,
+    default=DEFAULT_TOLERANCE,
+    show_default=True,
+    help="Allowed relative change of all metrics (0.1 = 10%)",
+)
+@click.option("--throughput-tolerance", type=float, help="Allowed relative throughput drop")
+@click.option("--latency-tolerance", type=float, help="Allowed relative duration/latency growth")
+@click.option("--memory-tolerance", type=float, help="Allowed relative memory growth")
+@click.option("--rss-tolerance", type=float, help="Allowed relative resident set size growth")
+@click.option(
+    "--kind",
+    "kinds",
+    type=click.Choice(KINDS),
+    multiple=True,
+    help="Compare only metrics of the kind, all metrics are compared when not set",
+)
+@click.option("--json", "as_json", is_flag=True, default=False, help="Print comparison as JSON")
+def compare(
+    baseline,
+    current,
+    tolerance,
+    throughput_tolerance,
+    latency_tolerance,
+    memory_tolerance,
+    rss_tolerance,
+    kinds,
+    as_json,
+):
+    """Compare benchmark report CURRENT against BASELINE report.
+
+    Fails when any compared metric regressed beyond tolerance, is missing in CURRENT
+    report or when a benchmark of CURRENT report failed.
+    """
+    overrides = {
+        "throughput": throughput_tolerance,
+        "latency": latency_tolerance,
+        "memory": memory_tolerance,
+        "rss": rss_tolerance,
+    }
+    tolerances = {kind: tolerance if overrides[kind] is None else overrides[kind] for kind in KINDS}
+    try:
+        comparisons = compare_reports(
+            _load_report(baseline), _load_report(current), tolerances, kinds=kinds or KINDS
+        )
+    except ValueError as ex:
+        raise click.ClickException(str(ex))
+
+    if as_json:
+        click.echo(json.dumps([comparison.to_dict() for comparison in comparisons], indent=2))
+    else:
+        for comparison in comparisons:
+            click.echo(
+                f"{'REGRESSION' if comparison.regression else 'ok':<10} "
+                f"{comparison.name:<50} {comparison.baseline:>16.2f} "
+                f"{comparison.current:>16.2f} {comparison.change:>+8.1%}"
+            )
+    regressions = [comparison for comparison in comparisons if comparison.regression]
+    if regressions:
+        raise click.ClickException(
+            f"{len(regressions)} metric(s) regressed beyond tolerance: "
+            + ", ".join(comparison.name for comparison in regressions)
+        )
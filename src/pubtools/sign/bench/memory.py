@@ -0,0 +1,221 @@
+from __future__ import annotations
+
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from typing import Any, Dict, Optional
+from unittest.mock import patch
+
+import click
+
+from ..operations import ContainerSignOperation
+from ..signers import msgsigner
+from ..signers.msgsigner import MsgSigner
+from .service import fake_signing_service
+
+try:
+    import resource
+except ImportError:  # pragma: no cover
+    resource = None
+
+
+DEFAULT_SIZES = (10000, 100000, 1000000)
+PHASES = ("operation", "messages", "in_flight", "results")
+# Highest traced memory allowed per signed digest in any phase of container signing.
+MEMORY_BUDGET_PER_MESSAGE = 8 * 1024
+
+
+def _max_rss():
+    if resource is None:  # pragma: no cover
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+class _PhaseRecorder:
+    def __init__(self):
+        self.phases = {}
+        self.base = 0
+
+    def start(self):
+        tracemalloc.start()
+        self.base = tracemalloc.get_traced_memory()[0]
+        self._reset_peak()
+
+    def stop(self):
+        tracemalloc.stop()
+
+    def _reset_peak(self):
+        # tracemalloc.reset_peak is available since python 3.9, before that
+        # the peak is cumulative since the start of tracing
+        if hasattr(tracemalloc, "reset_peak"):
+            tracemalloc.reset_peak()
+
+    def mark(self, phase):
+        current, peak = tracemalloc.get_traced_memory()
+        self.phases[phase] = {
+            "current_bytes": current - self.base,
+            "peak_bytes": peak - self.base,
+            "max_rss_bytes": _max_rss(),
+        }
+        self._reset_peak()
+
+
+def _recording(client_class, recorder, before_init=None, after_run=None):
+    # proton resolves event.container from the direct base class name of the
+    # container, so the clients are wrapped instead of subclassed
+    def _create_client(*args, **kwargs):
+        if before_init:
+            recorder.mark(before_init)
+        client = client_class(*args, **kwargs)
+        if after_run:
+            run = client.run
+
+            def _run():
+                ret = run()
+                recorder.mark(after_run)
+                return ret
+
+            client.run = _run
+        return client
+
+    return _create_client
+
+
+def _bench_signer(broker_url, send_to, listen_to, timeout):
+    signer = MsgSigner()
+    signer.messaging_brokers = [broker_url]
+    signer.messaging_cert = ""
+    signer.messaging_ca_cert = ""
+    signer.topic_send_to = send_to
+    signer.topic_listen_to = listen_to
+    signer.creator = "pubtools-sign-bench"
+    signer.environment = "bench"
+    signer.service = "pubtools-sign-bench"
+    signer.timeout = timeout
+    signer.retries = 1
+    signer.message_id_key = "request_id"
+    signer.log_level = "INFO"
+    return signer
+
+
+def container_sign_memory(
+    size: int, broker_url: str, send_to: str, listen_to: str, timeout: Optional[int] = None
+) -> Dict[str, Any]:
+    """Measure memory footprint of MsgSigner.container_sign.
+
+    Memory is traced with tracemalloc relatively to the state before the
+    operation is built. Recorded phases are:
+
+    * operation - ContainerSignOperation with all digests and references is built
+    * messages - signing messages are built, just before they are sent
+    * in_flight - messages are sent and all replies received
+    * results - container_sign returned SigningResults
+
+    :param size: Number of digests to sign
+    :type size: int
+    :param broker_url: Url of the broker with running (fake) signer
+    :type broker_url: str
+    :param send_to: Address where signing requests are sent
+    :type send_to: str
+    :param listen_to: Address where replies are received
+    :type listen_to: str
+    :param timeout: Receive timeout, derived from size when not set
+    :type timeout: int
+    :return: Dict[str, Any]
+    """
+    signer = _bench_signer(broker_url, send_to, listen_to, timeout or max(60, size // 100))
+    recorder = _PhaseRecorder()
+    recorder.start()
+    started = time.monotonic()
+    try:
+        operation = ContainerSignOperation(
+            digests=[f"sha256:{x:064x}" for x in range(size)],
+            references=[f"registry.example.com/bench/repo:tag-{x}" for x in range(size)],
+            signing_key="bench-key",
+            task_id="bench",
+        )
+        recorder.mark("operation")
+        with patch.object(
+            msgsigner,
+            "SendClient",
+            _recording(msgsigner.SendClient, recorder, before_init="messages"),
+        ), patch.object(
+            msgsigner,
+            "RecvClient",
+            _recording(msgsigner.RecvClient, recorder, after_run="in_flight"),
+        ):
+            signing_results = signer.container_sign(operation)
+        recorder.mark("results")
+    finally:
+        recorder.stop()
+    duration = time.monotonic() - started
+
+    peak = max(phase["peak_bytes"] for phase in recorder.phases.values())
+    return {
+        "status": signing_results.signer_results.status,
+        "error_message": signing_results.signer_results.error_message,
+        "duration": duration,
+        "throughput": size / duration,
+        "peak_bytes": peak,
+        "bytes_per_message": peak / size,
+        "max_rss_bytes": _max_rss(),
+        "phases": recorder.phases,
+    }
+
+
+def run_memory_benchmark(sizes, budget_per_message=MEMORY_BUDGET_PER_MESSAGE):
+    """Run container signing memory benchmark for all sizes against fake signer.
+
+    :param sizes: Numbers of digests to sign
+    :type sizes: List[int]
+    :param budget_per_message: Allowed peak memory per digest in bytes
+    :type budget_per_message: int
+    :return: Dict[str, Any]
+    """
+    results = {}
+    with fake_signing_service() as (broker_url, send_to, listen_to):
+        for size in sizes:
+            results[str(size)] = container_sign_memory(size, broker_url, send_to, listen_to)
+    return {
+        "benchmark": "memory",
+        "python": platform.python_version(),
+        "budget_per_message": budget_per_message,
+        "within_budget": all(
+            result["status"] == "ok" and result["bytes_per_message"] <= budget_per_message
+            for result in results.values()
+        ),
+        "results": results,
+    }
+
+
+@click.command()
+@click.option(
+    "--size",
+    type=int,
+    multiple=True,
+    default=DEFAULT_SIZES,
+    show_default=True,
+    help="Number of digests to sign, can be used multiple times",
+)
+@click.option(
+    "--budget",
+    type=int,
+    default=MEMORY_BUDGET_PER_MESSAGE,
+    show_default=True,
+    help="Allowed peak memory per digest in bytes",
+)
+@click.option("--output", type=click.Path(dir_okay=False), help="Write report to this file")
+def memory(size, budget, output):
+    """Measure memory footprint of container signing against fake signer."""
+    report = run_memory_benchmark(size, budget_per_message=budget)
+    report_json = json.dumps(report, indent=2)
+    if output:
+        with open(output, "w") as f:
+            f.write(report_json)
+    click.echo(report_json)
+    if not report["within_budget"]:
+        raise click.ClickException("Memory budget per message exceeded")
@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+import contextlib
+import socket
+import threading
+from multiprocessing import Process
+from typing import Iterator, Optional, Tuple
+
+from proton.reactor import Container
+
+from ..testing.broker import Broker
+from ..testing.fake_signer import ChaosConfig, FakeSigner
+
+SEND_TO = "topic://Topic.bench.sign"
+LISTEN_TO = "topic://Topic.bench.signed"
+
+
+def _free_port():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(("localhost", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+def _serve(url, chaos):
+    threading.Thread(target=Container(Broker(url)).run, args=(), daemon=True).start()
+    Container(FakeSigner([url], SEND_TO, LISTEN_TO, chaos=chaos)).run()
+
+
+@contextlib.contextmanager
+def fake_signing_service(chaos: Optional[ChaosConfig] = None) -> Iterator[Tuple[str, str, str]]:
+    """Run in-memory broker with fake signer in a separate process.
+
+    The service runs outside of the benchmarked process so it doesn't
+    affect memory and CPU measurements of the client.
+
+    :param chaos: Fake signer behaviour
+    :type chaos: ChaosConfig
+    :return: Tuple of broker url, address for signing requests and address for replies
+    """
+    url = f"localhost:{_free_port()}"
+    service = Process(target=_serve, args=(url, chaos or ChaosConfig()))
+    service.start()
+    try:
+        yield url, SEND_TO, LISTEN_TO
+    finally:
+        service.terminate()
+        service.join()
@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+import logging
+import os
+from typing import Any, Callable, Optional
+
+from .state import StateFile
+
+LOG = logging.getLogger("pubtools.sign.cache")
+
+
+def cache_dir() -> str:
+    """Return directory of pubtools-sign cache in the user cache directory.
+
+    :return: str
+    """
+    root = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(root, "pubtools-sign")
+
+
+def cached(name: str, path: str, compute: Callable[[str], Any], extra: Optional[Any] = None):
+    """Return value computed from a file, cached until the file changes.
+
+    Values are cached in <cache dir>/<name>.json keyed by absolute path, mtime and
+    size of the file and optional extra key, so they have to be json serializable.
+    Cache which can't be read or written is ignored.
+
+    :param name: Name of the cache
+    :type name: str
+    :param path: Path to the file
+    :type path: str
+    :param compute: Function computing the value from the file path
+    :type compute: Callable[[str], Any]
+    :param extra: Additional json serializable key the value depends on
+    :type extra: Any
+    :return: Any
+    """
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    key = [stat.st_mtime_ns, stat.st_size, extra]
+    state = StateFile(os.path.join(cache_dir(), f"{name}.json"))
+    try:
+        entry = state.load().get(path)
+    except OSError as e:
+        LOG.debug(f"Cannot read {name} cache: {e}")
+        entry = None
+    if entry and entry["key"] == key:
+        return entry["value"]
+    value = compute(path)
+    try:
+        with state.update() as entries:
+            entries[path] = {"key": key, "value": value}
+    except OSError as e:
+        LOG.debug(f"Cannot write {name} cache: {e}")
+    return value
@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+import logging
+import time
+from typing import Callable, Dict, List, Optional
+
+import proton
+
+from ..models.msg import MsgError
+from ..state import StateFile
+
+LOG = logging.getLogger("pubtools.sign.clients.breaker")
+
+
+def broker_circuit(broker_urls: List[str]) -> str:
+    """Return name of the circuit of messaging brokers.
+
+    :param broker_urls: Broker urls, proton fails over between them
+    :type broker_urls: List[str]
+    :return: str
+    """
+    return "broker:" + ",".join(sorted(broker_urls))
+
+
+def topic_circuit(address: str) -> str:
+    """Return name of the circuit of a messaging topic or queue.
+
+    :param address: Topic or queue address
+    :type address: str
+    :return: str
+    """
+    return f"topic:{address}"
+
+
+def is_broker_error(error: MsgError) -> bool:
+    """Return True when the error was caused by the broker connection.
+
+    :param error: Messaging error
+    :type error: MsgError
+    :return: bool
+    """
+    return isinstance(error.source, (proton.Transport, proton.Connection))
+
+
+class CircuitBreaker:
+    """Circuit breaker with state shared by all signing processes on the host.
+
+    Circuit opens after threshold consecutive failed attempts. While it's open,
+    attempts fail fast. After reset_timeout one process is allowed to probe the
+    circuit (half-open), its success closes the circuit and its failure opens it
+    again.
+    """
+
+    def __init__(self, state: StateFile, threshold: int = 5, reset_timeout: float = 60):
+        """Circuit breaker initializer.
+
+        :param state: State file where the circuits are persisted
+        :type state: StateFile
+        :param threshold: Number of consecutive failures which opens the circuit
+        :type threshold: int
+        :param reset_timeout: Seconds before an open circuit is probed again
+        :type reset_timeout: float
+        """
+        self.state = state
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+
+    def blocked(self, circuits: List[str]) -> Optional[str]:
+        """Return open circuit which blocks the attempt, None when the attempt can run.
+
+        When the attempt is allowed as a probe of half-open circuits, no other process
+        is allowed to probe them until the attempt is recorded or reset_timeout passes.
+
+        :param circuits: Circuits used by the attempt
+        :type circuits: List[str]
+        :return: Optional[str]
+        """
+        now = time.time()
+        with self.state.update() as states:
+            for circuit in circuits:
+                state = states.get(circuit, {})
+                if "opened_at" not in state:
+                    continue
+                if now - max(state["opened_at"], state.get("probe_at", 0)) < self.reset_timeout:
+                    return circuit
+            for circuit in circuits:
+                if "opened_at" in states.get(circuit, {}):
+                    LOG.info(f"Probing half-open circuit {circuit}")
+                    states[circuit]["probe_at"] = now
+        return None
+
+    def record(self, results: Dict[str, bool]):
+        """Record results of an attempt.
+
+        :param results: Circuits used by the attempt mapped to True when they failed
+        :type results: Dict[str, bool]
+        """
+        now = time.time()
+        with self.state.update() as states:
+            for circuit, failed in results.items():
+                if not failed:
+                    if circuit in states:
+                        LOG.info(f"Closing circuit {circuit}")
+                    states.pop(circuit, None)
+                    continue
+                state = states.setdefault(circuit, {})
+                state["failures"] = state.get("failures", 0) + 1
+                if "opened_at" in state or state["failures"] >= self.threshold:
+                    LOG.warning(f"Opening circuit {circuit} after {state['failures']} failures")
+                    state["opened_at"] = now
+                    state.pop("probe_at", None)
+
+
+def run_attempt(
+    breaker: Optional[CircuitBreaker],
+    broker: str,
+    topics: List[str],
+    errors: List[MsgError],
+    attempt: Callable[[], None],
+) -> bool:
+    """Run messaging attempt guarded by the circuit breaker.
+
+    Connection errors are recorded as failures of the broker circuit, other errors
+    as failures of the topic circuits. Returns True when the attempt was blocked by
+    an open circuit.
+
+    :param breaker: Circuit breaker, attempt is run unguarded when None
+    :type breaker: CircuitBreaker
+    :param broker: Circuit of the brokers
+    :type broker: str
+    :param topics: Circuits of topics used by the attempt
+    :type topics: List[str]
+    :param errors: List of errors which occured during the process
+    :type errors: List[MsgError]
+    :param attempt: Function running the attempt
+    :type attempt: Callable[[], None]
+    :return: bool
+    """
+    if breaker is None:
+        attempt()
+        return False
+    circuit = breaker.blocked([broker] + topics)
+    if circuit:
+        errors.append(
+            MsgError(
+                name="CircuitOpen",
+                description=f"Circuit {circuit} is open after repeated failures",
+                source=None,
+            )
+        )
+        return True
+    errors_len = len(errors)
+    attempt()
+    failed = errors[errors_len:]
+    results = {broker: any(is_broker_error(error) for error in failed)}
+    if not results[broker]:
+        # topics can't be blamed when the broker wasn't reachable
+        results.update({topic: bool(failed) for topic in topics})
+    breaker.record(results)
+    return False
@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import logging
+import time
+from typing import Dict, List
+
+from ..state import StateFile
+
+LOG = logging.getLogger("pubtools.sign.clients.health")
+
+
+class BrokerHealth:
+    """Latency and health scores of messaging brokers persisted across runs.
+
+    Connect time and accept round trip time are tracked per broker url as
+    exponentially weighted averages. Brokers are ordered from the fastest and
+    brokers which failed recently are moved to the end of the list, so they are
+    used only for failover. With pinned set, the first configured broker is kept
+    first unless it failed recently and only the failover brokers are ordered.
+    """
+
+    def __init__(
+        self,
+        state: StateFile,
+        cooldown: float = 60,
+        smoothing: float = 0.3,
+        pinned: bool = False,
+    ):
+        """Broker health initializer.
+
+        :param state: State file where the scores are persisted
+        :type state: StateFile
+        :param cooldown: Seconds a broker is skipped after it failed
+        :type cooldown: float
+        :param smoothing: Weight of the latest run in the averaged latencies
+        :type smoothing: float
+        :param pinned: Keep the first configured broker first while it's healthy
+        :type pinned: bool
+        """
+        self.state = state
+        self.cooldown = cooldown
+        self.smoothing = smoothing
+        self.pinned = pinned
+        self._samples: Dict[str, Dict[str, List[float]]] = {}
+        self._failed: Dict[str, int] = {}
+        self._connected: Dict[str, bool] = {}
+
+    def order(self, urls: List[str]) -> List[str]:
+        """Return broker urls ordered by their health and latency.
+
+        Brokers without any score are tried first, so they get measured.
+
+        :param urls: Broker urls in configured order
+        :type urls: List[str]
+        :return: List[str]
+        """
+        now = time.time()
+        scores = self.state.load()
+
+        def key(url):
+            score = scores.get(url, {})
+            failed = now - score.get("failed_at", 0) < self.cooldown
+            return (failed, score.get("connect", 0) + score.get("rtt", 0))
+
+        if self.pinned and urls and not key(urls[0])[0]:
+            ordered = [urls[0]] + sorted(urls[1:], key=key)
+        else:
+            ordered = sorted(urls, key=key)
+        if ordered != list(urls):
+            LOG.debug(f"Brokers ordered by health: {ordered}")
+        return ordered
+
+    def record_latency(self, url: str, kind: str, seconds: float):
+        """Record latency sample of the broker.
+
+        :param url: Broker url
+        :type url: str
+        :param kind: connect or rtt
+        :type kind: str
+        :param seconds: Measured latency
+        :type seconds: float
+        """
+        self._samples.setdefault(url, {}).setdefault(kind, []).append(seconds)
+        if kind == "connect":
+            self._connected[url] = True
+
+    def record_failure(self, url: str):
+        """Record failure of the broker.
+
+        :param url: Broker url
+        :type url: str
+        """
+        LOG.warning(f"Broker {url} failed")
+        self._failed[url] = self._failed.get(url, 0) + 1
+
+    def save(self):
+        """Merge scores recorded since the last save to the state file."""
+        if not (self._samples or self._failed):
+            return
+        now = time.time()
+        with self.state.update() as scores:
+            for url, samples in self._samples.items():
+                score = scores.setdefault(url, {})
+                for kind, values in samples.items():
+                    average = sum(values) / len(values)
+                    if kind in score:
+                        average = (1 - self.smoothing) * score[kind] + self.smoothing * average
+                    score[kind] = average
+            for url in self._connected:
+                scores[url].pop("failures", None)
+                scores[url].pop("failed_at", None)
+            for url, failures in self._failed.items():
+                score = scores.setdefault(url, {})
+                score["failures"] = score.get("failures", 0) + failures
+                score["failed_at"] = now
+        self._samples = {}
+        self._failed = {}
+        self._connected = {}
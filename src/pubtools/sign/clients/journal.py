@@ -0,0 +1,221 @@
+from __future__ import annotations
+
+import dataclasses
+import json
+import logging
+import os
+import sqlite3
+import threading
+from typing import Dict, List, Optional
+
+from ..models.msg import MsgMessage, MsgReply
+from ..operations.base import SignOperation
+
+LOG = logging.getLogger("pubtools.sign.clients.journal")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS operation (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    kind TEXT NOT NULL,
+    data TEXT NOT NULL,
+    sent INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS requests (
+    request_id TEXT PRIMARY KEY,
+    position INTEGER NOT NULL,
+    address TEXT NOT NULL,
+    headers TEXT NOT NULL,
+    body TEXT NOT NULL,
+    reply_to TEXT,
+    correlation_id TEXT
+);
+CREATE TABLE IF NOT EXISTS replies (
+    request_id TEXT PRIMARY KEY,
+    body TEXT NOT NULL,
+    headers TEXT NOT NULL
+);
+"""
+
+
+_SQLITE_HEADER = b"SQLite format 3\x00"
+
+
+def _operation_data(operation: SignOperation) -> str:
+    return json.dumps(dataclasses.asdict(operation), sort_keys=True)
+
+
+def shard_journal(path: str, shard: int) -> str:
+    """Return path to the journal of the operation shard.
+
+    :param path: Path to the journal of the operation
+    :type path: str
+    :param shard: Index of the shard
+    :type shard: int
+    :return: str
+    """
+    return f"{path}.{shard}"
+
+
+def start_shards(path: str, shards: int):
+    """Record that the operation is split to shards with their own journals.
+
+    Shard layout is stored at the journal path, so the operation can be resumed
+    from it with the same shards.
+
+    :param path: Path to the journal of the operation
+    :type path: str
+    :param shards: Number of shards
+    :type shards: int
+    """
+    if os.path.exists(path):
+        raise ValueError(f"Journal {path} already contains an operation, resume it")
+    with open(path, "w") as f:
+        json.dump({"shards": shards}, f)
+
+
+def journal_shards(path: str) -> Optional[int]:
+    """Return number of shards recorded at the journal path.
+
+    :param path: Path to the journal of the operation
+    :type path: str
+    :return: Number of shards or None when the operation wasn't split to shards
+    """
+    with open(path, "rb") as f:
+        # journals of large operations are big, only the header is read to recognize them
+        header = f.read(len(_SQLITE_HEADER))
+        if not header or header == _SQLITE_HEADER:
+            return None
+        return json.loads(header + f.read())["shards"]
+
+
+class Journal:
+    """Write-ahead journal of sent signing requests and received replies.
+
+    Requests are recorded before they are sent and every reply is committed
+    before it's accepted on the broker, so the journal can be used to collect
+    only missing replies after the process was interrupted.
+    """
+
+    def __init__(self, path: str):
+        """Journal initializer.
+
+        :param path: Path to the journal (sqlite database) file
+        :type path: str
+        """
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(_SCHEMA)
+        # replies of pipelined chunks are recorded from several receiver threads
+        self._lock = threading.Lock()
+
+    def close(self):
+        """Close the journal."""
+        self.conn.close()
+
+    @property
+    def started(self) -> bool:
+        """Return True when an operation is recorded in the journal."""
+        return self.conn.execute("SELECT 1 FROM operation").fetchone() is not None
+
+    @property
+    def sent(self) -> bool:
+        """Return True when all recorded requests were sent."""
+        row = self.conn.execute("SELECT sent FROM operation").fetchone()
+        return bool(row and row[0])
+
+    def start(self, operation: SignOperation, messages: List[MsgMessage]):
+        """Record operation and its requests before they are sent.
+
+        :param operation: signing operation
+        :type operation: SignOperation
+        :param messages: signing requests in order of operation inputs
+        :type messages: List[MsgMessage]
+        """
+        if self.started:
+            raise ValueError(f"Journal {self.path} already contains an operation, resume it")
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO operation (id, kind, data) VALUES (1, ?, ?)",
+                (type(operation).__name__, _operation_data(operation)),
+            )
+            self.conn.executemany(
+                "INSERT INTO requests"
+                " (request_id, position, address, headers, body, reply_to, correlation_id)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    (
+                        message.body["request_id"],
+                        position,
+                        message.address,
+                        json.dumps(message.headers),
+                        json.dumps(message.body),
+                        message.reply_to,
+                        message.correlation_id,
+                    )
+                    for position, message in enumerate(messages)
+                ),
+            )
+
+    def check_operation(self, operation: SignOperation):
+        """Check the journal was recorded for the same operation.
+
+        :param operation: signing operation
+        :type operation: SignOperation
+        """
+        row = self.conn.execute("SELECT kind, data FROM operation").fetchone()
+        if not row:
+            raise ValueError(f"Journal {self.path} doesn't contain any operation")
+        if row != (type(operation).__name__, _operation_data(operation)):
+            raise ValueError(f"Journal {self.path} was recorded for a different operation")
+
+    def mark_sent(self):
+        """Record that all requests were sent."""
+        with self.conn:
+            self.conn.execute("UPDATE operation SET sent = 1")
+
+    def messages(self) -> List[MsgMessage]:
+        """Return recorded requests in order of operation inputs.
+
+        :return: List[MsgMessage]
+        """
+        return [
+            MsgMessage(
+                headers=json.loads(headers),
+                address=address,
+                body=json.loads(body),
+                reply_to=reply_to,
+                correlation_id=correlation_id,
+            )
+            for address, headers, body, reply_to, correlation_id in self.conn.execute(
+                "SELECT address, headers, body, reply_to, correlation_id FROM requests"
+                " ORDER BY position"
+            )
+        ]
+
+    def record_reply(self, request_id: str, reply: MsgReply):
+        """Record received reply.
+
+        :param request_id: id of the request the reply belongs to
+        :type request_id: str
+        :param reply: received reply, stored with its raw body
+        :type reply: MsgReply
+        """
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO replies (request_id, body, headers) VALUES (?, ?, ?)",
+                (request_id, reply.raw, json.dumps(reply.headers, default=str)),
+            )
+
+    def replies(self) -> Dict[str, MsgReply]:
+        """Return recorded replies.
+
+        :return: Dict[str, MsgReply]
+        """
+        return {
+            request_id: MsgReply(body, json.loads(headers))
+            for request_id, body, headers in self.conn.execute(
+                "SELECT request_id, body, headers FROM replies"
+            )
+        }
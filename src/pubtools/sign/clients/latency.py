@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import logging
+from typing import Optional
+
+from ..state import StateFile
+
+LOG = logging.getLogger("pubtools.sign.clients.latency")
+
+
+class SignerLatency:
+    """Service time of the signing service learned from previous runs.
+
+    Latency of the first reply and interval between following replies are tracked
+    per signing endpoint as exponentially weighted averages, so receive timeout
+    can be derived from the number of awaited replies.
+    """
+
+    def __init__(self, state: StateFile, smoothing: float = 0.3):
+        """Signer latency initializer.
+
+        :param state: State file where the latencies are persisted
+        :type state: StateFile
+        :param smoothing: Weight of the latest run in the averaged latencies
+        :type smoothing: float
+        """
+        self.state = state
+        self.smoothing = smoothing
+
+    def timeout(
+        self,
+        key: str,
+        count: int,
+        margin: float,
+        min_timeout: float,
+        max_timeout: float,
+        default: float,
+    ) -> float:
+        """Return receive timeout for the number of replies.
+
+        Timeout is expected time of the replies multiplied by the margin and kept
+        within the bounds. Default is returned when the endpoint wasn't observed yet.
+
+        :param key: Signing endpoint
+        :type key: str
+        :param count: Number of awaited replies
+        :type count: int
+        :param margin: Safety factor of the expected time
+        :type margin: float
+        :param min_timeout: Lower bound of the timeout
+        :type min_timeout: float
+        :param max_timeout: Upper bound of the timeout
+        :type max_timeout: float
+        :param default: Timeout used for endpoints without observed latency
+        :type default: float
+        :return: float
+        """
+        score = self.state.load().get(key)
+        if not score:
+            return default
+        expected = score["latency"] + max(count - 1, 0) * score.get("interval", 0)
+        timeout = min(max(expected * margin, min_timeout), max_timeout)
+        LOG.debug(f"Receive timeout of {count} replies from {key}: {timeout:.1f}s")
+        return timeout
+
+    def record(self, key: str, latency: float, interval: Optional[float] = None):
+        """Record latencies observed in a run which received all replies.
+
+        :param key: Signing endpoint
+        :type key: str
+        :param latency: Seconds until the first reply
+        :type latency: float
+        :param interval: Mean seconds between following replies, None for single reply
+        :type interval: float
+        """
+        with self.state.update() as scores:
+            score = scores.setdefault(key, {})
+            for kind, value in (("latency", latency), ("interval", interval)):
+                if value is None:
+                    continue
+                if kind in score:
+                    value = (1 - self.smoothing) * score[kind] + self.smoothing * value
+                score[kind] = value
+
+    def record_timeout(self, key: str):
+        """Record run which ran out of time, learned latencies are doubled.
+
+        :param key: Signing endpoint
+        :type key: str
+        """
+        with self.state.update() as scores:
+            score = scores.get(key)
+            if not score:
+                return
+            LOG.warning(f"Signing service {key} is slower than expected")
+            for kind in score:
+                score[kind] *= 2
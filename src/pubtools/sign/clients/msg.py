@@ -1,12 +1,127 @@
+import logging
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
 from ..models.msg import MsgError
 
+import proton
+from proton import Endpoint
 from proton.handlers import MessagingHandler
+from proton.reactor import Handler
+
+LOG = logging.getLogger("pubtools.sign.clients.msg")
+
+_SSL_DOMAINS: Dict[Tuple[Optional[str], Optional[str]], proton.SSLDomain] = {}
+_SSL_DOMAINS_LOCK = threading.Lock()
+
+
+def ssl_domain(cert: Optional[str], ca_cert: Optional[str]) -> proton.SSLDomain:
+    """Return client SSL domain shared by all clients using the same certificates.
+
+    Certificate, key and CA are loaded only when the domain is created.
+
+    :param cert: Messaging client certificate with the key
+    :type cert: str
+    :param ca_cert: Messaging CA certificate
+    :type ca_cert: str
+    :return: proton.SSLDomain
+    """
+    with _SSL_DOMAINS_LOCK:
+        if (cert, ca_cert) not in _SSL_DOMAINS:
+            domain = proton.SSLDomain(proton.SSLDomain.MODE_CLIENT)
+            if cert:
+                domain.set_credentials(cert, cert, None)
+            if ca_cert:
+                domain.set_trusted_ca_db(ca_cert)
+            domain.set_peer_authentication(proton.SSLDomain.ANONYMOUS_PEER)
+            _SSL_DOMAINS[(cert, ca_cert)] = domain
+        return _SSL_DOMAINS[(cert, ca_cert)]
+
+
+class _ConnectTimer(Handler):
+    def __init__(self, client, connection):
+        super().__init__()
+        self.client = client
+        self.connection = connection
+
+    def on_timer_task(self, event):
+        state = self.connection.state
+        if state & Endpoint.REMOTE_ACTIVE or state & Endpoint.LOCAL_CLOSED:
+            return
+        if self.connection.transport is None:
+            # proton is waiting before it reconnects, measure the next broker when it connects
+            self.client._connect_timer = event.container.schedule(self.client.connect_timeout, self)
+            return
+        url = str(self.connection.url)
+        if self.client.health:
+            self.client.health.record_failure(url)
+        self.client._connect_timeouts += 1
+        if self.client._connect_timeouts >= len(self.client.broker_urls):
+            LOG.warning(f"Connecting to {url} timed out, no broker left")
+            self.client._connect_timer = None
+            self.client.errors.append(
+                MsgError(
+                    name="ConnectTimeout",
+                    description=f"No broker connected within {self.client.connect_timeout}s",
+                    source=self.connection,
+                )
+            )
+            self.connection.close()
+            event.container.stop()
+            return
+        LOG.warning(f"Connecting to {url} timed out, failing over")
+        # closed transport makes proton connect to the next broker
+        self.client._abandoned_url = url
+        self.connection.transport.close_tail()
+        self.connection.transport.close_head()
+        self.client._connecting = time.monotonic()
+        self.client._connect_timer = event.container.schedule(self.client.connect_timeout, self)
 
 
 class _MsgClient(MessagingHandler):
-    def __init__(self, errors):
+    def __init__(self, errors, health=None, heartbeat=None, connect_timeout=None):
         super().__init__()
         self.errors = errors
+        self.health = health
+        self.heartbeat = heartbeat
+        self.connect_timeout = connect_timeout
+        self._connecting = None
+        self._connect_timer = None
+        self._connect_timeouts = 0
+        self._abandoned_url = None
+        self._connection = None
+
+    def _connect(self, event, **kwargs):
+        # brokers are tried in order of their health when it's tracked
+        urls = self.health.order(self.broker_urls) if self.health else self.broker_urls
+        self._connecting = time.monotonic()
+        # every broker is tried once per attempt
+        self._connect_timeouts = 0
+        conn = event.container.connect(urls=urls, heartbeat=self.heartbeat, **kwargs)
+        self._connection = conn
+        if self.connect_timeout:
+            self._connect_timer = event.container.schedule(
+                self.connect_timeout, _ConnectTimer(self, conn)
+            )
+        return conn
+
+    def release(self):
+        # attributes of the connection are held by proton C objects, out of reach of the garbage
+        # collector, and reference the container which would keep the client alive forever
+        if self._connection is not None:
+            self._connection._reactor = None
+            self._connection = None
+
+    def on_connection_opened(self, event):
+        if self._connect_timer:
+            self._connect_timer.cancel()
+            self._connect_timer = None
+        if self.health and self._connecting is not None:
+            self.health.record_latency(
+                str(event.connection.url), "connect", time.monotonic() - self._connecting
+            )
+        self._connecting = None
 
     def on_error(self, event, source=None):
         self.errors.append(
@@ -28,4 +143,10 @@ class _MsgClient(MessagingHandler):
         self.on_error(event, event.connection)
 
     def on_transport_error(self, event):
+        if self._abandoned_url and str(event.connection.url) == self._abandoned_url:
+            # transport closed on connect timeout, proton fails over to the next broker
+            self._abandoned_url = None
+            return
+        if self.health and event.connection and event.connection.url:
+            self.health.record_failure(str(event.connection.url))
         self.on_error(event, event.transport)
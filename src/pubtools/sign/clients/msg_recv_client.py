@@ -1,13 +1,14 @@
 import json
 import logging
+import time
+from typing import Optional, Tuple
 
-from ..models.msg import MsgError
+from ..models.msg import MsgError, MsgReply
 
-from .msg import _MsgClient
+from .breaker import broker_circuit, run_attempt, topic_circuit
+from .msg import _MsgClient, ssl_domain
 
-import proton
-import proton.utils
-from proton.reactor import Container
+from proton.reactor import Container, Selector
 
 
 LOG = logging.getLogger("pubtools.sign.client.msg_recv_client")
@@ -15,46 +16,86 @@ LOG = logging.getLogger("pubtools.sign.client.msg_recv_client")
 
 class _RecvClient(_MsgClient):
     def __init__(
-        self, topic, message_ids, id_key, broker_urls, cert, ca_cert, timeout, recv, errors
+        self,
+        topic,
+        message_ids,
+        id_key,
+        broker_urls,
+        cert,
+        ca_cert,
+        timeout,
+        recv,
+        errors,
+        journal=None,
+        match_correlation_id=False,
+        selector=None,
+        id_header=None,
+        health=None,
+        heartbeat=None,
+        connect_timeout=None,
+        sent_at=None,
     ):
-        super().__init__(errors=errors)
+        super().__init__(
+            errors=errors, health=health, heartbeat=heartbeat, connect_timeout=connect_timeout
+        )
         self.broker_urls = broker_urls
         self.topic = topic
         self.id_key = id_key
-        self.ssl_domain = proton.SSLDomain(proton.SSLDomain.MODE_CLIENT)
-        if cert:
-            self.ssl_domain.set_credentials(cert, cert, None)
-        if ca_cert:
-            self.ssl_domain.set_trusted_ca_db(ca_cert)
-        self.ssl_domain.set_peer_authentication(proton.SSLDomain.ANONYMOUS_PEER)
+        self.ssl_domain = ssl_domain(cert, ca_cert)
         self.recv_ids = {x: False for x in message_ids}
         self.confirmed = 0
         self.recv = recv
         self.timeout = timeout
+        self.journal = journal
+        self.match_correlation_id = match_correlation_id
+        self.selector = selector
+        self.id_header = id_header
+        # replies are awaited since their requests were sent, or since the receiver started
+        self.started_at = sent_at
+        self.first_reply_at = None
+        self.last_reply_at = None
 
     def on_start(self, event):
         LOG.debug("RECEIVER: On start %s %s %s", event, self.topic, self.broker_urls)
-        self.timer_task = event.container.schedule(self.timeout, self)
-        conn = event.container.connect(
-            urls=self.broker_urls, ssl_domain=self.ssl_domain, sasl_enabled=False
+        if self.started_at is None:
+            self.started_at = time.monotonic()
+        self.conn = self._connect(event, ssl_domain=self.ssl_domain, sasl_enabled=False)
+        self.receiver = event.container.create_receiver(
+            self.conn, self.topic, options=Selector(self.selector) if self.selector else None
         )
-        self.receiver = event.container.create_receiver(conn, self.topic)
         self.timer_task = event.container.schedule(self.timeout, self)
 
     def on_message(self, event):
         LOG.debug("RECEIVER: On message (%s)", event)
-        outer_message = json.loads(event.message.body)
         headers = event.message.properties
-        msg_id = outer_message["msg"][self.id_key]
+        # match replies by correlation id or id header when possible, body of
+        # the reply is then decoded only when the caller asks for it
+        outer_message = None
+        if self.match_correlation_id:
+            msg_id = event.message.correlation_id
+        elif self.id_header and headers and self.id_header in headers:
+            msg_id = headers[self.id_header]
+        else:
+            outer_message = json.loads(event.message.body)
+            msg_id = outer_message["msg"][self.id_key]
 
         if msg_id in self.recv_ids:
-            self.recv_ids[msg_id] = True
-            self.recv[msg_id] = (outer_message, headers)
+            if not self.recv_ids[msg_id]:
+                self.recv_ids[msg_id] = True
+                self.confirmed += 1
+                self.last_reply_at = time.monotonic()
+                if self.first_reply_at is None:
+                    self.first_reply_at = self.last_reply_at
+            reply = MsgReply(event.message.body, headers, message=outer_message)
+            self.recv[msg_id] = reply
+            if self.journal:
+                # reply has to be durable before the broker forgets it
+                self.journal.record_reply(msg_id, reply)
             self.accept(event.delivery)
         else:
             LOG.debug(f"RECEIVER: Ignored message {msg_id}")
 
-        if self.recv_ids.values() and all(self.recv_ids.values()):
+        if self.recv_ids and self.confirmed == len(self.recv_ids):
             self.timer_task.cancel()
             event.receiver.close()
             event.connection.close()
@@ -62,10 +103,8 @@ class _RecvClient(_MsgClient):
     def on_timer_task(self, event):
         LOG.debug("RECEIVER: On timeout (%s)", event)
         self.timer_task.cancel()
-        if event.connection:
-            event.connection.close()  # pragma: no cover
-        if event.receiver:
-            event.receiver.close()  # pragma: no cover
+        self.receiver.close()
+        self.conn.close()
 
         self.errors.append(
             MsgError(
@@ -80,7 +119,26 @@ class RecvClient(Container):
     """Messaging receiver."""
 
     def __init__(
-        self, topic, message_ids, id_key, broker_urls, cert, ca_cert, timeout, retries, errors
+        self,
+        topic,
+        message_ids,
+        id_key,
+        broker_urls,
+        cert,
+        ca_cert,
+        timeout,
+        retries,
+        errors,
+        journal=None,
+        match_correlation_id=False,
+        selector=None,
+        id_header=None,
+        recv=None,
+        health=None,
+        breaker=None,
+        heartbeat=None,
+        connect_timeout=None,
+        sent_at=None,
     ):
         """Recv Client Initializer.
 
@@ -102,9 +160,36 @@ class RecvClient(Container):
         :type retries: int
         :param errors: List of errors which occured during the process
         :type errors: List[MsgError]
+        :param journal: Journal where received replies are recorded
+        :type journal: Journal
+        :param match_correlation_id: Match replies by correlation_id instead of id in the body
+        :type match_correlation_id: bool
+        :param selector: Selector for broker side filtering of messages (for example
+            pub_task_id = '123')
+        :type selector: str
+        :param id_header: Reply property with message id, replies with the property are
+            matched without decoding the body
+        :type id_header: str
+        :param recv: Mapping where received replies are stored by message id, dict when not set
+        :type recv: MutableMapping[str, MsgReply]
+        :param health: Broker health scores used to order and score the brokers
+        :type health: BrokerHealth
+        :param breaker: Circuit breaker guarding the brokers and topic
+        :type breaker: CircuitBreaker
+        :param heartbeat: Idle timeout of the connection in seconds, dead connection is
+            detected when the broker doesn't send any frame within it
+        :type heartbeat: float
+        :param connect_timeout: Seconds after which connecting fails over to the next broker
+        :type connect_timeout: float
+        :param sent_at: Monotonic time when sending of the awaited requests started, latency
+            of replies is measured from it instead of from start of the receiver
+        :type sent_at: float
         """
         self.message_ids = message_ids
-        self.recv = {}
+        self.breaker = breaker
+        self.circuit = broker_circuit(broker_urls)
+        self.topics = [topic_circuit(topic)]
+        self.recv = {} if recv is None else recv
         self._errors = errors
         self.handler = _RecvClient(
             topic=topic,
@@ -116,10 +201,37 @@ class RecvClient(Container):
             timeout=timeout,
             recv=self.recv,
             errors=self._errors,
+            journal=journal,
+            match_correlation_id=match_correlation_id,
+            selector=selector,
+            id_header=id_header,
+            health=health,
+            heartbeat=heartbeat,
+            connect_timeout=connect_timeout,
+            sent_at=sent_at,
         )
+        # container replaces self.handler with its own root handler
+        self._client = self.handler
         self._retries = retries
         super().__init__(self.handler)
 
+    @property
+    def service_times(self) -> Optional[Tuple[float, Optional[float]]]:
+        """Return seconds until the first reply and mean seconds between following replies.
+
+        Interval is None when a single reply was awaited. None is returned when not
+        all replies were received.
+
+        :return: Optional[Tuple[float, Optional[float]]]
+        """
+        client = self._client
+        if not client.recv_ids or client.confirmed < len(client.recv_ids):
+            return None
+        latency = client.first_reply_at - client.started_at
+        if client.confirmed == 1:
+            return latency, None
+        return latency, (client.last_reply_at - client.first_reply_at) / (client.confirmed - 1)
+
     def run(self):
         """Run the receiver."""
         errors_len = 0
@@ -127,11 +239,15 @@ class RecvClient(Container):
             LOG.warning("No messages to receive")
             return []
 
-        for x in range(self._retries):
-            super().run()
-            if len(self._errors) == errors_len:
-                break
-            errors_len = self._errors
-        else:
-            return self._errors
-        return self.recv
+        try:
+            for x in range(self._retries):
+                if run_attempt(self.breaker, self.circuit, self.topics, self._errors, super().run):
+                    return self._errors
+                if len(self._errors) == errors_len:
+                    break
+                errors_len = len(self._errors)
+            else:
+                return self._errors
+            return self.recv
+        finally:
+            self._client.release()
@@ -1,10 +1,15 @@
+from collections import deque
 import json
 import logging
-from typing import List
+import time
+from typing import Dict, List, Optional
 
 from ..models.msg import MsgMessage, MsgError
 
-from .msg import _MsgClient
+from .breaker import CircuitBreaker, broker_circuit, run_attempt, topic_circuit
+from .health import BrokerHealth
+from .msg import _MsgClient, ssl_domain
+from .ratelimit import RateLimiter
 
 import proton
 import proton.utils
@@ -13,6 +18,33 @@ from proton.reactor import Container
 LOG = logging.getLogger("pubtools.sign.signers.radas")
 
 
+def encode_message(
+    message: MsgMessage, priority: Optional[int] = None, ttl: Optional[float] = None
+) -> bytes:
+    """Encode message to AMQP frame payload which can be streamed by a sender.
+
+    :param message: Message to encode
+    :type message: MsgMessage
+    :param priority: Message priority, broker default when not set
+    :type priority: int
+    :param ttl: Seconds after which the broker drops undelivered message, no expiry when not set
+    :type ttl: float
+    :return: bytes
+    """
+    amqp_message = proton.Message(
+        properties=message.headers,
+        address=message.address,
+        body=json.dumps(message.body),
+        reply_to=message.reply_to,
+        correlation_id=message.correlation_id,
+    )
+    if priority is not None:
+        amqp_message.priority = priority
+    if ttl:
+        amqp_message.ttl = ttl
+    return amqp_message.encode()
+
+
 class _SendClient(_MsgClient):
     def __init__(
         self,
@@ -21,49 +53,133 @@ class _SendClient(_MsgClient):
         cert: str,
         ca_cert: str,
         errors: List[MsgError],
+        health: Optional[BrokerHealth] = None,
+        heartbeat: Optional[float] = None,
+        connect_timeout: Optional[float] = None,
+        limiter: Optional[RateLimiter] = None,
+        priority: Optional[int] = None,
+        ttl: Optional[float] = None,
     ):
-        super().__init__(errors=errors)
+        super().__init__(
+            errors=errors, health=health, heartbeat=heartbeat, connect_timeout=connect_timeout
+        )
+        self.limiter = limiter
         self.broker_urls = broker_urls
         self.messages = messages
-        self.ssl_domain = proton.SSLDomain(proton.SSLDomain.MODE_CLIENT)
-        if cert:
-            self.ssl_domain.set_credentials(cert, cert, None)
-        if ca_cert:
-            self.ssl_domain.set_trusted_ca_db(ca_cert)
-        self.ssl_domain.set_peer_authentication(proton.SSLDomain.ANONYMOUS_PEER)
+        self.ssl_domain = ssl_domain(cert, ca_cert)
         self.sent = 0
+        self.resent = 0
         self.confirmed = 0
+        # errors of messages rejected by the broker, retrying the attempt won't resend them
+        self.rejected: List[MsgError] = []
         self.total = len(messages)
+        # encoded before the reactor starts and reused when messages are resent
+        self._frames = [encode_message(message, priority=priority, ttl=ttl) for message in messages]
+        self._unsent = deque(range(self.total))
+        # delivery tag -> index of the message, until the outcome of the delivery is known
+        self._in_flight: Dict[bytes, int] = {}
+        self._sent_at: Dict[bytes, float] = {}
+        # requests which can be sent without asking the rate limiter again
+        self._allowance = 0
+        self._throttled = False
+        self.sender = None
 
     def on_start(self, event):
-        conn = event.container.connect(
-            urls=self.broker_urls, ssl_domain=self.ssl_domain, sasl_enabled=False
-        )
+        conn = self._connect(event, ssl_domain=self.ssl_domain, sasl_enabled=False)
         self.sender = event.container.create_sender(conn)
 
+    def release(self):
+        super().release()
+        self.sender = None
+        self.messages = []
+        self._frames = []
+        self._unsent.clear()
+        self._in_flight = {}
+        self._sent_at = {}
+
     def on_sendable(self, event):
         LOG.debug("Sender on_sendable")
-        if self.sent < self.total:
-            message = self.messages[self.sent]
+        self._send(event.container, event.sender)
+
+    def on_timer_task(self, event):
+        self._throttled = False
+        self._send(event.container, self.sender)
+
+    def _send(self, container, sender):
+        while sender.credit and self._unsent and not self._throttled:
+            if self.limiter and not self._allowance:
+                self._allowance, wait = self.limiter.acquire(len(self._unsent))
+                if not self._allowance:
+                    # reactor has to keep running, sending continues in on_timer_task
+                    self._throttled = True
+                    container.schedule(wait, self)
+                    return
+            index = self._unsent.popleft()
+            message = self.messages[index]
             LOG.debug("Sending message: %s %s %s", message.body, message.address, message.headers)
-            event.sender.send(
-                proton.Message(
-                    properties=message.headers,
-                    address=message.address,
-                    body=json.dumps(message.body),
-                )
-            )
+            delivery = sender.delivery(sender.delivery_tag())
+            sender.stream(self._frames[index])
+            sender.advance()
+            self._in_flight[delivery.tag] = index
+            if self.health:
+                self._sent_at[delivery.tag] = time.monotonic()
             self.sent += 1
+            if self.limiter:
+                self._allowance -= 1
 
     def on_accepted(self, event):
         LOG.debug("Sender accepted")
+        sent_at = self._sent_at.pop(event.delivery.tag, None)
+        if sent_at is not None:
+            self.health.record_latency(str(event.connection.url), "rtt", time.monotonic() - sent_at)
+        if self._in_flight.pop(event.delivery.tag, None) is None:
+            return
+        self._confirm(event)
+
+    def on_rejected(self, event):
+        self._sent_at.pop(event.delivery.tag, None)
+        if self._in_flight.pop(event.delivery.tag, None) is None:
+            return
+        self._reject(event, event.delivery.remote.condition or "Message rejected by the broker")
+
+    def on_released(self, event):
+        # released or modified delivery wasn't processed by the broker, it's sent again
+        self._sent_at.pop(event.delivery.tag, None)
+        index = self._in_flight.pop(event.delivery.tag, None)
+        if index is None:
+            return
+        LOG.warning("Resending message released by the broker")
+        self._unsent.appendleft(index)
+        self.resent += 1
+        self._send(event.container, self.sender)
+
+    def on_settled(self, event):
+        self._sent_at.pop(event.delivery.tag, None)
+        if self._in_flight.pop(event.delivery.tag, None) is None:
+            return
+        # settled by the broker without outcome, resending won't help
+        self._reject(event, "Message settled by the broker without outcome")
+
+    def _reject(self, event, description):
+        error = MsgError(name="MessageRejected", description=description, source=event.link)
+        self.errors.append(error)
+        self.rejected.append(error)
+        self._confirm(event)
+
+    def _confirm(self, event):
         self.confirmed += 1
         if self.confirmed == self.total:
             LOG.debug("Sender closing")
             event.connection.close()
 
-    def on_disconnected(self, event):  # pragma: no cover
-        self.sent = self.confirmed  # pragma: no cover
+    def on_disconnected(self, event):
+        if self._in_flight:
+            unsettled = sorted(self._in_flight.values())
+            LOG.warning(f"Resending {len(unsettled)} unsettled messages after disconnect")
+            self._unsent.extendleft(reversed(unsettled))
+            self.resent += len(unsettled)
+        self._in_flight = {}
+        self._sent_at = {}
 
 
 class SendClient(Container):
@@ -77,6 +193,13 @@ class SendClient(Container):
         ca_cert: str,
         retries: int,
         errors: List[MsgError],
+        health: Optional[BrokerHealth] = None,
+        breaker: Optional[CircuitBreaker] = None,
+        heartbeat: Optional[float] = None,
+        connect_timeout: Optional[float] = None,
+        limiter: Optional[RateLimiter] = None,
+        priority: Optional[int] = None,
+        ttl: Optional[float] = None,
     ):
         """Send Client Initializer.
 
@@ -90,26 +213,73 @@ class SendClient(Container):
         :type retries: int
         :param errors: List of errors which occured during the process
         :type errors: List[MsgError]
+        :param health: Broker health scores used to order and score the brokers
+        :type health: BrokerHealth
+        :param breaker: Circuit breaker guarding the brokers and topics
+        :type breaker: CircuitBreaker
+        :param heartbeat: Idle timeout of the connection in seconds, dead connection is
+            detected when the broker doesn't send any frame within it
+        :type heartbeat: float
+        :param connect_timeout: Seconds after which connecting fails over to the next broker
+        :type connect_timeout: float
+        :param limiter: Rate limiter applied before each send
+        :type limiter: RateLimiter
+        :param priority: Priority of the messages, broker default when not set
+        :type priority: int
+        :param ttl: Seconds after which the broker drops undelivered messages, no expiry when
+            not set
+        :type ttl: float
         """
         self.messages = messages
+        self.breaker = breaker
+        self.circuit = broker_circuit(broker_urls)
+        self.topics = sorted({topic_circuit(message.address) for message in messages})
         self.handler = _SendClient(
-            messages=messages, broker_urls=broker_urls, cert=cert, ca_cert=ca_cert, errors=errors
+            messages=messages,
+            broker_urls=broker_urls,
+            cert=cert,
+            ca_cert=ca_cert,
+            errors=errors,
+            health=health,
+            heartbeat=heartbeat,
+            connect_timeout=connect_timeout,
+            limiter=limiter,
+            priority=priority,
+            ttl=ttl,
         )
+        # container replaces self.handler with its own root handler
+        self._client = self.handler
         self._retries = retries
         self._errors = errors
         super().__init__(self.handler)
 
+    @property
+    def resent(self) -> int:
+        """Return number of messages sent more than once because of lost connections.
+
+        :return: int
+        """
+        return self._client.resent
+
     def run(self):
         """Run the SendClient."""
         errors_len = 0
         if not len(self.messages):
             LOG.warning("No messages to send")
             return []
-        for x in range(self._retries):
-            super().run()
-            if len(self._errors) == errors_len:
-                break
-            errors_len = len(self._errors)
-        else:
-            return self._errors
-        return []
+        try:
+            for x in range(self._retries):
+                if run_attempt(self.breaker, self.circuit, self.topics, self._errors, super().run):
+                    return self._errors
+                if len(self._errors) == errors_len:
+                    break
+                errors_len = len(self._errors)
+            else:
+                return self._errors
+            return list(self._client.rejected)
+        finally:
+            if self.resent:
+                LOG.warning(
+                    f"{self.resent} of {self._client.total} messages were sent more than once"
+                )
+            self._client.release()
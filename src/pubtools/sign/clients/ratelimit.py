@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+import logging
+import time
+from typing import Dict, Tuple
+
+from ..state import StateFile
+
+LOG = logging.getLogger("pubtools.sign.clients.ratelimit")
+
+
+class RateLimiter:
+    """Token buckets limiting rate of signing requests of all processes on the host.
+
+    Every bucket is refilled with its rate of tokens per second and holds at most
+    one second worth of tokens. Sending a request takes a token from each bucket.
+    Tokens are taken in batches, so the shared state isn't locked for every request.
+    """
+
+    def __init__(self, state: StateFile, rates: Dict[str, float]):
+        """Rate limiter initializer.
+
+        :param state: State file where the buckets are persisted
+        :type state: StateFile
+        :param rates: Bucket names mapped to requests per second
+        :type rates: Dict[str, float]
+        """
+        self.state = state
+        self.rates = rates
+
+    def acquire(self, wanted: int) -> Tuple[int, float]:
+        """Take up to wanted tokens from all buckets.
+
+        Returns number of granted tokens and when none was granted, seconds to wait
+        before the next attempt.
+
+        :param wanted: Number of requests to send
+        :type wanted: int
+        :return: Tuple[int, float]
+        """
+        now = time.time()
+        with self.state.update() as buckets:
+            tokens = {}
+            for name, rate in self.rates.items():
+                bucket = buckets.get(name, {})
+                burst = max(rate, 1)
+                tokens[name] = min(
+                    burst, bucket.get("tokens", burst) + (now - bucket.get("updated", now)) * rate
+                )
+            granted = int(min([wanted] + list(tokens.values())))
+            for name, available in tokens.items():
+                buckets[name] = {"tokens": available - granted, "updated": now}
+        if granted:
+            return granted, 0
+        wait = max((1 - tokens[name]) / rate for name, rate in self.rates.items())
+        LOG.debug(f"Rate limited, waiting {wait:.3f}s")
+        return 0, wait
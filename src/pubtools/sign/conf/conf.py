@@ -1,6 +1,12 @@
+import hashlib
+import json
+import os
+
 import marshmallow as ma
 from piny import MarshmallowValidator, StrictMatcher, YamlLoader
 
+from ..cache import cached
+
 CONFIG_PATHS = ["~/.config/pubtools-sign/conf.yaml", "/etc/pubtools-sign/conf.yaml"]
 
 
@@ -18,6 +24,42 @@ class MsgSignerSchema(ma.Schema):
     retries = ma.fields.Integer(required=True)
     message_id_key = ma.fields.String(required=True)
     log_level = ma.fields.String(default="INFO")
+    deterministic_request_id = ma.fields.Boolean(missing=False)
+    reply_queue = ma.fields.String(missing=None)
+    reply_selector = ma.fields.String(missing=None)
+    message_id_header = ma.fields.String(missing=None)
+    result_store = ma.fields.String(
+        missing="replies", validate=ma.validate.OneOf(["replies", "compact", "disk"])
+    )
+    result_store_dir = ma.fields.String(missing=None)
+    shards = ma.fields.Integer(missing=1, validate=ma.validate.Range(min=1))
+    pin_brokers = ma.fields.Boolean(missing=False)
+    state_dir = ma.fields.String(missing=None)
+    broker_cooldown = ma.fields.Integer(missing=60)
+    circuit_threshold = ma.fields.Integer(missing=5, validate=ma.validate.Range(min=0))
+    circuit_reset_timeout = ma.fields.Integer(missing=60)
+    heartbeat = ma.fields.Float(missing=None)
+    connect_timeout = ma.fields.Float(missing=None)
+    chunk_size = ma.fields.Integer(missing=0, validate=ma.validate.Range(min=0))
+    chunk_bytes = ma.fields.Integer(missing=0, validate=ma.validate.Range(min=0))
+    adaptive_timeout = ma.fields.Boolean(missing=False)
+    min_timeout = ma.fields.Integer(missing=10)
+    max_timeout = ma.fields.Integer(missing=None)
+    timeout_margin = ma.fields.Float(missing=2.0, validate=ma.validate.Range(min=1))
+    rate_limit = ma.fields.Float(
+        missing=None, validate=ma.validate.Range(min=0, min_inclusive=False)
+    )
+    key_rate_limits = ma.fields.Dict(
+        keys=ma.fields.String(),
+        values=ma.fields.Float(validate=ma.validate.Range(min=0, min_inclusive=False)),
+        missing=dict,
+    )
+    clear_sign_priority = ma.fields.Integer(missing=None, validate=ma.validate.Range(min=0, max=9))
+    container_sign_priority = ma.fields.Integer(
+        missing=None, validate=ma.validate.Range(min=0, max=9)
+    )
+    request_ttl = ma.fields.Boolean(missing=False)
+    reply_headers = ma.fields.Boolean(missing=True)
 
 
 class ConfigSchema(ma.Schema):
@@ -26,14 +68,7 @@ class ConfigSchema(ma.Schema):
     msg_signer = ma.fields.Nested(MsgSignerSchema)
 
 
-def load_config(fname: str):
-    """Load configuration from a filename.
-
-    :param fname: filename
-    :type fname: str
-
-    :return Dict[str, Any]:
-    """
+def _load_config(fname: str):
     config = YamlLoader(
         path=fname,
         matcher=StrictMatcher,
@@ -41,3 +76,40 @@ def load_config(fname: str):
         schema=ConfigSchema,
     ).load(many=False)
     return config
+
+
+def _schema_fields(schema: ma.Schema):
+    fields = {}
+    for name, field in sorted(schema._declared_fields.items()):
+        if isinstance(field, ma.fields.Nested):
+            fields[name] = _schema_fields(field.nested)
+        else:
+            fields[name] = [type(field).__name__, repr(field.load_default)]
+    return fields
+
+
+def _schema_hash():
+    fields = json.dumps(_schema_fields(ConfigSchema), sort_keys=True)
+    return hashlib.sha256(fields.encode()).hexdigest()
+
+
+def load_config(fname: str, cache: bool = True):
+    """Load configuration from a filename.
+
+    Validated configuration is cached until the file, environment variables
+    used in it or the configuration schema change.
+
+    :param fname: filename
+    :type fname: str
+    :param cache: use cached configuration
+    :type cache: bool
+
+    :return Dict[str, Any]:
+    """
+    if not cache:
+        return _load_config(fname)
+    with open(fname) as f:
+        environ = {name: os.environ.get(name) for name in StrictMatcher.matcher.findall(f.read())}
+    # values of the variables can be secrets, only their hash is stored in the cache
+    environ_hash = hashlib.sha256(json.dumps(environ, sort_keys=True).encode()).hexdigest()
+    return cached("config", fname, _load_config, extra=[_schema_hash(), environ_hash])
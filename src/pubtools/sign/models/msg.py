@@ -1,14 +1,60 @@
 import dataclasses
-from typing import Dict, Any
+import json
+from typing import Dict, Any, Optional
 
 
-@dataclasses.dataclass
 class MsgMessage:
-    """Messaging message model."""
+    """Messaging message model.
+
+    Messages of one operation usually share the same headers dict, so headers
+    must not be modified in place.
+    """
+
+    __slots__ = ("headers", "address", "body", "reply_to", "correlation_id")
+
+    def __init__(
+        self,
+        headers: Dict[str, Any],
+        address: str,
+        body: Dict[str, Any],
+        reply_to: Optional[str] = None,
+        correlation_id: Optional[str] = None,
+    ):
+        """Message initializer.
+
+        :param headers: Message properties
+        :type headers: Dict[str, Any]
+        :param address: Address where the message is sent
+        :type address: str
+        :param body: Message body
+        :type body: Dict[str, Any]
+        :param reply_to: Address where replies are expected
+        :type reply_to: str
+        :param correlation_id: Correlation id of the message
+        :type correlation_id: str
+        """
+        self.headers = headers
+        self.address = address
+        self.body = body
+        self.reply_to = reply_to
+        self.correlation_id = correlation_id
+
+    def _fields(self):
+        return tuple(getattr(self, name) for name in self.__slots__)
 
-    headers: Dict[str, Any]
-    address: str
-    body: Dict[str, Any]
+    def __eq__(self, other):
+        """Compare messages by their content."""
+        if not isinstance(other, MsgMessage):
+            return NotImplemented
+        return self._fields() == other._fields()
+
+    __hash__ = None
+
+    def __repr__(self):
+        """Return representation of the message."""
+        return "MsgMessage(%s)" % ", ".join(
+            f"{name}={value!r}" for name, value in zip(self.__slots__, self._fields())
+        )
 
 
 @dataclasses.dataclass
@@ -18,3 +64,69 @@ class MsgError:
     name: str
     description: str
     source: Any
+
+
+class MsgReply:
+    """Received reply which body is decoded on the first access.
+
+    Only one form of the body is kept, raw body is dropped once it's decoded.
+    Reply behaves like (outer_message, headers) tuple.
+    """
+
+    __slots__ = ("_raw", "headers", "_message")
+
+    def __init__(self, raw: str, headers: Dict[str, Any], message: Optional[Dict[str, Any]] = None):
+        """Reply initializer.
+
+        :param raw: Raw reply body
+        :type raw: str
+        :param headers: Reply properties
+        :type headers: Dict[str, Any]
+        :param message: Already decoded reply body, raw body isn't kept when set
+        :type message: Dict[str, Any]
+        """
+        self._raw = raw if message is None else None
+        self.headers = headers
+        self._message = message
+
+    @property
+    def raw(self) -> str:
+        """Return raw reply body, encoded again when it was already decoded."""
+        if self._raw is None:
+            return json.dumps(self._message)
+        return self._raw
+
+    @property
+    def message(self) -> Dict[str, Any]:
+        """Return decoded reply body."""
+        if self._message is None:
+            self._message = json.loads(self._raw)
+            self._raw = None
+        return self._message
+
+    def __iter__(self):
+        """Iterate over decoded body and headers."""
+        yield self.message
+        yield self.headers
+
+    def __getitem__(self, index):
+        """Return decoded body for index 0 and headers for index 1."""
+        return tuple(self)[index]
+
+    def __len__(self):
+        """Return length of the reply tuple."""
+        return 2
+
+    def __eq__(self, other):
+        """Compare reply with other reply or (outer_message, headers) tuple."""
+        if isinstance(other, MsgReply):
+            other = tuple(other)
+        if not isinstance(other, tuple):
+            return NotImplemented
+        return tuple(self) == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        """Return representation of the reply."""
+        return f"MsgReply(raw={self.raw!r}, headers={self.headers!r})"
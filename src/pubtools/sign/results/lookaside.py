@@ -0,0 +1,194 @@
+from __future__ import annotations
+
+from array import array
+import base64
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import os
+import threading
+from typing import Any, Dict, Iterable, List
+
+from .store import RecordStore, SignatureRecord
+
+LOG = logging.getLogger("pubtools.sign.results.lookaside")
+
+
+def _repository_path(reference: str) -> str:
+    # docker reference without registry host, tag and digest
+    name = reference.split("@", 1)[0]
+    parts = name.split("/")
+    if len(parts) > 1 and ("." in parts[0] or ":" in parts[0] or parts[0] == "localhost"):
+        parts = parts[1:]
+    parts[-1] = parts[-1].split(":", 1)[0]
+    if any(part in ("", ".", "..") for part in parts):
+        raise ValueError(f"Invalid repository in reference {reference}")
+    return "/".join(parts)
+
+
+def signature_dir(root: str, reference: str, digest: str) -> str:
+    """Return lookaside directory for signatures of the image.
+
+    :param root: Root of the lookaside directory
+    :type root: str
+    :param reference: Image reference (for example registry.example.com/ns/repo:tag)
+    :type reference: str
+    :param digest: Manifest digest (for example sha256:abcd...)
+    :type digest: str
+    :return: str
+    """
+    algorithm, _, value = digest.partition(":")
+    if not algorithm or not value or "/" in digest:
+        raise ValueError(f"Invalid digest {digest}")
+    return os.path.join(root, f"{_repository_path(reference)}@{algorithm}={value}")
+
+
+class _SignatureDir:
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.signatures = None
+
+    def _load(self):
+        # existing signatures, new ones are numbered after them
+        self.signatures = {}
+        os.makedirs(self.path, exist_ok=True)
+        for name in os.listdir(self.path):
+            prefix, _, index = name.partition("-")
+            if prefix == "signature" and index.isdigit():
+                with open(os.path.join(self.path, name), "rb") as f:
+                    self.signatures[f.read()] = int(index)
+
+    def write(self, signature: bytes):
+        with self.lock:
+            if self.signatures is None:
+                self._load()
+            if signature in self.signatures:
+                return self.signatures[signature], False
+            index = max(self.signatures.values(), default=0) + 1
+            while True:
+                try:
+                    with open(os.path.join(self.path, f"signature-{index}"), "xb") as f:
+                        f.write(signature)
+                    break
+                except FileExistsError:
+                    # written by another process meanwhile
+                    index += 1
+            self.signatures[signature] = index
+            return index, True
+
+
+class LookasideStore(RecordStore):
+    """Store writing signed claims to containers/image lookaside directory layout.
+
+    Every received claim is written as it arrives to
+    <root>/<repository>@<algorithm>=<digest>/signature-N by a pool of threads.
+    Store items are paths of written signatures.
+    """
+
+    def __init__(
+        self,
+        request_ids: Iterable[str],
+        references: List[str],
+        digests: List[str],
+        root: str,
+        workers: int = 4,
+    ):
+        """Store initializer.
+
+        :param request_ids: ids of signing requests in order of operation inputs
+        :type request_ids: Iterable[str]
+        :param references: references of signed images in order of operation inputs
+        :type references: List[str]
+        :param digests: manifest digests of signed images in order of operation inputs
+        :type digests: List[str]
+        :param root: Root of the lookaside directory
+        :type root: str
+        :param workers: Number of threads writing signatures
+        :type workers: int
+        """
+        super().__init__(request_ids, keep_headers=False)
+        self.references = references
+        self.digests = digests
+        self.root = root
+        self.indexes = array("l", [0]) * len(self.positions)
+        self.received = bytearray(len(self.positions))
+        self.stats = {"written": 0, "existing": 0, "failed": 0}
+        self.failures: List[str] = []
+        self._dirs: Dict[str, _SignatureDir] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+
+    def _signature_dir(self, path):
+        with self._lock:
+            if path not in self._dirs:
+                self._dirs[path] = _SignatureDir(path)
+            return self._dirs[path]
+
+    def _fail(self, position, reason):
+        LOG.error(f"Signature of {self.references[position]} not written: {reason}")
+        with self._lock:
+            self.stats["failed"] += 1
+            self.failures.append(f"{self.references[position]}: {reason}")
+
+    def _write(self, position: int, record: SignatureRecord):
+        try:
+            path = signature_dir(self.root, self.references[position], self.digests[position])
+            index, written = self._signature_dir(path).write(base64.b64decode(record.signature))
+        except Exception as ex:
+            self._fail(position, str(ex))
+            return
+        self.indexes[position] = index
+        with self._lock:
+            self.stats["written" if written else "existing"] += 1
+
+    def _put(self, position, record):
+        if self.received[position]:
+            return
+        self.received[position] = 1
+        if record.errors or not record.signature:
+            self._fail(position, f"signing failed {record.errors}")
+            return
+        self._executor.submit(self._write, position, record)
+
+    def _get(self, position):
+        if not self.indexes[position]:
+            return ""
+        return os.path.join(
+            signature_dir(self.root, self.references[position], self.digests[position]),
+            f"signature-{self.indexes[position]}",
+        )
+
+    def flush(self):
+        """Wait until all received signatures are written."""
+        self._executor.shutdown(wait=True)
+
+    def summary(self) -> Dict[str, Any]:
+        """Return summary of written signatures.
+
+        :return: Dict[str, Any]
+        """
+        return dict(
+            self.stats,
+            root=self.root,
+            missing=len(self) - sum(self.stats.values()),
+            failures=self.failures,
+        )
+
+
+def empty_summary(root: str, count: int) -> Dict[str, Any]:
+    """Return lookaside summary when nothing was written.
+
+    :param root: Root of the lookaside directory
+    :type root: str
+    :param count: Number of signed images
+    :type count: int
+    :return: Dict[str, Any]
+    """
+    return {
+        "written": 0,
+        "existing": 0,
+        "failed": 0,
+        "root": root,
+        "missing": count,
+        "failures": [],
+    }
@@ -0,0 +1,302 @@
+from __future__ import annotations
+
+from array import array
+import bisect
+from collections.abc import Sequence
+import dataclasses
+import itertools
+import json
+import os
+import shutil
+import tempfile
+from typing import Any, Dict, Iterable, List, Optional
+
+
+class SignatureRecord:
+    """Compact signing reply holding only the signature and fields used by pubtools-sign."""
+
+    __slots__ = ("request_id", "signature", "errors", "headers")
+
+    def __init__(
+        self,
+        request_id: str,
+        signature: str,
+        errors: List[Any],
+        headers: Optional[Dict[str, Any]] = None,
+    ):
+        """Record initializer.
+
+        :param request_id: id of the signing request
+        :type request_id: str
+        :param signature: signed data or signed claim
+        :type signature: str
+        :param errors: errors reported by the signing service
+        :type errors: List[Any]
+        :param headers: reply properties, None when headers are not kept
+        :type headers: Dict[str, Any]
+        """
+        self.request_id = request_id
+        self.signature = signature
+        self.errors = errors
+        self.headers = headers
+
+    @classmethod
+    def from_reply(cls, request_id, reply, keep_headers=True) -> SignatureRecord:
+        """Create record from received (outer_message, headers) reply.
+
+        :param request_id: id of the signing request
+        :type request_id: str
+        :param reply: received reply
+        :type reply: MsgReply
+        :param keep_headers: Keep reply properties in the record
+        :type keep_headers: bool
+        :return: SignatureRecord
+        """
+        outer_message, headers = reply
+        msg = outer_message["msg"]
+        return cls(
+            request_id=request_id,
+            signature=msg.get("signed_claim", msg.get("signed_data", "")),
+            errors=msg.get("errors") or [],
+            headers=headers if keep_headers else None,
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return dict representation of the record."""
+        return {
+            "request_id": self.request_id,
+            "signature": self.signature,
+            "errors": self.errors,
+            "headers": self.headers,
+        }
+
+    def __eq__(self, other):
+        """Compare records by their content."""
+        if not isinstance(other, SignatureRecord):
+            return NotImplemented
+        return self.to_dict() == other.to_dict()
+
+    __hash__ = None
+
+    def __repr__(self):
+        """Return representation of the record."""
+        return f"SignatureRecord({self.to_dict()!r})"
+
+
+class RecordStore(Sequence):
+    """Base of stores with SignatureRecords in order of operation inputs.
+
+    Replies are assigned by request id (store[request_id] = reply) and read by
+    position of the input. Positions without reply contain empty string.
+    """
+
+    def __init__(self, request_ids: Iterable[str], keep_headers: bool = True):
+        """Store initializer.
+
+        :param request_ids: ids of signing requests in order of operation inputs
+        :type request_ids: Iterable[str]
+        :param keep_headers: Keep reply properties in the records
+        :type keep_headers: bool
+        """
+        self.positions = {request_id: position for position, request_id in enumerate(request_ids)}
+        self.keep_headers = keep_headers
+
+    def _put(self, position: int, record: SignatureRecord):
+        raise NotImplementedError  # pragma: no cover
+
+    def _get(self, position: int):
+        raise NotImplementedError  # pragma: no cover
+
+    def flush(self):
+        """Wait until all stored records are persisted."""
+
+    def __setitem__(self, request_id, reply):
+        """Store reply of the request."""
+        self._put(
+            self.positions[request_id],
+            SignatureRecord.from_reply(request_id, reply, keep_headers=self.keep_headers),
+        )
+
+    def __getitem__(self, position):
+        """Return record on the position."""
+        if isinstance(position, slice):
+            return [self._get(x) for x in range(*position.indices(len(self)))]
+        if position < 0:
+            position += len(self)
+        if not 0 <= position < len(self):
+            raise IndexError("store index out of range")
+        return self._get(position)
+
+    def __len__(self):
+        """Return number of operation inputs."""
+        return len(self.positions)
+
+    def __eq__(self, other):
+        """Compare stored records with a sequence."""
+        if not isinstance(other, Sequence):
+            return NotImplemented
+        return list(self) == list(other)
+
+    __hash__ = None
+
+
+class CompactStore(RecordStore):
+    """Results of signing operation stored in memory as SignatureRecords."""
+
+    def __init__(self, request_ids: Iterable[str], keep_headers: bool = True):
+        """Store initializer.
+
+        :param request_ids: ids of signing requests in order of operation inputs
+        :type request_ids: Iterable[str]
+        :param keep_headers: Keep reply properties in the records
+        :type keep_headers: bool
+        """
+        super().__init__(request_ids, keep_headers=keep_headers)
+        self.records: List[Any] = [""] * len(self.positions)
+
+    def _put(self, position, record):
+        self.records[position] = record
+
+    def _get(self, position):
+        return self.records[position]
+
+
+class DiskStore(RecordStore):
+    """Results of signing operation spilled to an append-only file.
+
+    Every record is appended to an anonymous temporary file as json line and
+    only its offset is kept in memory, records are loaded on access.
+    """
+
+    def __init__(
+        self, request_ids: Iterable[str], keep_headers: bool = True, directory: Optional[str] = None
+    ):
+        """Store initializer.
+
+        :param request_ids: ids of signing requests in order of operation inputs
+        :type request_ids: Iterable[str]
+        :param keep_headers: Keep reply properties in the records
+        :type keep_headers: bool
+        :param directory: Directory for the temporary file, system default when not set
+        :type directory: str
+        """
+        super().__init__(request_ids, keep_headers=keep_headers)
+        self.directory = directory
+        self.offsets = array("q", [-1]) * len(self.positions)
+        self.file = tempfile.TemporaryFile(dir=directory)
+        self._end = 0
+
+    @classmethod
+    def attach(cls, detached: DetachedStore) -> DiskStore:
+        """Open records of a store detached in another process.
+
+        Attached store is read-only, its file is removed when the store is closed.
+
+        :param detached: Store detached by the other process
+        :type detached: DetachedStore
+        :return: DiskStore
+        """
+        store = cls.__new__(cls)
+        RecordStore.__init__(store, ())
+        store.directory = os.path.dirname(detached.path)
+        store.offsets = detached.offsets
+        store.file = open(detached.path, "rb")
+        # file stays readable through the open handle, like the anonymous temporary file
+        os.unlink(detached.path)
+        store._end = os.fstat(store.file.fileno()).st_size
+        return store
+
+    def detach(self) -> DetachedStore:
+        """Copy records to a named file which another process can attach, the store is closed.
+
+        :return: DetachedStore
+        """
+        self.file.seek(0)
+        with tempfile.NamedTemporaryFile(
+            dir=self.directory, prefix="pubtools-sign-", delete=False
+        ) as f:
+            shutil.copyfileobj(self.file, f)
+        self.close()
+        return DetachedStore(path=f.name, offsets=self.offsets)
+
+    def _put(self, position, record):
+        data = json.dumps(record.to_dict()).encode("utf-8") + b"\n"
+        self.file.seek(self._end)
+        self.file.write(data)
+        # duplicate replies are appended too, the index points to the last one
+        self.offsets[position] = self._end
+        self._end += len(data)
+
+    def _get(self, position):
+        offset = self.offsets[position]
+        if offset < 0:
+            return ""
+        self.file.seek(offset)
+        return SignatureRecord(**json.loads(self.file.readline()))
+
+    def flush(self):
+        """Flush written records to the store file."""
+        self.file.flush()
+
+    def close(self):
+        """Close and remove the store file."""
+        self.file.close()
+
+    def __len__(self):
+        """Return number of operation inputs."""
+        return len(self.offsets)
+
+
+@dataclasses.dataclass
+class DetachedStore:
+    """Disk store handed over to another process, only offsets of its records are sent."""
+
+    path: str
+    offsets: array
+
+
+class ChainedStore(Sequence):
+    """Results of sharded operation read from stores of the shards in order of operation inputs."""
+
+    def __init__(self, stores: List[Sequence]):
+        """Store initializer.
+
+        :param stores: Stores of the shards in order of operation inputs
+        :type stores: List[Sequence]
+        """
+        self.stores = stores
+        # position after the last record of each store
+        self.ends = list(itertools.accumulate(len(store) for store in stores))
+
+    def __getitem__(self, position):
+        """Return record on the position."""
+        if isinstance(position, slice):
+            return [self[x] for x in range(*position.indices(len(self)))]
+        if position < 0:
+            position += len(self)
+        if not 0 <= position < len(self):
+            raise IndexError("store index out of range")
+        shard = bisect.bisect_right(self.ends, position)
+        return self.stores[shard][position - (self.ends[shard - 1] if shard else 0)]
+
+    def __iter__(self):
+        """Iterate over records of all stores."""
+        for store in self.stores:
+            yield from store
+
+    def __len__(self):
+        """Return number of operation inputs."""
+        return self.ends[-1] if self.ends else 0
+
+    def __eq__(self, other):
+        """Compare stored records with a sequence."""
+        if not isinstance(other, Sequence):
+            return NotImplemented
+        return list(self) == list(other)
+
+    __hash__ = None
+
+    def close(self):
+        """Close stores of the shards."""
+        for store in self.stores:
+            store.close()
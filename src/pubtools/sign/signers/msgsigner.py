@@ -1,10 +1,29 @@
 from __future__ import annotations
 
 import base64
-from dataclasses import field, dataclass, asdict
+from collections import Counter, deque
+import copy
+import datetime
+import hashlib
+from dataclasses import field, fields, dataclass
 import json
+from json.encoder import encode_basestring_ascii
 import logging
-from typing import Dict, List, ClassVar, Any, Optional
+import multiprocessing
+import threading
+import time
+from typing import (
+    Callable,
+    Deque,
+    Dict,
+    List,
+    ClassVar,
+    Any,
+    MutableMapping,
+    Optional,
+    Sequence,
+    Tuple,
+)
 import uuid
 import os
 
@@ -17,27 +36,82 @@ from ..operations import ClearSignOperation, ContainerSignOperation
 from ..results.signing_results import SigningResults
 from ..results import ClearSignResult, ContainerSignResult
 from ..results import SignerResults
+from ..results.store import (
+    ChainedStore,
+    CompactStore,
+    DetachedStore,
+    DiskStore,
+    RecordStore,
+    SignatureRecord,
+)
+from ..results.lookaside import LookasideStore, empty_summary
 from ..exceptions import UnsupportedOperation
 from ..clients.msg_send_client import SendClient
 from ..clients.msg_recv_client import RecvClient
-from ..models.msg import MsgMessage
+from ..clients.breaker import CircuitBreaker
+from ..clients.health import BrokerHealth
+from ..clients.latency import SignerLatency
+from ..clients.ratelimit import RateLimiter
+from ..clients.journal import Journal, journal_shards, shard_journal, start_shards
+from ..models.msg import MsgError, MsgMessage, MsgReply
 from ..conf.conf import load_config, CONFIG_PATHS
+from ..cache import cache_dir, cached
+from ..state import state_file
 from ..utils import set_log_level, isodate_now
 
 
 LOG = logging.getLogger("pubtools.sign.signers.msgsigner")
 
 
+def _manifest_claim(digest, reference):
+    return {
+        "critical": {
+            "type": "atomic container signature",
+            "image": {"docker-manifest-digest": digest},
+            "identity": {"docker-reference": reference},
+        },
+        "optional": {"creator": "pubtools-sign"},
+    }
+
+
+def _claim_template():
+    claim = json.dumps(_manifest_claim("@digest@", "@reference@")).encode("ascii")
+    head, rest = claim.split(b'"@digest@"')
+    middle, tail = rest.split(b'"@reference@"')
+    # base64 of the head part aligned to 3 bytes is the same in all claims
+    aligned = len(head) - len(head) % 3
+    return base64.b64encode(head[:aligned]), head[aligned:], middle, tail
+
+
+_CLAIM_ENCODED_HEAD, _CLAIM_HEAD, _CLAIM_MIDDLE, _CLAIM_TAIL = _claim_template()
+
+REQUEST_ID_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_DNS, "pubtools-sign.request-id")
+
+
+def _with_occurrences(items):
+    seen = Counter()
+    for item in items:
+        yield item, seen[item]
+        seen[item] += 1
+
+
 @dataclass()
 class MsgSignerResults(SignerResults):
     """MsgSignerResults model."""
 
     status: str
     error_message: str
+    shards: Optional[List[Dict[str, Any]]] = None
+    resent: int = 0
 
     def to_dict(self: SignerResults):
         """Return dict representation of MsgSignerResults model."""
-        return {"status": self.status, "error_message": self.error_message}
+        ret = {"status": self.status, "error_message": self.error_message}
+        if self.shards is not None:
+            ret["shards"] = self.shards
+        if self.resent:
+            ret["resent"] = self.resent
+        return ret
 
     @classmethod
     def doc_arguments(cls: SignerResults) -> Dict[str, Any]:
@@ -124,26 +198,263 @@ class MsgSigner(Signer):
             "sample": "123",
         },
     )
+    message_id_header: Optional[str] = field(
+        init=False,
+        default=None,
+        metadata={
+            "description": "Reply property with message id, replies providing it are matched "
+            "without decoding their body",
+            "sample": "request_id",
+        },
+    )
     log_level: str = field(init=False, metadata={"description": "Log level", "sample": "debug"})
+    result_store: str = field(
+        init=False,
+        default="replies",
+        metadata={
+            "description": "How received replies are stored in operation results: replies "
+            "(full replies), compact (only signatures, errors and headers) or disk (compact "
+            "records spilled to a temporary file and loaded on access)",
+            "sample": "compact",
+        },
+    )
+    result_store_dir: Optional[str] = field(
+        init=False,
+        default=None,
+        metadata={
+            "description": "Directory for temporary files of disk result store",
+            "sample": "/var/tmp",
+        },
+    )
+    reply_headers: bool = field(
+        init=False,
+        default=True,
+        metadata={
+            "description": "Keep reply headers in compact results",
+            "sample": False,
+        },
+    )
+    reply_queue: Optional[str] = field(
+        init=False,
+        default=None,
+        metadata={
+            "description": "Address of queue created for replies of each signing session, "
+            "replies are then matched by correlation id. Session id is derived from the "
+            "operation and its chunk, so signing the operation again reuses its queues. "
+            "Queues are left on the broker, which should delete them when they're idle",
+            "sample": "queue://Consumer.{creator}.{task_id}.replies.{session_id}",
+        },
+    )
+    reply_selector: Optional[str] = field(
+        init=False,
+        default=None,
+        metadata={
+            "description": "Selector attached to the reply receiver, so the broker delivers "
+            "only replies of the operation",
+            "sample": "pub_task_id = '{task_id}'",
+        },
+    )
+    deterministic_request_id: bool = field(
+        init=False,
+        default=False,
+        metadata={
+            "description": "Derive request id from signing key, claim and task id instead of "
+            "random uuid, so replies to any previous attempt of the operation are accepted",
+            "sample": False,
+        },
+    )
+    shards: int = field(
+        init=False,
+        default=1,
+        metadata={
+            "description": "Number of processes the operation is split to and signed in parallel",
+            "sample": 4,
+        },
+    )
+    pin_brokers: bool = field(
+        init=False,
+        default=False,
+        metadata={
+            "description": "Connect each shard to a different messaging broker first",
+            "sample": True,
+        },
+    )
+    state_dir: Optional[str] = field(
+        init=False,
+        default=None,
+        metadata={
+            "description": "Directory with state shared by signing processes on the host, "
+            "broker health scores are kept there",
+            "sample": "~/.cache/pubtools-sign",
+        },
+    )
+    broker_cooldown: int = field(
+        init=False,
+        default=60,
+        metadata={
+            "description": "Seconds a failed broker is used only for failover, "
+            "requires state_dir",
+            "sample": 60,
+        },
+    )
+    circuit_threshold: int = field(
+        init=False,
+        default=5,
+        metadata={
+            "description": "Number of consecutive failed attempts on brokers or a topic after "
+            "which further attempts fail fast, 0 disables the circuit breaker, requires state_dir",
+            "sample": 5,
+        },
+    )
+    circuit_reset_timeout: int = field(
+        init=False,
+        default=60,
+        metadata={
+            "description": "Seconds after which a single attempt probes whether failing brokers "
+            "or topic recovered",
+            "sample": 60,
+        },
+    )
+    heartbeat: Optional[float] = field(
+        init=False,
+        default=None,
+        metadata={
+            "description": "Connection idle timeout in seconds, broker is asked for heartbeats "
+            "so a dead connection is detected within it",
+            "sample": 10,
+        },
+    )
+    connect_timeout: Optional[float] = field(
+        init=False,
+        default=None,
+        metadata={
+            "description": "Seconds to wait for a broker connection before failing over to "
+            "the next broker",
+            "sample": 5,
+        },
+    )
+    chunk_size: int = field(
+        init=False,
+        default=0,
+        metadata={
+            "description": "Maximal number of requests sent and received in one messaging "
+            "session, larger operations are signed in pipelined chunks, 0 means unlimited",
+            "sample": 10000,
+        },
+    )
+    chunk_bytes: int = field(
+        init=False,
+        default=0,
+        metadata={
+            "description": "Maximal size of request bodies in bytes sent in one messaging "
+            "session, 0 means unlimited",
+            "sample": 50000000,
+        },
+    )
+    adaptive_timeout: bool = field(
+        init=False,
+        default=False,
+        metadata={
+            "description": "Derive receive timeout from number of requests and signing service "
+            "latency observed in previous runs instead of static timeout, requires state_dir",
+            "sample": True,
+        },
+    )
+    min_timeout: int = field(
+        init=False,
+        default=10,
+        metadata={
+            "description": "Lower bound of adaptive receive timeout in seconds",
+            "sample": 10,
+        },
+    )
+    max_timeout: Optional[int] = field(
+        init=False,
+        default=None,
+        metadata={
+            "description": "Upper bound of adaptive receive timeout in seconds, static timeout "
+            "when not set",
+            "sample": 3600,
+        },
+    )
+    timeout_margin: float = field(
+        init=False,
+        default=2.0,
+        metadata={
+            "description": "Factor the expected time of replies is multiplied by in adaptive "
+            "receive timeout",
+            "sample": 2.0,
+        },
+    )
+    rate_limit: Optional[float] = field(
+        init=False,
+        default=None,
+        metadata={
+            "description": "Maximal number of signing requests per second sent to the environment "
+            "by all signing processes on the host",
+            "sample": 100,
+        },
+    )
+    key_rate_limits: Dict[str, float] = field(
+        init=False,
+        default_factory=dict,
+        metadata={
+            "description": "Signing keys mapped to maximal number of signing requests per second "
+            "sent with the key by all signing processes on the host",
+            "sample": {"container-signing-key": 50},
+        },
+    )
+    clear_sign_priority: Optional[int] = field(
+        init=False,
+        default=None,
+        metadata={
+            "description": "Priority (0-9) of clear sign requests, broker default when not set",
+            "sample": 7,
+        },
+    )
+    container_sign_priority: Optional[int] = field(
+        init=False,
+        default=None,
+        metadata={
+            "description": "Priority (0-9) of container sign requests, broker default when not set",
+            "sample": 4,
+        },
+    )
+    request_ttl: bool = field(
+        init=False,
+        default=False,
+        metadata={
+            "description": "Expire signing requests after receive timeout and expected time "
+            "of sending under rate limits, so the broker drops requests whose replies are no "
+            "longer awaited",
+            "sample": True,
+        },
+    )
+    journal: Optional[str] = field(init=False, default=None)
+    lookaside_root: Optional[str] = field(init=False, default=None)
+    lookaside_workers: int = field(init=False, default=4)
+    resume: bool = field(init=False, default=False)
 
     SUPPORTED_OPERATIONS: ClassVar[List[SignOperation]] = [
         ContainerSignOperation,
         ClearSignOperation,
     ]
 
-    def _construct_signing_message(
-        self: MsgSigner, claim, signing_key, extra_attrs: Optional[Dict] = None
-    ):
-        _extra_attrs = extra_attrs or {}
-        message = {
-            "sig_key_id": signing_key,
-            "claim_file": claim,
-            "request_id": str(uuid.uuid4()),
-            "created": isodate_now(),
-            "requested_by": self.creator,
-        }
-        message.update(_extra_attrs)
-        return message
+    def _request_id(self: MsgSigner, claim, operation: SignOperation, occurrence: int = 0):
+        # occurrence distinguishes repeated claims within one operation
+        name = json.dumps([operation.signing_key, operation.task_id, claim, occurrence])
+        return str(uuid.uuid5(REQUEST_ID_NAMESPACE, name))
+
+    def _session_id(
+        self: MsgSigner, operation: SignOperation, chunk: int, messages: List[MsgMessage]
+    ) -> str:
+        # replies of the chunk are sent to the same queue whenever the operation is signed again
+        digest = hashlib.sha256(
+            json.dumps([operation.signing_key, operation.task_id, chunk]).encode()
+        )
+        for message in messages:
+            digest.update(message.body["claim_file"].encode())
+        return digest.hexdigest()[:32]
 
     def _construct_headers(self: MsgSigner, sig_type, extra_attrs: Optional[Dict] = None):
         headers = {
@@ -157,20 +468,12 @@ class MsgSigner(Signer):
             headers.update(extra_attrs)
         return headers
 
-    def _create_msg_message(
-        self: MsgSigner, data, operation: SignOperation, sig_type: str, extra_attrs=None
-    ):
-        ret = MsgMessage(
-            headers=self._construct_headers(sig_type, extra_attrs=extra_attrs),
-            body=self._construct_signing_message(
-                data, operation.signing_key, extra_attrs=extra_attrs
-            ),
-            address=self.topic_send_to.format(
-                **dict(list(asdict(self).items()) + list(asdict(operation).items()))
-            ),
-        )
-        LOG.debug(f"Construted message with request_id {ret.body['request_id']}")
-        return ret
+    def _format_address(self: MsgSigner, template: str, operation: SignOperation, **extra):
+        # shallow field lookup, dataclasses.asdict would deep copy all operation inputs
+        values = {f.name: getattr(self, f.name, None) for f in fields(self)}
+        values.update({f.name: getattr(operation, f.name) for f in fields(operation)})
+        values.update(extra)
+        return template.format(**values)
 
     def load_config(self: MsgSigner, config_data: Dict[str, Any]) -> None:
         """Load configuration of messaging signer."""
@@ -182,16 +485,45 @@ class MsgSigner(Signer):
         self.environment = config_data["msg_signer"]["environment"]
         self.service = config_data["msg_signer"]["service"]
         self.message_id_key = config_data["msg_signer"]["message_id_key"]
+        self.message_id_header = config_data["msg_signer"]["message_id_header"]
         self.retries = config_data["msg_signer"]["retries"]
         self.log_level = config_data["msg_signer"]["log_level"]
+        self.result_store = config_data["msg_signer"]["result_store"]
+        self.reply_headers = config_data["msg_signer"]["reply_headers"]
+        self.result_store_dir = config_data["msg_signer"]["result_store_dir"]
+        self.shards = config_data["msg_signer"]["shards"]
+        self.pin_brokers = config_data["msg_signer"]["pin_brokers"]
+        self.state_dir = config_data["msg_signer"]["state_dir"]
+        self.broker_cooldown = config_data["msg_signer"]["broker_cooldown"]
+        self.circuit_threshold = config_data["msg_signer"]["circuit_threshold"]
+        self.circuit_reset_timeout = config_data["msg_signer"]["circuit_reset_timeout"]
+        self.heartbeat = config_data["msg_signer"]["heartbeat"]
+        self.connect_timeout = config_data["msg_signer"]["connect_timeout"]
+        self.chunk_size = config_data["msg_signer"]["chunk_size"]
+        self.chunk_bytes = config_data["msg_signer"]["chunk_bytes"]
+        self.adaptive_timeout = config_data["msg_signer"]["adaptive_timeout"]
+        self.min_timeout = config_data["msg_signer"]["min_timeout"]
+        self.max_timeout = config_data["msg_signer"]["max_timeout"]
+        self.timeout_margin = config_data["msg_signer"]["timeout_margin"]
+        self.rate_limit = config_data["msg_signer"]["rate_limit"]
+        self.key_rate_limits = config_data["msg_signer"]["key_rate_limits"]
+        self.clear_sign_priority = config_data["msg_signer"]["clear_sign_priority"]
+        self.container_sign_priority = config_data["msg_signer"]["container_sign_priority"]
+        self.request_ttl = config_data["msg_signer"]["request_ttl"]
         self.timeout = config_data["msg_signer"]["timeout"]
+        self.deterministic_request_id = config_data["msg_signer"]["deterministic_request_id"]
+        self.reply_queue = config_data["msg_signer"]["reply_queue"]
+        self.reply_selector = config_data["msg_signer"]["reply_selector"]
         self.creator = self._get_cert_subject_cn()
 
     def _get_cert_subject_cn(self):
-        x509 = OpenSSL.crypto.load_certificate(
-            OpenSSL.crypto.FILETYPE_PEM, open(os.path.expanduser(self.messaging_cert)).read()
+        metadata = cached(
+            "certificates", os.path.expanduser(self.messaging_cert), _certificate_metadata
         )
-        return x509.get_subject().CN
+        not_after = datetime.datetime.strptime(metadata["not_after"], "%Y%m%d%H%M%SZ")
+        if not_after < datetime.datetime.utcnow():
+            LOG.warning(f"Messaging certificate {self.messaging_cert} expired at {not_after}")
+        return metadata["cn"]
 
     def operations(self: MsgSigner) -> List[SignOperation]:
         """Return list of supported operations."""
@@ -205,6 +537,8 @@ class MsgSigner(Signer):
 
         :return: SigningResults
         """
+        if self._operation_shards() and isinstance(operation, tuple(self.SUPPORTED_OPERATIONS)):
+            return self.sign_sharded(operation)
         if isinstance(operation, ClearSignOperation):
             return self.clear_sign(operation)
         elif isinstance(operation, ContainerSignOperation):
@@ -212,84 +546,498 @@ class MsgSigner(Signer):
         else:
             raise UnsupportedOperation(operation)
 
-    def clear_sign(self: MsgSigner, operation: ClearSignOperation):
-        """Run the clearsign operation.
+    def _operation_shards(self: MsgSigner) -> Optional[int]:
+        if self.journal and self.resume:
+            # resumed operation is split to the shards it was started with, even to one shard
+            return journal_shards(self.journal)
+        return self.shards if self.shards > 1 else None
+
+    def _shard_signer(self: MsgSigner, shard: int) -> MsgSigner:
+        signer = copy.copy(self)
+        signer.shards = 1
+        if self.pin_brokers:
+            pinned = shard % len(self.messaging_brokers)
+            # remaining brokers are kept for failover
+            signer.messaging_brokers = (
+                self.messaging_brokers[pinned:] + self.messaging_brokers[:pinned]
+            )
+        if self.journal:
+            signer.journal = shard_journal(self.journal, shard)
+        return signer
+
+    def sign_sharded(self: MsgSigner, operation: SignOperation) -> SigningResults:
+        """Run signing operation split to shards signed in parallel processes.
+
+        Each shard has its own messaging connections and journal, layout of the shards
+        is recorded at the journal path. Results are merged in order of operation inputs,
+        statistics of shards are in signer results.
 
         :param operation: signing operation
-        :type operation: ClearSignOperation
+        :type operation: SignOperation
 
         :return: SigningResults
         """
         set_log_level(LOG, self.log_level)
-        messages = []
-        message_to_data = {}
-        for in_data in operation.inputs:
-            message = self._create_msg_message(
-                in_data,
-                operation,
-                "clearsig_signature",
-                extra_attrs={"pub_task_id": operation.task_id},
+        shard_operations = _split_operation(operation, self._operation_shards() or 1)
+        if self.journal and not self.resume:
+            start_shards(self.journal, len(shard_operations))
+        LOG.info(f"Signing in {len(shard_operations)} shards")
+        with multiprocessing.Pool(len(shard_operations)) as pool:
+            shard_results = pool.starmap(
+                _sign_shard,
+                [
+                    (self._shard_signer(shard), shard, shard_operation)
+                    for shard, shard_operation in enumerate(shard_operations)
+                ],
             )
-            message_to_data[message.body["request_id"]] = message
-            messages.append(message)
 
-        signer_results = MsgSignerResults(status="ok", error_message="")
-        operation_result = ClearSignResult(
-            signing_key=operation.signing_key, outputs=[""] * len(operation.inputs)
-        )
-        signing_results = SigningResults(
+        signer_results = MsgSignerResults(status="ok", error_message="", shards=[])
+        outputs = []
+        stores = []
+        for shard_signer_results, shard_outputs, stats in shard_results:
+            if isinstance(shard_outputs, DetachedStore):
+                stores.append(DiskStore.attach(shard_outputs))
+            else:
+                outputs.extend(shard_outputs)
+            if shard_signer_results.status != "ok":
+                signer_results.status = shard_signer_results.status
+                signer_results.error_message += shard_signer_results.error_message
+            signer_results.resent += shard_signer_results.resent
+            signer_results.shards.append(stats)
+        if stores:
+            outputs = ChainedStore(stores)
+
+        if isinstance(operation, ContainerSignOperation):
+            operation_result = ContainerSignResult(
+                signing_key=operation.signing_key, signed_claims=outputs
+            )
+        else:
+            operation_result = ClearSignResult(signing_key=operation.signing_key, outputs=outputs)
+        return SigningResults(
             signer=self,
             operation=operation,
             signer_results=signer_results,
             operation_result=operation_result,
         )
-        LOG.debug(f"{len(messages)} messages to send")
 
-        errors = []
-        errors = SendClient(
+    def _sign_messages(
+        self: MsgSigner,
+        operation: SignOperation,
+        create_messages: Callable[[], List[MsgMessage]],
+        signer_results: MsgSignerResults,
+    ) -> Optional[Sequence[Any]]:
+        """Send signing requests and collect replies in order of the requests.
+
+        With journal set, requests and replies are recorded in the journal. With resume
+        set, requests are loaded from the journal and only missing replies are collected.
+
+        :return: List of replies or None when signing failed
+        """
+        journal = Journal(self.journal) if self.journal else None
+        health = self._broker_health()
+        breaker = self._circuit_breaker()
+        latency = self._signer_latency()
+        try:
+            if journal and self.resume:
+                journal.check_operation(operation)
+                messages = journal.messages()
+                replies = journal.replies()
+                LOG.info(f"Resuming with {len(replies)}/{len(messages)} replies from the journal")
+                chunks = self._chunk_messages(
+                    operation,
+                    [message for message in messages if message.body["request_id"] not in replies],
+                )
+            else:
+                messages = create_messages()
+                chunks = self._chunk_messages(operation, messages)
+                if self.reply_queue:
+                    # every chunk is received in its own session
+                    for index, chunk in enumerate(chunks):
+                        reply_to = self._format_address(
+                            self.reply_queue,
+                            operation,
+                            session_id=self._session_id(operation, index, chunk),
+                        )
+                        for message in chunk:
+                            message.reply_to = reply_to
+                            message.correlation_id = message.body["request_id"]
+                replies = {}
+                if journal:
+                    journal.start(operation, messages)
+            LOG.debug(f"{len(messages)} messages to send")
+
+            if len(chunks) > 1:
+                results = self._create_result_store(operation, messages, replies)
+                self._sign_chunks(
+                    operation,
+                    chunks,
+                    results,
+                    replies,
+                    signer_results,
+                    journal,
+                    health,
+                    breaker,
+                    latency,
+                )
+            else:
+                pending = chunks[0] if chunks else []
+                sent_at = None
+                if not (journal and journal.sent):
+                    sent_at = time.monotonic()
+                    sendc = self._send_client(operation, pending, [], health, breaker, latency)
+                    errors = sendc.run()
+                    signer_results.resent += sendc.resent
+                    if errors:
+                        self._set_errors(signer_results, errors)
+                        return None
+                    if journal:
+                        journal.mark_sent()
+
+                results = self._create_result_store(operation, messages, replies)
+                errors = []
+                recvc = self._recv_client(
+                    operation,
+                    pending,
+                    errors,
+                    journal,
+                    health,
+                    breaker,
+                    latency,
+                    recv=results,
+                    sent_at=sent_at,
+                )
+                recvc.run()
+                self._record_latency(latency, operation, recvc, errors)
+                if errors:
+                    self._set_errors(signer_results, errors)
+                    if results is not None:
+                        # stores keep partial results by position
+                        results.flush()
+                    return results
+                if results is None:
+                    replies.update(recvc.recv)
+            if results is not None:
+                results.flush()
+                return results
+        finally:
+            if journal:
+                journal.close()
+            if health:
+                health.save()
+        return [replies.get(message.body["request_id"], "") for message in messages]
+
+    def _chunk_messages(
+        self: MsgSigner, operation: SignOperation, messages: List[MsgMessage]
+    ) -> List[List[MsgMessage]]:
+        """Split messages to chunks limited by chunk_size and chunk_bytes.
+
+        Messages with different reply address are never in the same chunk. Size of
+        a request body is estimated from encoded length of its claim, other fields of
+        the requests have the same length.
+
+        :return: List of chunks in order of the messages
+        """
+        chunks: List[List[MsgMessage]] = []
+        size = 0
+        overhead = 0
+        # claims of containers are base64 encoded and json encoding doesn't change their
+        # length, raw inputs grow by escaping of quotes, newlines and non-ascii characters
+        escaped = not isinstance(operation, ContainerSignOperation)
+
+        def claim_size(claim: str) -> int:
+            return len(encode_basestring_ascii(claim)) if escaped else len(claim)
+
+        if self.chunk_bytes and messages:
+            overhead = len(json.dumps(messages[0].body)) - claim_size(
+                messages[0].body["claim_file"]
+            )
+        for message in messages:
+            message_size = (
+                claim_size(message.body["claim_file"]) + overhead if self.chunk_bytes else 0
+            )
+            if not (
+                chunks
+                and (not self.chunk_size or len(chunks[-1]) < self.chunk_size)
+                and (not self.chunk_bytes or size + message_size <= self.chunk_bytes)
+                and chunks[-1][-1].reply_to == message.reply_to
+            ):
+                chunks.append([])
+                size = 0
+            chunks[-1].append(message)
+            size += message_size
+        return chunks
+
+    def _sign_chunks(
+        self: MsgSigner,
+        operation: SignOperation,
+        chunks: List[List[MsgMessage]],
+        results: Optional[RecordStore],
+        replies: Dict[str, Any],
+        signer_results: MsgSignerResults,
+        journal: Optional[Journal],
+        health: Optional[BrokerHealth],
+        breaker: Optional[CircuitBreaker],
+        latency: Optional[SignerLatency],
+    ):
+        """Send chunks of messages and receive their replies in pipeline.
+
+        Replies of a chunk are received in background while the next chunk is sent.
+        Failure of a chunk is recorded in signer results and other chunks continue,
+        replies are stored in results or replies when the chunk is finished.
+        """
+        LOG.info(f"Signing {sum(len(chunk) for chunk in chunks)} messages in {len(chunks)} chunks")
+        send = not (journal and journal.sent)
+        sent = True
+        receiving: Deque[Tuple[int, threading.Thread, RecvClient, List[MsgError]]] = deque()
+
+        def finish_chunk(number, thread, recvc, errors):
+            thread.join()
+            self._record_latency(latency, operation, recvc, errors)
+            target = replies if results is None else results
+            for request_id, reply in recvc.recv.items():
+                target[request_id] = reply
+            if errors:
+                self._set_errors(signer_results, errors, prefix=f"Chunk {number}: ")
+
+        for number, chunk in enumerate(chunks, 1):
+            # replies of at most one chunk are received while another chunk is sent
+            if len(receiving) > 1:
+                finish_chunk(*receiving.popleft())
+            sent_at = None
+            if send:
+                sent_at = time.monotonic()
+                sendc = self._send_client(operation, chunk, [], health, breaker, latency)
+                errors = sendc.run()
+                signer_results.resent += sendc.resent
+                if errors:
+                    sent = False
+                    self._set_errors(signer_results, errors, prefix=f"Chunk {number}: ")
+                    continue
+            errors = []
+            recvc = self._recv_client(
+                operation, chunk, errors, journal, health, breaker, latency, sent_at=sent_at
+            )
+            thread = threading.Thread(target=recvc.run, name=f"pubtools-sign-chunk-{number}")
+            thread.start()
+            receiving.append((number, thread, recvc, errors))
+        while receiving:
+            finish_chunk(*receiving.popleft())
+        if journal and send and sent:
+            journal.mark_sent()
+
+    def _send_client(
+        self: MsgSigner,
+        operation: SignOperation,
+        messages: List[MsgMessage],
+        errors: List[MsgError],
+        health: Optional[BrokerHealth],
+        breaker: Optional[CircuitBreaker],
+        latency: Optional[SignerLatency],
+    ) -> SendClient:
+        limiter = self._rate_limiter(operation)
+        ttl: Optional[float] = None
+        if self.request_ttl:
+            # requests are useless once their replies aren't awaited anymore, under rate limit
+            # the last requests are sent long after the first ones
+            ttl = self._receive_timeout(latency, operation, len(messages))
+            if limiter:
+                ttl += len(messages) / min(limiter.rates.values())
+        return SendClient(
             messages=messages,
             broker_urls=self.messaging_brokers,
             cert=self.messaging_cert,
             ca_cert=self.messaging_ca_cert,
             retries=self.retries,
             errors=errors,
-        ).run()
-
-        if errors:
-            signer_results.status = "error"
-            for error in errors:
-                signer_results.error_message += f"{error.name} : {error.description}\n"
-            return signing_results
-
-        message_ids = [message.body["request_id"] for message in messages]
-
-        recvc = RecvClient(
-            message_ids=message_ids,
-            topic=self.topic_listen_to.format(
-                **dict(list(asdict(self).items()) + list(asdict(operation).items()))
+            health=health,
+            breaker=breaker,
+            heartbeat=self.heartbeat,
+            connect_timeout=self.connect_timeout,
+            limiter=limiter,
+            priority=(
+                self.container_sign_priority
+                if isinstance(operation, ContainerSignOperation)
+                else self.clear_sign_priority
             ),
+            ttl=ttl,
+        )
+
+    def _recv_client(
+        self: MsgSigner,
+        operation: SignOperation,
+        messages: List[MsgMessage],
+        errors: List[MsgError],
+        journal: Optional[Journal],
+        health: Optional[BrokerHealth],
+        breaker: Optional[CircuitBreaker],
+        latency: Optional[SignerLatency],
+        recv: Optional[MutableMapping[str, Any]] = None,
+        sent_at: Optional[float] = None,
+    ) -> RecvClient:
+        reply_to = messages[0].reply_to if messages else None
+        return RecvClient(
+            message_ids=[message.body["request_id"] for message in messages],
+            topic=reply_to or self._format_address(self.topic_listen_to, operation),
             id_key=self.message_id_key,
+            id_header=self.message_id_header,
             broker_urls=self.messaging_brokers,
             cert=self.messaging_cert,
             ca_cert=self.messaging_ca_cert,
-            timeout=self.timeout,
+            timeout=self._receive_timeout(latency, operation, len(messages)),
             retries=self.retries,
             errors=errors,
+            journal=journal,
+            match_correlation_id=bool(reply_to),
+            selector=(
+                self._format_address(self.reply_selector, operation)
+                if self.reply_selector
+                else None
+            ),
+            recv=recv,
+            health=health,
+            breaker=breaker,
+            heartbeat=self.heartbeat,
+            connect_timeout=self.connect_timeout,
+            sent_at=sent_at,
+        )
+
+    def _broker_health(self: MsgSigner) -> Optional[BrokerHealth]:
+        if not self.state_dir:
+            return None
+        return BrokerHealth(
+            state_file(self.state_dir, "brokers"),
+            cooldown=self.broker_cooldown,
+            pinned=self.pin_brokers,
         )
-        recvc.run()
-        errors = recvc.errors
-        if errors:
-            signer_results.status = "error"
-            for error in errors:
-                signer_results.error_message += f"{error.name} : {error.description}\n"
-            return signing_results
 
+    def _rate_limiter(self: MsgSigner, operation: SignOperation) -> Optional[RateLimiter]:
+        rates = {}
+        if self.rate_limit:
+            rates[f"environment:{self.environment}"] = self.rate_limit
+        if operation.signing_key in self.key_rate_limits:
+            rates[f"key:{self.environment}:{operation.signing_key}"] = self.key_rate_limits[
+                operation.signing_key
+            ]
+        if not rates:
+            return None
+        # limits have to be shared by processes on the host even without state_dir
+        return RateLimiter(state_file(self.state_dir or cache_dir(), "ratelimits"), rates)
+
+    def _signer_latency(self: MsgSigner) -> Optional[SignerLatency]:
+        if not (self.state_dir and self.adaptive_timeout):
+            return None
+        return SignerLatency(state_file(self.state_dir, "signers"))
+
+    def _latency_key(self: MsgSigner, operation: SignOperation) -> str:
+        return f"{type(operation).__name__}:{self.environment}:{self.topic_send_to}"
+
+    def _receive_timeout(
+        self: MsgSigner, latency: Optional[SignerLatency], operation: SignOperation, count: int
+    ) -> float:
+        if latency is None:
+            return self.timeout
+        return latency.timeout(
+            self._latency_key(operation),
+            count,
+            margin=self.timeout_margin,
+            min_timeout=self.min_timeout,
+            max_timeout=self.max_timeout or self.timeout,
+            default=self.timeout,
+        )
+
+    def _record_latency(
+        self: MsgSigner,
+        latency: Optional[SignerLatency],
+        operation: SignOperation,
+        recvc: RecvClient,
+        errors: List[MsgError],
+    ):
+        if latency is None:
+            return
+        if any(error.name == "MessagingTimeout" for error in errors):
+            latency.record_timeout(self._latency_key(operation))
+            return
+        service_times = recvc.service_times
+        if service_times and not errors:
+            latency.record(self._latency_key(operation), *service_times)
+
+    def _circuit_breaker(self: MsgSigner) -> Optional[CircuitBreaker]:
+        if not (self.state_dir and self.circuit_threshold):
+            return None
+        return CircuitBreaker(
+            state_file(self.state_dir, "circuits"),
+            threshold=self.circuit_threshold,
+            reset_timeout=self.circuit_reset_timeout,
+        )
+
+    def _create_result_store(
+        self: MsgSigner,
+        operation: SignOperation,
+        messages: List[MsgMessage],
+        replies: Dict[str, Any],
+    ) -> Optional[RecordStore]:
+        results = self._new_result_store(operation, messages)
+        if results is not None:
+            for request_id, reply in replies.items():
+                results[request_id] = reply
+        return results
+
+    def _new_result_store(self: MsgSigner, operation: SignOperation, messages: List[MsgMessage]):
+        request_ids = (message.body["request_id"] for message in messages)
+        if self.lookaside_root and isinstance(operation, ContainerSignOperation):
+            return LookasideStore(
+                request_ids,
+                operation.references,
+                operation.digests,
+                self.lookaside_root,
+                workers=self.lookaside_workers,
+            )
+        if self.result_store == "compact":
+            return CompactStore(request_ids, keep_headers=self.reply_headers)
+        if self.result_store == "disk":
+            return DiskStore(
+                request_ids, keep_headers=self.reply_headers, directory=self.result_store_dir
+            )
+        return None
+
+    @staticmethod
+    def _set_errors(signer_results: MsgSignerResults, errors, prefix: str = ""):
+        signer_results.status = "error"
+        for error in errors:
+            signer_results.error_message += f"{prefix}{error.name} : {error.description}\n"
+
+    def clear_sign(self: MsgSigner, operation: ClearSignOperation):
+        """Run the clearsign operation.
+
+        :param operation: signing operation
+        :type operation: ClearSignOperation
+
+        :return: SigningResults
+        """
+        set_log_level(LOG, self.log_level)
+
+        def create_messages():
+            return _MessageFactory(
+                self,
+                operation,
+                "clearsig_signature",
+                extra_attrs={"pub_task_id": operation.task_id},
+            ).create(operation.inputs)
+
+        signer_results = MsgSignerResults(status="ok", error_message="")
         operation_result = ClearSignResult(
-            signing_key=operation.signing_key, outputs=[""] * len(messages)
+            signing_key=operation.signing_key, outputs=[""] * len(operation.inputs)
+        )
+        signing_results = SigningResults(
+            signer=self,
+            operation=operation,
+            signer_results=signer_results,
+            operation_result=operation_result,
         )
-        for recv_id, received in recvc.recv.items():
-            operation_result.outputs[messages.index(message_to_data[recv_id])] = received
-        signing_results.operation_result = operation_result
+
+        outputs = self._sign_messages(operation, create_messages, signer_results)
+        if outputs is not None:
+            operation_result.outputs = outputs
         return signing_results
 
     @staticmethod
@@ -299,16 +1047,35 @@ class MsgSigner(Signer):
         See below for the specification for the manifest claim that is created here
         https://github.com/containers/image/blob/master/docs/atomic-signature.md
         """
-        manifest_claim = {
-            "critical": {
-                "type": "atomic container signature",
-                "image": {"docker-manifest-digest": digest},
-                "identity": {"docker-reference": reference},
-            },
-            "optional": {"creator": "pubtools-sign"},
-        }
+        manifest_claim = _manifest_claim(digest, reference)
         return base64.b64encode(json.dumps(manifest_claim).encode("latin1")).decode("latin1")
 
+    @staticmethod
+    def create_manifest_claim_messages(signature_key, digests, references) -> List[str]:
+        """Create manifest claims for container signing in batch.
+
+        Claims are byte-identical to claims from create_manifest_claim_message, but
+        digests and references are filled into precompiled template of the claim
+        instead of serializing each claim separately.
+        """
+        return [
+            (
+                _CLAIM_ENCODED_HEAD
+                + base64.b64encode(
+                    b"".join(
+                        (
+                            _CLAIM_HEAD,
+                            encode_basestring_ascii(digest).encode("ascii"),
+                            _CLAIM_MIDDLE,
+                            encode_basestring_ascii(reference).encode("ascii"),
+                            _CLAIM_TAIL,
+                        )
+                    )
+                )
+            ).decode("ascii")
+            for digest, reference in zip(digests, references)
+        ]
+
     def container_sign(self: MsgSigner, operation: ContainerSignOperation):
         """Run container signing operation.
 
@@ -318,22 +1085,20 @@ class MsgSigner(Signer):
         :return: SigningResults
         """
         set_log_level(LOG, self.log_level)
-        messages = []
-        message_to_data = {}
         if len(operation.digests) != len(operation.references):
             raise ValueError("Digests must pairs with references")
 
-        for digest, reference in zip(operation.digests, operation.references):
-            message = self._create_msg_message(
-                self.create_manifest_claim_message(
-                    operation.signing_key, digest=digest, reference=reference
-                ),
+        def create_messages():
+            return _MessageFactory(
+                self,
                 operation,
                 "container_signature",
                 extra_attrs={"pub_task_id": operation.task_id},
+            ).create(
+                self.create_manifest_claim_messages(
+                    operation.signing_key, operation.digests, operation.references
+                )
             )
-            message_to_data[message.body["request_id"]] = message
-            messages.append(message)
 
         signer_results = MsgSignerResults(status="ok", error_message="")
         operation_result = ContainerSignResult(
@@ -345,53 +1110,164 @@ class MsgSigner(Signer):
             signer_results=signer_results,
             operation_result=operation_result,
         )
-        LOG.debug(f"{len(messages)} messages to send")
 
-        errors = SendClient(
-            messages=messages,
-            broker_urls=self.messaging_brokers,
-            cert=self.messaging_cert,
-            ca_cert=self.messaging_ca_cert,
-            retries=self.retries,
-        ).run()
+        signed_claims = self._sign_messages(operation, create_messages, signer_results)
+        if signed_claims is not None:
+            operation_result.signed_claims = signed_claims
+        return signing_results
 
-        if errors:
-            signer_results.status = "error"
-            for error in errors:
-                signer_results.error_message += f"{error.name} : {error.description}\n"
-            return signing_results
 
-        message_ids = [message.body["request_id"] for message in messages]
+def _random_request_ids(count: int) -> List[str]:
+    # version 4 uuids like uuid.uuid4(), but from one urandom call for all of them
+    raw = bytearray(os.urandom(16 * count))
+    for offset in range(0, len(raw), 16):
+        raw[offset + 6] = (raw[offset + 6] & 0x0F) | 0x40
+        raw[offset + 8] = (raw[offset + 8] & 0x3F) | 0x80
+    hexed = raw.hex()
+    return [
+        f"{hexed[x:x + 8]}-{hexed[x + 8:x + 12]}-{hexed[x + 12:x + 16]}-"
+        f"{hexed[x + 16:x + 20]}-{hexed[x + 20:x + 32]}"
+        for x in range(0, len(hexed), 32)
+    ]
 
-        recvc = RecvClient(
-            message_ids=message_ids,
-            topic=self.topic_listen_to.format(
-                **dict(list(asdict(self).items()) + list(asdict(operation).items()))
-            ),
-            id_key=self.message_id_key,
-            broker_urls=self.messaging_brokers,
-            cert=self.messaging_cert,
-            ca_cert=self.messaging_ca_cert,
-            timeout=self.timeout,
-            retries=self.retries,
-            errors=errors,
-        )
-        recvc.run()
-        errors = recvc.errors
 
-        if recvc.errors:
-            signer_results.status = "error"
-            for error in errors:
-                signer_results.error_message += f"{error.name} : {error.description}\n"
-            return signing_results
+class _MessageFactory:
+    """Factory of signing messages of one operation.
 
-        operation_result = ContainerSignResult(
-            signing_key=operation.signing_key, signed_claims=[""] * len(messages)
+    Messages share one headers dict, address and created timestamp of the
+    batch and request ids are generated for the whole batch at once.
+    """
+
+    def __init__(
+        self,
+        signer: MsgSigner,
+        operation: SignOperation,
+        sig_type: str,
+        extra_attrs: Optional[Dict[str, Any]] = None,
+    ):
+        self.signer = signer
+        self.operation = operation
+        self.extra_attrs = extra_attrs or {}
+        self.headers = signer._construct_headers(sig_type, extra_attrs=extra_attrs)
+        self.address = signer._format_address(signer.topic_send_to, operation)
+
+    def _request_ids(self, claims: Sequence[str]) -> List[str]:
+        if not self.signer.deterministic_request_id:
+            return _random_request_ids(len(claims))
+        return [
+            self.signer._request_id(claim, self.operation, occurrence)
+            for claim, occurrence in _with_occurrences(claims)
+        ]
+
+    def create(self, claims: Sequence[str]) -> List[MsgMessage]:
+        """Create signing messages for the claims.
+
+        :param claims: claims to sign in order of operation inputs
+        :type claims: Sequence[str]
+        :return: List[MsgMessage]
+        """
+        headers, address, extra_attrs = self.headers, self.address, self.extra_attrs
+        signing_key = self.operation.signing_key
+        creator = self.signer.creator
+        created = isodate_now()
+        messages = [
+            MsgMessage(
+                headers=headers,
+                address=address,
+                body={
+                    "sig_key_id": signing_key,
+                    "claim_file": claim,
+                    "request_id": request_id,
+                    "created": created,
+                    "requested_by": creator,
+                    **extra_attrs,
+                },
+            )
+            for claim, request_id in zip(claims, self._request_ids(claims))
+        ]
+        LOG.debug(f"Constructed {len(messages)} messages")
+        return messages
+
+
+def _certificate_metadata(path: str) -> Dict[str, str]:
+    with open(path) as f:
+        x509 = OpenSSL.crypto.load_certificate(OpenSSL.crypto.FILETYPE_PEM, f.read())
+    return {"cn": x509.get_subject().CN, "not_after": x509.get_notAfter().decode("ascii")}
+
+
+def _split_operation(operation: SignOperation, shards: int) -> List[SignOperation]:
+    if isinstance(operation, ContainerSignOperation):
+        if len(operation.digests) != len(operation.references):
+            raise ValueError("Digests must pairs with references")
+        size = len(operation.digests)
+    else:
+        size = len(operation.inputs)
+    shards = max(1, min(shards, size))
+    bounds = [size * shard // shards for shard in range(shards + 1)]
+    if isinstance(operation, ContainerSignOperation):
+        return [
+            ContainerSignOperation(
+                digests=operation.digests[start:end],
+                references=operation.references[start:end],
+                signing_key=operation.signing_key,
+                task_id=operation.task_id,
+            )
+            for start, end in zip(bounds, bounds[1:])
+        ]
+    return [
+        ClearSignOperation(
+            inputs=operation.inputs[start:end],
+            signing_key=operation.signing_key,
+            task_id=operation.task_id,
         )
-        for recv_id, received in recvc.recv.items():
-            operation_result.signed_claims[messages.index(message_to_data[recv_id])] = received
-        signing_results.operation_result = operation_result
-        return signing_results
+        for start, end in zip(bounds, bounds[1:])
+    ]
+
+
+def _sign_shard(signer: MsgSigner, shard: int, operation: SignOperation):
+    started = time.monotonic()
+    signing_results = signer.sign(operation)
+    duration = time.monotonic() - started
+    if isinstance(operation, ContainerSignOperation):
+        outputs = signing_results.operation_result.signed_claims
+    else:
+        outputs = signing_results.operation_result.outputs
+    stats = {
+        "shard": shard,
+        "size": len(outputs),
+        "broker": signer.messaging_brokers[0],
+        "status": signing_results.signer_results.status,
+        "duration": duration,
+        "throughput": len(outputs) / duration if duration else 0.0,
+    }
+    if isinstance(outputs, LookasideStore):
+        stats["lookaside"] = outputs.summary()
+    if isinstance(outputs, DiskStore):
+        # records stay on disk, the parent process attaches the store file
+        shard_outputs = outputs.detach()
+    else:
+        # other stores are bound to the shard process, results are sent back as list
+        shard_outputs = list(outputs)
+    return signing_results.signer_results, shard_outputs, stats
+
+
+def _lookaside_summary(signing_result: SigningResults, root: str) -> Dict[str, Any]:
+    signed_claims = signing_result.operation_result.signed_claims
+    if isinstance(signed_claims, LookasideStore):
+        return signed_claims.summary()
+    summary = empty_summary(root, len(signed_claims))
+    shard_summaries = [
+        stats["lookaside"]
+        for stats in signing_result.signer_results.shards or []
+        if "lookaside" in stats
+    ]
+    if shard_summaries:
+        summary["missing"] = 0
+    for shard_summary in shard_summaries:
+        for key in ("written", "existing", "failed", "missing"):
+            summary[key] += shard_summary[key]
+        summary["failures"].extend(shard_summary["failures"])
+    return summary
 
 
 def _get_config_file(config_candidate):
@@ -406,11 +1282,45 @@ def _get_config_file(config_candidate):
     return config_candidate
 
 
-def _msg_clear_sign(inputs, signing_key=None, task_id=None, config=None):
+def _json_result(result):
+    if isinstance(result, MsgReply):
+        return tuple(result)
+    if isinstance(result, SignatureRecord):
+        return result.to_dict()
+    return result
+
+
+def _json_results(results):
+    return [_json_result(result) for result in results]
+
+
+def _set_shards(msg_signer, shards=None):
+    if shards is not None:
+        msg_signer.shards = shards
+
+
+def _set_journal(msg_signer, journal=None, resume=None):
+    if journal and resume:
+        raise click.UsageError("--journal and --resume are mutually exclusive")
+    msg_signer.journal = resume or journal
+    msg_signer.resume = bool(resume)
+
+
+def _msg_clear_sign(
+    inputs,
+    signing_key=None,
+    task_id=None,
+    config=None,
+    journal=None,
+    resume=None,
+    shards=None,
+):
     """Run clearsign operation."""
     msg_signer = MsgSigner()
     config = _get_config_file(config)
     msg_signer.load_config(load_config(os.path.expanduser(config)))
+    _set_journal(msg_signer, journal=journal, resume=resume)
+    _set_shards(msg_signer, shards=shards)
 
     str_inputs = []
     for input_ in inputs:
@@ -422,7 +1332,7 @@ def _msg_clear_sign(inputs, signing_key=None, task_id=None, config=None):
     signing_result = msg_signer.sign(operation)
     return {
         "signer_result": signing_result.signer_results.to_dict(),
-        "operation_results": signing_result.operation_result.outputs,
+        "operation_results": _json_results(signing_result.operation_result.outputs),
         "signing_key": signing_result.operation_result.signing_key,
     }
 
@@ -435,10 +1345,41 @@ def _msg_clear_sign(inputs, signing_key=None, task_id=None, config=None):
 )
 @click.option("--task-id", required=True, help="Task id identifier (usually pub task-id)")
 @click.option("--config", default=CONFIG_PATHS[0], help="path to the config file")
+@click.option(
+    "--journal",
+    type=click.Path(dir_okay=False),
+    help="Record sent requests and received replies to this journal file",
+)
+@click.option(
+    "--resume",
+    type=click.Path(exists=True, dir_okay=False),
+    help="Collect only missing replies of the operation recorded in this journal file",
+)
+@click.option(
+    "--shards",
+    type=click.IntRange(min=1),
+    help="Split the operation to this number of processes signing in parallel",
+)
 @click.argument("inputs", nargs=-1)
-def msg_clear_sign(inputs, signing_key=None, task_id=None, config=None):
+def msg_clear_sign(
+    inputs,
+    signing_key=None,
+    task_id=None,
+    config=None,
+    journal=None,
+    resume=None,
+    shards=None,
+):
     """Run clearsign operation with cli arguments."""
-    return _msg_clear_sign(inputs, signing_key=signing_key, task_id=task_id, config=config)
+    return _msg_clear_sign(
+        inputs,
+        signing_key=signing_key,
+        task_id=task_id,
+        config=config,
+        journal=journal,
+        resume=resume,
+        shards=shards,
+    )
 
 
 @click.command()
@@ -449,6 +1390,21 @@ def msg_clear_sign(inputs, signing_key=None, task_id=None, config=None):
 )
 @click.option("--task-id", required=True, help="Task id identifier (usually pub task-id)")
 @click.option("--config", default=CONFIG_PATHS[0], help="path to the config file")
+@click.option(
+    "--journal",
+    type=click.Path(dir_okay=False),
+    help="Record sent requests and received replies to this journal file",
+)
+@click.option(
+    "--resume",
+    type=click.Path(exists=True, dir_okay=False),
+    help="Collect only missing replies of the operation recorded in this journal file",
+)
+@click.option(
+    "--shards",
+    type=click.IntRange(min=1),
+    help="Split the operation to this number of processes signing in parallel",
+)
 @click.option(
     "--digest",
     required=True,
@@ -463,21 +1419,53 @@ def msg_clear_sign(inputs, signing_key=None, task_id=None, config=None):
     type=str,
     help="References which should be signed.",
 )
-def msg_container_sign(signing_key=None, task_id=None, config=None, digest=None, reference=None):
+@click.option(
+    "--lookaside-root",
+    type=click.Path(file_okay=False),
+    help="Write signatures to containers/image lookaside directory layout under this root "
+    "and print only summary",
+)
+@click.option(
+    "--lookaside-workers",
+    type=int,
+    default=4,
+    show_default=True,
+    help="Number of threads writing signatures to lookaside directory",
+)
+def msg_container_sign(
+    signing_key=None,
+    task_id=None,
+    config=None,
+    digest=None,
+    reference=None,
+    journal=None,
+    resume=None,
+    lookaside_root=None,
+    lookaside_workers=4,
+    shards=None,
+):
     """Run containersign operation with cli arguments."""
     msg_signer = MsgSigner()
     config = _get_config_file(config)
     msg_signer.load_config(load_config(os.path.expanduser(config)))
+    _set_journal(msg_signer, journal=journal, resume=resume)
+    _set_shards(msg_signer, shards=shards)
+    msg_signer.lookaside_root = lookaside_root
+    msg_signer.lookaside_workers = lookaside_workers
 
     operation = ContainerSignOperation(
         digests=digest, references=reference, signing_key=signing_key, task_id=task_id
     )
     signing_result = msg_signer.sign(operation)
-    return {
+    ret = {
         "signer_result": signing_result.signer_results.to_dict(),
-        "operation_results": signing_result.operation_result.outputs,
         "signing_key": signing_result.operation_result.signing_key,
     }
+    if lookaside_root:
+        ret["lookaside"] = _lookaside_summary(signing_result, lookaside_root)
+    else:
+        ret["operation_results"] = _json_results(signing_result.operation_result.signed_claims)
+    return ret
 
 
 def msg_clear_sign_main():
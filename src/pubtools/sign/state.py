@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+from contextlib import contextmanager
+import fcntl
+import json
+import logging
+import os
+import tempfile
+from typing import Any, Dict, Iterator
+
+LOG = logging.getLogger("pubtools.sign.state")
+
+
+class StateFile:
+    """Small json state shared by all signing processes on the host.
+
+    Updates are serialized by an exclusive lock on <path>.lock and the file is
+    replaced atomically, so readers never see a partially written state.
+    Missing or corrupted state is treated as empty.
+    """
+
+    def __init__(self, path: str):
+        """State file initializer.
+
+        :param path: Path to the state file
+        :type path: str
+        """
+        self.path = path
+
+    def load(self) -> Dict[str, Any]:
+        """Return current state.
+
+        :return: Dict[str, Any]
+        """
+        try:
+            with open(self.path) as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except ValueError:
+            LOG.warning(f"Ignoring corrupted state file {self.path}")
+            return {}
+        return state if isinstance(state, dict) else {}
+
+    @contextmanager
+    def update(self) -> Iterator[Dict[str, Any]]:
+        """Lock the state and yield it for modification, changes are saved on exit."""
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        with open(self.path + ".lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            state = self.load()
+            yield state
+            with tempfile.NamedTemporaryFile(
+                "w", dir=directory, prefix=".state-", delete=False
+            ) as f:
+                json.dump(state, f)
+            os.replace(f.name, self.path)
+
+
+def state_file(state_dir: str, name: str) -> StateFile:
+    """Return state file with the name in the state directory.
+
+    :param state_dir: Directory with shared state
+    :type state_dir: str
+    :param name: Name of the state file
+    :type name: str
+    :return: StateFile
+    """
+    return StateFile(os.path.join(os.path.expanduser(state_dir), f"{name}.json"))
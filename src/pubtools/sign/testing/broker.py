@@ -0,0 +1,113 @@
+import collections
+import logging
+import uuid
+
+from proton import Endpoint
+from proton.handlers import MessagingHandler
+
+LOG = logging.getLogger("pubtools.sign.testing.broker")
+
+
+class _Queue(object):
+    def __init__(self, address, dynamic=False):
+        self.address = address
+        self.dynamic = dynamic
+        self.queue = collections.deque()
+        self.consumers = []
+
+    def subscribe(self, consumer):
+        self.consumers.append(consumer)
+
+    def unsubscribe(self, consumer):
+        if consumer in self.consumers:
+            self.consumers.remove(consumer)
+        return len(self.consumers) == 0 and (self.dynamic or len(self.queue) == 0)
+
+    def publish(self, message):
+        self.queue.append(message)
+        self.dispatch()
+
+    def dispatch(self, consumer=None):
+        consumers = [consumer] if consumer else self.consumers
+        while self._deliver_to(consumers):
+            pass
+
+    def _deliver_to(self, consumers):
+        result = False
+        for consumer in consumers:
+            if consumer.credit and self.queue:
+                consumer.send(self.queue.popleft())
+                result = True
+        return result
+
+
+class Broker(MessagingHandler):
+    """Minimal in-memory AMQP 1.0 broker.
+
+    Every address behaves like a queue: messages are stored until a consumer
+    attaches and are distributed round-robin between consumers. Dynamic
+    receivers get a freshly generated address.
+    """
+
+    def __init__(self, url):
+        """Broker initializer.
+
+        :param url: Address where the broker listens for connections (for example localhost:5672)
+        :type url: str
+        """
+        super().__init__()
+        self.url = url
+        self.queues = {}
+
+    def on_start(self, event):
+        """Start listening on the configured address."""
+        LOG.debug("BROKER: listening on %s", self.url)
+        self.acceptor = event.container.listen(self.url)
+
+    def _queue(self, address):
+        if address not in self.queues:
+            self.queues[address] = _Queue(address)
+        return self.queues[address]
+
+    def on_link_opening(self, event):
+        """Bind opening links to queues."""
+        if event.link.is_sender:
+            if event.link.remote_source.dynamic:
+                address = str(uuid.uuid4())
+                event.link.source.address = address
+                queue = _Queue(address, True)
+                self.queues[address] = queue
+                queue.subscribe(event.link)
+            elif event.link.remote_source.address:
+                event.link.source.address = event.link.remote_source.address
+                self._queue(event.link.source.address).subscribe(event.link)
+        elif event.link.remote_target.address:
+            event.link.target.address = event.link.remote_target.address
+
+    def _unsubscribe(self, link):
+        address = link.source.address
+        if address in self.queues and self.queues[address].unsubscribe(link):
+            del self.queues[address]
+
+    def on_link_closing(self, event):
+        """Unsubscribe closed consumers."""
+        if event.link.is_sender:
+            self._unsubscribe(event.link)
+
+    def on_disconnected(self, event):
+        """Unsubscribe all consumers of the disconnected connection."""
+        link = event.connection.link_head(Endpoint.REMOTE_ACTIVE)
+        while link:
+            if link.is_sender:
+                self._unsubscribe(link)
+            link = link.next(Endpoint.REMOTE_ACTIVE)
+
+    def on_sendable(self, event):
+        """Deliver queued messages to consumer with credit."""
+        self._queue(event.link.source.address).dispatch(event.link)
+
+    def on_message(self, event):
+        """Store incoming message in the target queue."""
+        address = event.link.target.address or event.message.address
+        LOG.debug("BROKER: publish to %s", address)
+        self._queue(address).publish(event.message)
@@ -0,0 +1,330 @@
+from __future__ import annotations
+
+import collections
+import dataclasses
+import json
+import logging
+import math
+import random
+import time
+import uuid
+from multiprocessing import Process
+from typing import Any, Dict, Optional
+
+import click
+import proton
+from proton.handlers import MessagingHandler
+from proton.reactor import ApplicationEvent, Container, EventInjector
+
+from .broker import Broker
+
+LOG = logging.getLogger("pubtools.sign.testing.fake_signer")
+
+LATENCY_DISTRIBUTIONS = ("constant", "uniform", "exponential", "lognormal")
+
+
+@dataclasses.dataclass
+class ChaosConfig:
+    """Behaviour of the fake signer.
+
+    All rates are probabilities in range <0, 1> applied to every incoming request.
+    """
+
+    latency_distribution: str = "constant"
+    latency_mean: float = 0.0
+    latency_spread: float = 0.0
+    reorder_window: int = 0
+    reorder_flush: float = 0.5
+    duplicate_rate: float = 0.0
+    drop_rate: float = 0.0
+    stray_rate: float = 0.0
+    max_replies_per_second: float = 0.0
+    seed: Optional[int] = None
+
+    def __post_init__(self):
+        """Validate configuration values."""
+        if self.latency_distribution not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(
+                f"Unknown latency distribution {self.latency_distribution}, "
+                f"expected one of {LATENCY_DISTRIBUTIONS}"
+            )
+        for rate in ("duplicate_rate", "drop_rate", "stray_rate"):
+            if not 0.0 <= getattr(self, rate) <= 1.0:
+                raise ValueError(f"{rate} has to be in range <0, 1>")
+
+
+class _Callback(proton.Handler):
+    def __init__(self, callback, *args):
+        self.callback = callback
+        self.args = args
+
+    def on_timer_task(self, event):
+        self.callback(*self.args)
+
+
+class FakeSigner(MessagingHandler):
+    """Stand-in for the remote signing service.
+
+    Listens for signing requests and replies with fake signatures in the same
+    format as the real signer. Replies can be delayed, reordered, duplicated,
+    dropped, mixed with stray traffic and throttled according to ChaosConfig.
+    """
+
+    def __init__(
+        self,
+        broker_urls,
+        listen_to,
+        send_to,
+        id_key="request_id",
+        chaos: Optional[ChaosConfig] = None,
+        cert=None,
+        ca_cert=None,
+    ):
+        """Fake signer initializer.
+
+        :param broker_urls: List of broker urls
+        :type broker_urls: List[str]
+        :param listen_to: Address where signing requests are consumed from
+        :type listen_to: str
+        :param send_to: Address where replies are sent to
+        :type send_to: str
+        :param id_key: Attribute name in message body which is considered as id
+        :type id_key: str
+        :param chaos: Fake signer behaviour
+        :type chaos: ChaosConfig
+        :param cert: Messaging client certificate
+        :type cert: str
+        :param ca_cert: Messaging ca certificate
+        :type ca_cert: str
+        """
+        super().__init__()
+        self.broker_urls = broker_urls
+        self.listen_to = listen_to
+        self.send_to = send_to
+        self.id_key = id_key
+        self.chaos = chaos or ChaosConfig()
+        self.random = random.Random(self.chaos.seed)  # nosec B311
+        self.ssl_domain = proton.SSLDomain(proton.SSLDomain.MODE_CLIENT)
+        if cert:
+            self.ssl_domain.set_credentials(cert, cert, None)
+        if ca_cert:
+            self.ssl_domain.set_trusted_ca_db(ca_cert)
+        self.ssl_domain.set_peer_authentication(proton.SSLDomain.ANONYMOUS_PEER)
+        self.stats = collections.Counter()
+        self.reorder_buffer = []
+        self.outgoing = collections.deque()
+        self.next_send_at = 0.0
+        self.pump_scheduled = False
+        self.flush_scheduled = False
+        self.sender = None
+        self.injector = EventInjector()
+
+    def on_start(self, event):
+        """Connect to the broker and attach request receiver and reply sender."""
+        LOG.debug("FAKE SIGNER: On start %s %s", self.listen_to, self.broker_urls)
+        self.container = event.container
+        self.container.selectable(self.injector)
+        self.conn = event.container.connect(
+            urls=self.broker_urls, ssl_domain=self.ssl_domain, sasl_enabled=False
+        )
+        self.receiver = event.container.create_receiver(self.conn, self.listen_to)
+        self.sender = event.container.create_sender(self.conn)
+
+    def stop(self):
+        """Stop the fake signer. Safe to call from any thread."""
+        self.injector.trigger(ApplicationEvent("fake_signer_stop"))
+
+    def on_fake_signer_stop(self, event):
+        """Close the connection and stop the container."""
+        self.conn.close()
+        self.injector.close()
+        self.container.stop()
+
+    def latency(self):
+        """Return random reply latency in seconds according to the configuration."""
+        mean = self.chaos.latency_mean
+        spread = self.chaos.latency_spread
+        distribution = self.chaos.latency_distribution
+        if distribution == "uniform":
+            return self.random.uniform(max(0.0, mean - spread), mean + spread)
+        if distribution == "exponential":
+            return self.random.expovariate(1.0 / mean) if mean > 0 else 0.0
+        if distribution == "lognormal":
+            if mean <= 0:
+                return 0.0
+            return self.random.lognormvariate(math.log(mean) - spread**2 / 2.0, spread)
+        return mean
+
+    def create_reply(self, request_body, properties, reply_to=None, correlation_id=None):
+        """Create reply message for the signing request.
+
+        :param request_body: Decoded body of the signing request
+        :type request_body: Dict[str, Any]
+        :param properties: Application properties of the signing request
+        :type properties: Dict[str, Any]
+        :param reply_to: Reply address requested by the client, send_to is used when not set
+        :type reply_to: str
+        :param correlation_id: Correlation id of the signing request
+        :type correlation_id: str
+        :return: proton.Message
+        """
+        reply_msg = dict(request_body)
+        if (properties or {}).get("mtype") == "clearsig_signature":
+            reply_msg["signed_data"] = request_body.get("claim_file", "")
+        else:
+            reply_msg["signed_claim"] = request_body.get("claim_file", "")
+        reply_msg["errors"] = []
+        reply = proton.Message(
+            address=reply_to or self.send_to,
+            body=json.dumps({"msg": reply_msg}),
+            properties=dict(properties or {}, **{self.id_key: request_body.get(self.id_key)}),
+            correlation_id=correlation_id,
+        )
+        return reply
+
+    def create_stray_reply(self):
+        """Create reply which belongs to a different task and request."""
+        properties = {"mtype": "container_signature", "pub_task_id": f"stray-{uuid.uuid4()}"}
+        body = {self.id_key: str(uuid.uuid4()), "claim_file": "stray"}
+        return self.create_reply(body, properties)
+
+    def on_message(self, event):
+        """Handle signing request."""
+        self.stats["received"] += 1
+        if self.random.random() < self.chaos.drop_rate:
+            LOG.debug("FAKE SIGNER: Dropped request")
+            self.stats["dropped"] += 1
+            return
+        reply = self.create_reply(
+            json.loads(event.message.body),
+            event.message.properties,
+            reply_to=event.message.reply_to,
+            correlation_id=event.message.correlation_id,
+        )
+        copies = 1
+        if self.random.random() < self.chaos.duplicate_rate:
+            self.stats["duplicated"] += 1
+            copies = 2
+        for _ in range(copies):
+            self._schedule(self.latency(), self._release, reply)
+        if self.random.random() < self.chaos.stray_rate:
+            self.stats["strays"] += 1
+            self._schedule(self.latency(), self._release, self.create_stray_reply())
+
+    def _schedule(self, delay, callback, *args):
+        if delay > 0:
+            self.container.schedule(delay, _Callback(callback, *args))
+        else:
+            callback(*args)
+
+    def _release(self, reply):
+        if self.chaos.reorder_window <= 1:
+            self.outgoing.append(reply)
+        else:
+            self.reorder_buffer.append(reply)
+            if len(self.reorder_buffer) >= self.chaos.reorder_window:
+                self.outgoing.append(
+                    self.reorder_buffer.pop(self.random.randrange(len(self.reorder_buffer)))
+                )
+            if not self.flush_scheduled:
+                self.flush_scheduled = True
+                self.container.schedule(self.chaos.reorder_flush, _Callback(self._flush))
+        self._pump()
+
+    def _flush(self):
+        self.flush_scheduled = False
+        self.random.shuffle(self.reorder_buffer)
+        self.outgoing.extend(self.reorder_buffer)
+        self.reorder_buffer = []
+        self._pump()
+
+    def _pump(self):
+        self.pump_scheduled = False
+        while self.outgoing and self.sender and self.sender.credit:
+            if self.chaos.max_replies_per_second:
+                now = time.monotonic()
+                if now < self.next_send_at:
+                    if not self.pump_scheduled:
+                        self.pump_scheduled = True
+                        self.container.schedule(self.next_send_at - now, _Callback(self._pump))
+                    return
+                self.next_send_at = (
+                    max(now, self.next_send_at) + 1.0 / self.chaos.max_replies_per_second
+                )
+            self.sender.send(self.outgoing.popleft())
+            self.stats["replied"] += 1
+
+    def on_sendable(self, event):
+        """Send pending replies when sender gets credit."""
+        self._pump()
+
+
+def _start_broker(url):
+    broker = Process(target=Container(Broker(url)).run, args=())
+    broker.start()
+    return broker
+
+
+@click.command()
+@click.option("--broker-url", required=True, multiple=True, help="Messaging broker url")
+@click.option("--listen-to", required=True, help="Address where signing requests are sent")
+@click.option("--send-to", required=True, help="Address where replies should be sent")
+@click.option("--id-key", default="request_id", help="Attribute name of message id")
+@click.option("--cert", default=None, help="Messaging client certificate")
+@click.option("--ca-cert", default=None, help="Messaging CA certificate")
+@click.option(
+    "--embedded-broker",
+    is_flag=True,
+    default=False,
+    help="Start in-memory broker listening on the first broker url",
+)
+@click.option(
+    "--latency-distribution",
+    type=click.Choice(LATENCY_DISTRIBUTIONS),
+    default="constant",
+    help="Distribution of per-reply latency",
+)
+@click.option("--latency-mean", type=float, default=0.0, help="Mean reply latency in seconds")
+@click.option(
+    "--latency-spread",
+    type=float,
+    default=0.0,
+    help="Half-width for uniform distribution, sigma for lognormal distribution",
+)
+@click.option("--reorder-window", type=int, default=0, help="Number of replies to shuffle")
+@click.option("--duplicate-rate", type=float, default=0.0, help="Probability of duplicate reply")
+@click.option("--drop-rate", type=float, default=0.0, help="Probability of dropped reply")
+@click.option("--stray-rate", type=float, default=0.0, help="Probability of unrelated reply")
+@click.option(
+    "--max-replies-per-second", type=float, default=0.0, help="Throughput cap, 0 for unlimited"
+)
+@click.option("--seed", type=int, default=None, help="Random seed")
+def fake_signer(
+    broker_url,
+    listen_to,
+    send_to,
+    id_key,
+    cert,
+    ca_cert,
+    embedded_broker,
+    **chaos_options: Dict[str, Any],
+):
+    """Run fake signer service."""
+    chaos = ChaosConfig(**chaos_options)
+    broker = _start_broker(broker_url[0]) if embedded_broker else None
+    signer = FakeSigner(
+        list(broker_url), listen_to, send_to, id_key=id_key, chaos=chaos, cert=cert, ca_cert=ca_cert
+    )
+    try:
+        Container(signer).run()
+    except KeyboardInterrupt:  # pragma: no cover
+        pass
+    finally:
+        if broker:
+            broker.terminate()
+    click.echo(json.dumps(dict(signer.stats)))
+
+
+def fake_signer_main():
+    """Entry point method for the fake signer service."""
+    fake_signer()
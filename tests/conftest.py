@@ -1,151 +1,26 @@
-import collections
 import json
 import socket
 import logging
 from multiprocessing import Process
 import threading
 import tempfile
-import uuid
 
 from .conftest_msgsig import f_msg_signer  # noqa: F401
 
 
-from proton import Endpoint
 from proton.reactor import Container
 import proton
 from proton import Message
 
 from pytest import fixture
 
-from pubtools.sign.clients.msg import _MsgClient
+from pubtools.sign.testing.broker import Broker
 
 
 LOG = logging.getLogger("pubtools.sign.signers.radas")
 
 
-class _Queue(object):
-    def __init__(self, address, dynamic=False):
-        self.address = address
-        self.dynamic = dynamic
-        self.queue = collections.deque()
-        self.consumers = []
-
-    def subscribe(self, consumer):
-        LOG.debug("QUEUE SUBSCRIBED: %s %s", self.address, consumer)
-        self.consumers.append(consumer)
-
-    def unsubscribe(self, consumer):
-        LOG.debug("QUEUE UNSUBSCRIBED: %s %s", self.address, consumer)
-        if consumer in self.consumers:
-            self.consumers.remove(consumer)
-        return len(self.consumers) == 0 and (self.dynamic or len(self.queue) == 0)
-
-    def publish(self, message):
-        self.queue.append(message)
-        self.dispatch()
-
-    def dispatch(self, consumer=None):
-        if consumer:
-            c = [consumer]
-        else:
-            c = self.consumers
-        LOG.debug("QUEUE DISPATCH TO %s %s", self.address, c)
-        while self._deliver_to(c):
-            pass
-
-    def _deliver_to(self, consumers):
-        try:
-            result = False
-            for c in consumers:
-                if c.credit:
-                    message = self.queue.popleft()
-                    LOG.debug("QUEUE DELIVER TO %s %s", self.address, c, message)
-                    c.send(message)
-                    result = True
-            return result
-        except IndexError:  # no more messages
-            LOG.debug("QUEUE NOTHING TO DELIVER %s", self.address)
-            return False
-
-
-class _Broker(_MsgClient):
-    def __init__(self, url):
-        super().__init__(errors=[])
-        self.url = url
-        self.queues = {}
-
-    def on_start(self, event):
-        LOG.debug("BROKER on start", self.url)
-        self.acceptor = event.container.listen(self.url)
-
-    def _queue(self, address):
-        if address not in self.queues:
-            self.queues[address] = _Queue(address)
-        return self.queues[address]
-
-    def on_link_opening(self, event):
-        LOG.debug(
-            "BROKER on_link_opening event",
-            event.link,
-            "source addr:",
-            event.link.source.address,
-            "remote source addr",
-            event.link.remote_source.address,
-            "target addr:",
-            event.link.target.address,
-            "remote target addr",
-            event.link.remote_target.address,
-        )
-        if event.link.is_sender:
-            if event.link.remote_source.dynamic:
-                address = str(uuid.uuid4())
-                event.link.source.address = address
-                q = _Queue(address, True)
-                self.queues[address] = q
-                q.subscribe(event.link)
-            elif event.link.remote_source.address:
-                event.link.source.address = event.link.remote_source.address
-                self._queue(event.link.source.address).subscribe(event.link)
-        elif event.link.remote_target.address:
-            event.link.target.address = event.link.remote_target.address
-
-    def _unsubscribe(self, link):
-        if link.source.address in self.queues and self.queues[link.source.address].unsubscribe(
-            link
-        ):
-            del self.queues[link.source.address]
-
-    def on_link_closing(self, event):
-        LOG.debug(">> BROKER On link closing", event)
-        if event.link.is_sender:
-            self._unsubscribe(event.link)
-
-    def on_disconnected(self, event):
-        LOG.debug(">> BROKER On disconnected", event)
-        self.remove_stale_consumers(event.connection)
-
-    def remove_stale_consumers(self, connection):
-        link = connection.link_head(Endpoint.REMOTE_ACTIVE)
-        LOG.debug("BROKER removing stale consumer", link)
-        while link:
-            if link.is_sender:
-                self._unsubscribe(link)
-            link = link.next(Endpoint.REMOTE_ACTIVE)
-
-    def on_sendable(self, event):
-        LOG.debug("BROKER on_sendable", event.link.source.address)
-        self._queue(event.link.source.address).dispatch(event.link)
-
-    def on_message(self, event):
-        LOG.debug("BROKER ON MESSAGE", event.message)
-        address = event.link.target.address
-        if address is None:
-            address = event.message.address
-        LOG.debug("BROKER publish", address)
-        self._queue(address).publish(event.message)
-
-
-class _BrokenBroker(_Broker):
+class _BrokenBroker(Broker):
     def on_sendable(self, event):
         LOG.debug("BROKER on_sendable", event.link.source.address)
         self._queue(event.link.source.address).dispatch(event.link)
@@ -276,7 +151,7 @@ def f_find_available_port_for_broken():
 @fixture(scope="session")
 def f_qpid_broker(f_find_available_port):
     LOG.debug("starting broker", f"localhost:{f_find_available_port}")
-    broker = Container(_Broker(f"localhost:{f_find_available_port}"))
+    broker = Container(Broker(f"localhost:{f_find_available_port}"))
     p = Process(target=broker.run, args=())
     p.start()
     yield (broker, f_find_available_port)
@@ -486,3 +361,10 @@ msg_signer:
         )
         tmpf.flush()
         yield tmpf.name
+
+
+@fixture(autouse=True)
+def f_cache_dir(tmp_path_factory, monkeypatch):
+    cache_home = tmp_path_factory.mktemp("cache")
+    monkeypatch.setenv("XDG_CACHE_HOME", str(cache_home))
+    yield str(cache_home / "pubtools-sign")
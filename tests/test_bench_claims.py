@@ -0,0 +1,33 @@
+import json
+from unittest.mock import patch
+
+from click.testing import CliRunner
+
+from pubtools.sign.bench.claims import run_claims_benchmark
+from pubtools.sign.bench.cli import bench
+
+
+def test_run_claims_benchmark():
+    report = run_claims_benchmark(50, repeat=2)
+    assert report["benchmark"] == "claims"
+    assert report["size"] == 50
+    assert report["identical"] is True
+    assert report["speedup"] > 0
+    assert sorted(report["results"]) == ["batch", "per_digest"]
+    assert all(result["throughput"] > 0 for result in report["results"].values())
+
+
+def test_claims_cli(tmp_path):
+    output = tmp_path / "report.json"
+    result = CliRunner().invoke(bench, ["claims", "--size", "10", "--output", str(output)])
+    assert result.exit_code == 0, result.output
+    assert json.loads(output.read_text())["identical"] is True
+    assert json.loads(result.output)["size"] == 10
+
+
+def test_claims_cli_not_identical():
+    with patch("pubtools.sign.bench.claims.run_claims_benchmark") as patched:
+        patched.return_value = {"benchmark": "claims", "identical": False}
+        result = CliRunner().invoke(bench, ["claims", "--size", "10"])
+    assert result.exit_code == 1
+    assert "Batch claims differ" in result.output
@@ -0,0 +1,219 @@
+import json
+
+from click.testing import CliRunner
+import pytest
+
+from pubtools.sign.bench.cli import bench
+from pubtools.sign.bench.compare import MetricComparison, compare_reports, metric_kind
+
+TOLERANCES = {"throughput": 0.1, "latency": 0.1, "memory": 0.1, "rss": 0.1}
+
+
+def _report(throughput=100.0, duration=10.0, peak_bytes=1000, benchmark="memory", python="3.11.7"):
+    return {
+        "benchmark": benchmark,
+        "python": python,
+        "budget_per_message": 8192,
+        "within_budget": True,
+        "results": {
+            "100": {
+                "status": "ok",
+                "throughput": throughput,
+                "duration": duration,
+                "phases": {"in_flight": {"peak_bytes": peak_bytes}},
+            }
+        },
+    }
+
+
+@pytest.mark.parametrize(
+    "name,kind",
+    [
+        ("throughput", "throughput"),
+        ("duration", "latency"),
+        ("p99_latency", "latency"),
+        ("peak_bytes", "memory"),
+        ("bytes_per_message", "memory"),
+        ("max_rss_bytes", "rss"),
+        ("status", None),
+        ("budget_per_message", None),
+    ],
+)
+def test_metric_kind(name, kind):
+    assert metric_kind(name) == kind
+
+
+def test_compare_reports_ok():
+    assert compare_reports(_report(), _report(throughput=95.0, duration=10.5), TOLERANCES) == [
+        MetricComparison("100.throughput", "throughput", 100.0, 95.0, -0.05, False),
+        MetricComparison("100.duration", "latency", 10.0, 10.5, 0.05, False),
+        MetricComparison("100.phases.in_flight.peak_bytes", "memory", 1000, 1000, 0.0, False),
+    ]
+
+
+def test_compare_reports_regressions():
+    comparisons = compare_reports(
+        _report(), _report(throughput=50.0, duration=20.0, peak_bytes=2000), TOLERANCES
+    )
+    assert [x.regression for x in comparisons] == [True, True, True]
+
+
+def test_compare_reports_improvements():
+    comparisons = compare_reports(
+        _report(), _report(throughput=200.0, duration=5.0, peak_bytes=500), TOLERANCES
+    )
+    assert [x.regression for x in comparisons] == [False, False, False]
+
+
+def test_compare_reports_zero_baseline():
+    comparisons = compare_reports(_report(peak_bytes=0), _report(peak_bytes=0), TOLERANCES)
+    assert comparisons[2].change == 0.0
+    comparisons = compare_reports(_report(peak_bytes=0), _report(peak_bytes=10), TOLERANCES)
+    assert comparisons[2].change == float("inf")
+    assert comparisons[2].regression
+
+
+def test_compare_reports_missing_metrics():
+    current = _report()
+    current["results"] = {"1000": current["results"]["100"]}
+    with pytest.raises(ValueError, match="missing in the current report: 100.throughput"):
+        compare_reports(_report(), current, TOLERANCES)
+
+
+def test_compare_reports_failed():
+    current = _report()
+    current["results"]["100"].update({"status": "error", "error_message": "timeout"})
+    with pytest.raises(ValueError, match="Benchmark failed: 100: timeout"):
+        compare_reports(_report(), current, TOLERANCES)
+
+
+def test_compare_reports_kinds():
+    current = _report(throughput=50.0, duration=20.0)
+    del current["results"]["100"]["throughput"]
+    assert compare_reports(_report(), current, TOLERANCES, kinds=("memory",)) == [
+        MetricComparison("100.phases.in_flight.peak_bytes", "memory", 1000, 1000, 0.0, False),
+    ]
+
+
+def test_compare_reports_different_benchmarks():
+    with pytest.raises(ValueError):
+        compare_reports(_report(), _report(benchmark="claims"), TOLERANCES)
+
+
+def test_compare_reports_different_python():
+    with pytest.raises(
+        ValueError, match="Cannot compare report of Python 3.12.1 with baseline of Python 3.11.7"
+    ):
+        compare_reports(_report(), _report(python="3.12.1"), TOLERANCES)
+
+
+def _write(tmp_path, name, report):
+    fname = tmp_path / name
+    fname.write_text(json.dumps(report))
+    return str(fname)
+
+
+def test_compare_cli_ok(tmp_path):
+    result = CliRunner().invoke(
+        bench,
+        [
+            "compare",
+            _write(tmp_path, "baseline.json", _report()),
+            _write(tmp_path, "current.json", _report(throughput=95.0)),
+        ],
+    )
+    assert result.exit_code == 0, result.output
+    assert len(result.output.splitlines()) == 3
+    assert "REGRESSION" not in result.output
+
+
+def test_compare_cli_regression(tmp_path):
+    result = CliRunner().invoke(
+        bench,
+        [
+            "compare",
+            _write(tmp_path, "baseline.json", _report()),
+            _write(tmp_path, "current.json", _report(peak_bytes=1500)),
+        ],
+    )
+    assert result.exit_code == 1
+    assert "REGRESSION 100.phases.in_flight.peak_bytes" in result.output
+    assert "1 metric(s) regressed beyond tolerance" in result.output
+
+
+def test_compare_cli_tolerance_override(tmp_path):
+    result = CliRunner().invoke(
+        bench,
+        [
+            "compare",
+            _write(tmp_path, "baseline.json", _report()),
+            _write(tmp_path, "current.json", _report(peak_bytes=1500, throughput=80.0)),
+            "--tolerance",
+            "0.01",
+            "--memory-tolerance",
+            "0.6",
+            "--throughput-tolerance",
+            "0.3",
+            "--latency-tolerance",
+            "0.0",
+            "--json",
+        ],
+    )
+    assert result.exit_code == 0, result.output
+    assert [x["regression"] for x in json.loads(result.output)] == [False, False, False]
+
+
+def test_compare_cli_kind(tmp_path):
+    result = CliRunner().invoke(
+        bench,
+        [
+            "compare",
+            _write(tmp_path, "baseline.json", _report()),
+            _write(tmp_path, "current.json", _report(throughput=10.0, duration=100.0)),
+            "--kind",
+            "memory",
+        ],
+    )
+    assert result.exit_code == 0, result.output
+    assert len(result.output.splitlines()) == 1
+
+
+def test_compare_cli_missing_metrics(tmp_path):
+    current = _report()
+    del current["results"]["100"]["phases"]
+    result = CliRunner().invoke(
+        bench,
+        [
+            "compare",
+            _write(tmp_path, "baseline.json", _report()),
+            _write(tmp_path, "current.json", current),
+        ],
+    )
+    assert result.exit_code == 1
+    assert "missing in the current report: 100.phases.in_flight.peak_bytes" in result.output
+
+
+def test_compare_cli_different_benchmarks(tmp_path):
+    result = CliRunner().invoke(
+        bench,
+        [
+            "compare",
+            _write(tmp_path, "baseline.json", _report()),
+            _write(tmp_path, "current.json", _report(benchmark="claims")),
+        ],
+    )
+    assert result.exit_code == 1
+    assert "Cannot compare claims report with memory baseline" in result.output
+
+
+def test_compare_cli_different_python(tmp_path):
+    result = CliRunner().invoke(
+        bench,
+        [
+            "compare",
+            _write(tmp_path, "baseline.json", _report()),
+            _write(tmp_path, "current.json", _report(python="3.12.1")),
+        ],
+    )
+    assert result.exit_code == 1
+    assert "Cannot compare report of Python 3.12.1 with baseline of Python 3.11.7" in result.output
@@ -0,0 +1,67 @@
+import json
+from unittest.mock import patch
+
+from click.testing import CliRunner
+
+from pubtools.sign.bench.cli import bench, bench_main
+from pubtools.sign.bench.memory import PHASES, run_memory_benchmark
+from pubtools.sign.bench.service import _serve
+from pubtools.sign.testing.fake_signer import ChaosConfig
+
+
+def test_run_memory_benchmark():
+    report = run_memory_benchmark([20], budget_per_message=10 * 1024 * 1024)
+    assert report["benchmark"] == "memory"
+    assert report["within_budget"] is True
+    result = report["results"]["20"]
+    assert result["status"] == "ok", result["error_message"]
+    assert sorted(result["phases"]) == sorted(PHASES)
+    assert result["peak_bytes"] == max(x["peak_bytes"] for x in result["phases"].values())
+    assert result["bytes_per_message"] == result["peak_bytes"] / 20
+    assert result["throughput"] > 0
+
+
+def test_run_memory_benchmark_over_budget():
+    report = run_memory_benchmark([5], budget_per_message=1)
+    assert report["results"]["5"]["status"] == "ok"
+    assert report["within_budget"] is False
+
+
+def _report(within_budget):
+    return {"benchmark": "memory", "within_budget": within_budget, "results": {}}
+
+
+def test_memory_cli(tmp_path):
+    output = tmp_path / "report.json"
+    with patch("pubtools.sign.bench.memory.run_memory_benchmark") as patched:
+        patched.return_value = _report(True)
+        result = CliRunner().invoke(
+            bench, ["memory", "--size", "10", "--size", "20", "--output", str(output)]
+        )
+    assert result.exit_code == 0, result.output
+    patched.assert_called_once_with((10, 20), budget_per_message=8 * 1024)
+    assert json.loads(output.read_text()) == _report(True)
+    assert json.loads(result.output) == _report(True)
+
+
+def test_memory_cli_over_budget():
+    with patch("pubtools.sign.bench.memory.run_memory_benchmark") as patched:
+        patched.return_value = _report(False)
+        result = CliRunner().invoke(bench, ["memory", "--size", "10", "--budget", "1"])
+    assert result.exit_code == 1
+    assert "Memory budget per message exceeded" in result.output
+
+
+def test_bench_main():
+    with patch("pubtools.sign.bench.cli.bench") as patched:
+        bench_main()
+        patched.assert_called_once()
+
+
+def test_serve():
+    with patch("pubtools.sign.bench.service.Container") as patched_container:
+        with patch("pubtools.sign.bench.service.threading"):
+            _serve("localhost:1234", ChaosConfig())
+    signer = patched_container.call_args_list[-1][0][0]
+    assert signer.broker_urls == ["localhost:1234"]
+    patched_container.return_value.run.assert_called()
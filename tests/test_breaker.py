@@ -0,0 +1,89 @@
+from unittest.mock import Mock, patch
+
+import proton
+
+from pubtools.sign.clients.breaker import (
+    CircuitBreaker,
+    broker_circuit,
+    is_broker_error,
+    run_attempt,
+    topic_circuit,
+)
+from pubtools.sign.models.msg import MsgError
+from pubtools.sign.state import StateFile
+
+BROKER = broker_circuit(["amqps://broker-02:5671", "amqps://broker-01:5671"])
+TOPIC = topic_circuit("topic://Topic.sign")
+
+
+def _breaker(tmp_path):
+    return CircuitBreaker(StateFile(str(tmp_path / "circuits.json")), threshold=2, reset_timeout=60)
+
+
+def _error(source=None):
+    return MsgError(name="error", description="failed", source=source)
+
+
+def test_circuit_names():
+    assert BROKER == "broker:amqps://broker-01:5671,amqps://broker-02:5671"
+    assert TOPIC == "topic:topic://Topic.sign"
+
+
+def test_is_broker_error():
+    assert is_broker_error(_error(Mock(spec=proton.Transport)))
+    assert is_broker_error(_error(Mock(spec=proton.Connection)))
+    assert not is_broker_error(_error(Mock(spec=proton.Link)))
+    assert not is_broker_error(_error())
+
+
+def test_circuit_breaker(tmp_path):
+    breaker = _breaker(tmp_path)
+    with patch("time.time", return_value=1000.0):
+        breaker.record({TOPIC: True})
+        assert breaker.blocked([BROKER, TOPIC]) is None
+        # success resets consecutive failures
+        breaker.record({TOPIC: False})
+        breaker.record({TOPIC: True})
+        assert breaker.blocked([BROKER, TOPIC]) is None
+        breaker.record({TOPIC: True})
+        assert breaker.blocked([BROKER, TOPIC]) == TOPIC
+        assert breaker.blocked([BROKER]) is None
+
+    # half-open, only one probe is allowed
+    with patch("time.time", return_value=1061.0):
+        assert breaker.blocked([BROKER, TOPIC]) is None
+        assert breaker.blocked([BROKER, TOPIC]) == TOPIC
+    # failed probe opens the circuit again
+    with patch("time.time", return_value=1062.0):
+        breaker.record({TOPIC: True})
+    with patch("time.time", return_value=1100.0):
+        assert breaker.blocked([TOPIC]) == TOPIC
+    # successful probe closes the circuit
+    with patch("time.time", return_value=1123.0):
+        assert breaker.blocked([TOPIC]) is None
+        breaker.record({TOPIC: False})
+        assert breaker.blocked([TOPIC]) is None
+    assert breaker.state.load() == {}
+
+
+def test_run_attempt(tmp_path):
+    errors = []
+    attempt = Mock()
+    assert not run_attempt(None, BROKER, [TOPIC], errors, attempt)
+    attempt.assert_called_once()
+
+    breaker = _breaker(tmp_path)
+    attempt = Mock(side_effect=lambda: errors.append(_error(Mock(spec=proton.Transport))))
+    assert not run_attempt(breaker, BROKER, [TOPIC], errors, attempt)
+    assert breaker.state.load() == {BROKER: {"failures": 1}}
+
+    attempt = Mock(side_effect=lambda: errors.append(_error()))
+    assert not run_attempt(breaker, BROKER, [TOPIC], errors, attempt)
+    assert breaker.state.load() == {TOPIC: {"failures": 1}}
+
+    breaker.record({TOPIC: True})
+    attempt = Mock()
+    assert run_attempt(breaker, BROKER, [TOPIC], errors, attempt)
+    attempt.assert_not_called()
+    assert errors[-1].name == "CircuitOpen"
+    assert TOPIC in errors[-1].description
@@ -0,0 +1,40 @@
+import os
+from unittest.mock import Mock
+
+from pubtools.sign.cache import cache_dir, cached
+
+
+def test_cache_dir(monkeypatch, tmp_path):
+    assert cache_dir() == os.path.join(os.environ["XDG_CACHE_HOME"], "pubtools-sign")
+    monkeypatch.delenv("XDG_CACHE_HOME")
+    monkeypatch.setenv("HOME", str(tmp_path))
+    assert cache_dir() == str(tmp_path / ".cache" / "pubtools-sign")
+
+
+def test_cached(tmp_path, f_cache_dir):
+    path = tmp_path / "data.txt"
+    path.write_text("data")
+    compute = Mock(side_effect=lambda p: {"content": open(p).read()})
+    assert cached("test", str(path), compute) == {"content": "data"}
+    assert cached("test", str(path), compute) == {"content": "data"}
+    assert compute.call_count == 1
+    assert os.path.exists(os.path.join(f_cache_dir, "test.json"))
+
+    assert cached("test", str(path), compute, extra={"VAR": "1"}) == {"content": "data"}
+    assert compute.call_count == 2
+
+    path.write_text("changed")
+    assert cached("test", str(path), compute, extra={"VAR": "1"}) == {"content": "changed"}
+    assert compute.call_count == 3
+
+
+def test_cached_not_writable(tmp_path, monkeypatch):
+    cache_home = tmp_path / "cache"
+    cache_home.write_text("not a directory")
+    monkeypatch.setenv("XDG_CACHE_HOME", str(cache_home))
+    path = tmp_path / "data.txt"
+    path.write_text("data")
+    compute = Mock(return_value="value")
+    assert cached("test", str(path), compute) == "value"
+    assert cached("test", str(path), compute) == "value"
+    assert compute.call_count == 2
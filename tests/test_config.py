@@ -1,7 +1,11 @@
+import os
+from unittest.mock import patch
+
 import pytest
 import piny
 
-from pubtools.sign.conf.conf import load_config
+from pubtools.sign.cache import cache_dir
+from pubtools.sign.conf.conf import load_config, _load_config
 
 
 def test_load_config_radas_ok(f_config_msg_signer_ok, f_client_certificate):
@@ -18,6 +22,32 @@ def test_load_config_radas_ok(f_config_msg_signer_ok, f_client_certificate):
             "retries": 3,
             "message_id_key": "request_id",
             "log_level": "debug",
+            "deterministic_request_id": False,
+            "reply_queue": None,
+            "reply_selector": None,
+            "message_id_header": None,
+            "result_store": "replies",
+            "reply_headers": True,
+            "result_store_dir": None,
+            "shards": 1,
+            "pin_brokers": False,
+            "state_dir": None,
+            "broker_cooldown": 60,
+            "circuit_threshold": 5,
+            "circuit_reset_timeout": 60,
+            "heartbeat": None,
+            "connect_timeout": None,
+            "chunk_size": 0,
+            "chunk_bytes": 0,
+            "adaptive_timeout": False,
+            "min_timeout": 10,
+            "max_timeout": None,
+            "timeout_margin": 2.0,
+            "rate_limit": None,
+            "key_rate_limits": {},
+            "clear_sign_priority": None,
+            "container_sign_priority": None,
+            "request_ttl": False,
         }
     }
 
@@ -25,3 +55,70 @@ def test_load_config_radas_ok(f_config_msg_signer_ok, f_client_certificate):
 def test_load_config_missing(f_config_msg_signer_missing):
     with pytest.raises(piny.errors.ValidationError):
         assert load_config(f_config_msg_signer_missing)
+
+
+def test_load_config_cached(tmp_path, monkeypatch):
+    config = tmp_path / "config.yaml"
+    config.write_text("""
+msg_signer:
+  messaging_brokers:
+    - amqps://broker-01:5671
+  messaging_cert: ~/messaging/cert.crt
+  messaging_ca_cert: ~/messaging/ca-cert.crt
+  topic_send_to: topic://Topic.sign
+  topic_listen_to: queue://Topic.signed
+  environment: ${SIGN_ENVIRONMENT}
+  service: pubtools-sign
+  timeout: 1
+  retries: 3
+  message_id_key: request_id
+""")
+    monkeypatch.setenv("SIGN_ENVIRONMENT", "prod")
+    with patch("pubtools.sign.conf.conf._load_config", wraps=_load_config) as patched_load:
+        assert load_config(str(config))["msg_signer"]["environment"] == "prod"
+        assert load_config(str(config))["msg_signer"]["environment"] == "prod"
+        assert patched_load.call_count == 1
+        monkeypatch.setenv("SIGN_ENVIRONMENT", "stage")
+        assert load_config(str(config))["msg_signer"]["environment"] == "stage"
+        assert patched_load.call_count == 2
+        assert load_config(str(config), cache=False) == load_config(str(config))
+        assert patched_load.call_count == 3
+
+
+def test_load_config_cached_environ_hashed(tmp_path, monkeypatch):
+    config = tmp_path / "config.yaml"
+    config.write_text("""
+msg_signer:
+  messaging_brokers:
+    - amqps://broker-01:5671
+  messaging_cert: ~/messaging/cert.crt
+  messaging_ca_cert: ~/messaging/ca-cert.crt
+  topic_send_to: topic://Topic.sign
+  topic_listen_to: queue://Topic.signed
+  environment: prod
+  service: pubtools-sign
+  timeout: 1
+  retries: 3
+  message_id_key: request_id
+# ${SIGN_SECRET}
+""")
+    monkeypatch.setenv("SIGN_SECRET", "very-secret-value")
+    with patch("pubtools.sign.conf.conf._load_config", wraps=_load_config) as patched_load:
+        load_config(str(config))
+        assert load_config(str(config)) == load_config(str(config), cache=False)
+        assert patched_load.call_count == 2
+        monkeypatch.setenv("SIGN_SECRET", "other-secret-value")
+        load_config(str(config))
+        assert patched_load.call_count == 3
+    # the variable isn't used in any value, so it can only leak through the cache key
+    with open(os.path.join(cache_dir(), "config.json")) as f:
+        assert "secret-value" not in f.read()
+
+
+def test_load_config_cached_schema_changed(f_config_msg_signer_ok):
+    with patch("pubtools.sign.conf.conf._load_config", wraps=_load_config) as patched_load:
+        config = load_config(f_config_msg_signer_ok)
+        with patch("pubtools.sign.conf.conf._schema_hash", return_value="older"):
+            # configuration validated by another version of the schema isn't used
+            assert load_config(f_config_msg_signer_ok) == config
+        assert patched_load.call_count == 2
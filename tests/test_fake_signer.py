@@ -0,0 +1,288 @@
+import json
+from threading import Thread
+from unittest.mock import Mock, patch
+
+from click.testing import CliRunner
+import pytest
+from proton.reactor import Container
+
+from pubtools.sign.clients.msg_send_client import SendClient
+from pubtools.sign.clients.msg_recv_client import RecvClient
+from pubtools.sign.models.msg import MsgMessage
+from pubtools.sign.operations import ClearSignOperation
+from pubtools.sign.signers.msgsigner import MsgSigner
+from pubtools.sign.testing.fake_signer import (
+    ChaosConfig,
+    FakeSigner,
+    fake_signer,
+    fake_signer_main,
+)
+
+
+def _run_signer(port, listen_to, send_to, chaos):
+    signer = FakeSigner([f"localhost:{port}"], listen_to, send_to, chaos=chaos)
+    container = Container(signer)
+    thread = Thread(target=container.run, args=())
+    thread.start()
+    return signer, container, thread
+
+
+def _sign(port, listen_to, send_to, count, timeout=10.0, reply_to=None):
+    messages = [
+        MsgMessage(
+            headers={"mtype": "container_signature", "pub_task_id": "1"},
+            address=listen_to,
+            body={"request_id": str(x), "claim_file": f"claim-{x}", "sig_key_id": "key"},
+            reply_to=reply_to,
+            correlation_id=str(x) if reply_to else None,
+        )
+        for x in range(count)
+    ]
+    assert SendClient(messages, [f"localhost:{port}"], "", "", 2, []).run() == []
+    errors = []
+    receiver = RecvClient(
+        reply_to or send_to,
+        [str(x) for x in range(count)],
+        "request_id",
+        [f"localhost:{port}"],
+        "",
+        "",
+        timeout,
+        1,
+        errors,
+        match_correlation_id=bool(reply_to),
+    )
+    receiver.run()
+    return receiver, errors
+
+
+def test_fake_signer_replies(f_qpid_broker):
+    _, port = f_qpid_broker
+    signer, container, thread = _run_signer(
+        port, "topic://Topic.fake.plain", "topic://Topic.fake.plain.reply", ChaosConfig()
+    )
+    try:
+        receiver, errors = _sign(
+            port, "topic://Topic.fake.plain", "topic://Topic.fake.plain.reply", 5
+        )
+    finally:
+        signer.stop()
+        thread.join()
+    assert errors == []
+    assert sorted(receiver.recv) == ["0", "1", "2", "3", "4"]
+    outer, headers = receiver.recv["3"]
+    assert outer["msg"]["signed_claim"] == "claim-3"
+    assert outer["msg"]["errors"] == []
+    assert headers["pub_task_id"] == "1"
+    assert signer.stats["received"] == 5
+    assert signer.stats["replied"] == 5
+
+
+def test_fake_signer_reply_to(f_qpid_broker):
+    _, port = f_qpid_broker
+    signer, container, thread = _run_signer(
+        port,
+        "topic://Topic.fake.reply_to",
+        "topic://Topic.fake.reply_to.reply",
+        ChaosConfig(stray_rate=1.0),
+    )
+    try:
+        receiver, errors = _sign(
+            port,
+            "topic://Topic.fake.reply_to",
+            "topic://Topic.fake.reply_to.reply",
+            3,
+            reply_to="queue://fake.reply_to.session",
+        )
+    finally:
+        signer.stop()
+        thread.join()
+    assert errors == []
+    assert sorted(receiver.recv) == ["0", "1", "2"]
+    assert receiver.recv["1"][0]["msg"]["signed_claim"] == "claim-1"
+    assert signer.stats["strays"] == 3
+
+
+def test_fake_signer_chaos(f_qpid_broker):
+    _, port = f_qpid_broker
+    chaos = ChaosConfig(
+        latency_distribution="uniform",
+        latency_mean=0.05,
+        latency_spread=0.05,
+        reorder_window=3,
+        reorder_flush=0.2,
+        duplicate_rate=1.0,
+        stray_rate=1.0,
+        max_replies_per_second=200,
+        seed=1,
+    )
+    signer, container, thread = _run_signer(
+        port, "topic://Topic.fake.chaos", "topic://Topic.fake.chaos.reply", chaos
+    )
+    try:
+        receiver, errors = _sign(
+            port, "topic://Topic.fake.chaos", "topic://Topic.fake.chaos.reply", 5
+        )
+    finally:
+        signer.stop()
+        thread.join()
+    assert errors == []
+    assert sorted(receiver.recv) == ["0", "1", "2", "3", "4"]
+    assert signer.stats["duplicated"] == 5
+    assert signer.stats["strays"] == 5
+
+
+def test_fake_signer_drops(f_qpid_broker):
+    _, port = f_qpid_broker
+    signer, container, thread = _run_signer(
+        port, "topic://Topic.fake.drop", "topic://Topic.fake.drop.reply", ChaosConfig(drop_rate=1.0)
+    )
+    try:
+        receiver, errors = _sign(
+            port, "topic://Topic.fake.drop", "topic://Topic.fake.drop.reply", 2, timeout=1.0
+        )
+    finally:
+        signer.stop()
+        thread.join()
+    assert receiver.recv == {}
+    assert [error.name for error in errors] == ["MessagingTimeout"]
+    assert signer.stats["dropped"] == 2
+
+
+def test_fake_signer_chunked_operation(f_qpid_broker):
+    _, port = f_qpid_broker
+    signer, container, thread = _run_signer(
+        port,
+        "topic://Topic.fake.chunks",
+        "topic://Topic.fake.chunks.reply",
+        ChaosConfig(latency_mean=0.05, seed=1),
+    )
+    msg_signer = MsgSigner()
+    msg_signer.messaging_brokers = [f"localhost:{port}"]
+    msg_signer.messaging_cert = ""
+    msg_signer.messaging_ca_cert = ""
+    msg_signer.topic_send_to = "topic://Topic.fake.chunks"
+    msg_signer.topic_listen_to = "topic://Topic.fake.chunks.reply"
+    msg_signer.reply_queue = "queue://fake.chunks.{session_id}"
+    msg_signer.creator = "pubtools-sign-test"
+    msg_signer.environment = "test"
+    msg_signer.service = "pubtools-sign"
+    msg_signer.message_id_key = "request_id"
+    msg_signer.timeout = 10
+    msg_signer.retries = 2
+    msg_signer.chunk_size = 3
+    msg_signer.log_level = "INFO"
+    try:
+        res = msg_signer.clear_sign(
+            ClearSignOperation(
+                inputs=[f"data-{x}" for x in range(8)], signing_key="key", task_id="1"
+            )
+        )
+    finally:
+        signer.stop()
+        thread.join()
+    assert res.signer_results.status == "ok"
+    assert [reply[0]["msg"]["signed_data"] for reply in res.operation_result.outputs] == [
+        f"data-{x}" for x in range(8)
+    ]
+    assert signer.stats["replied"] == 8
+
+
+def test_fake_signer_clearsig_reply():
+    signer = FakeSigner([], "", "topic://reply")
+    reply = signer.create_reply(
+        {"request_id": "1", "claim_file": "data"}, {"mtype": "clearsig_signature"}
+    )
+    assert reply.address == "topic://reply"
+    assert json.loads(reply.body) == {
+        "msg": {"request_id": "1", "claim_file": "data", "signed_data": "data", "errors": []}
+    }
+
+
+@pytest.mark.parametrize(
+    "distribution,mean,spread,low,high",
+    [
+        ("constant", 0.5, 0.0, 0.5, 0.5),
+        ("uniform", 0.5, 0.1, 0.4, 0.6),
+        ("exponential", 0.5, 0.0, 0.0, float("inf")),
+        ("exponential", 0.0, 0.0, 0.0, 0.0),
+        ("lognormal", 0.5, 0.5, 0.0, float("inf")),
+        ("lognormal", 0.0, 0.5, 0.0, 0.0),
+    ],
+)
+def test_fake_signer_latency(distribution, mean, spread, low, high):
+    signer = FakeSigner(
+        [],
+        "",
+        "",
+        chaos=ChaosConfig(
+            latency_distribution=distribution, latency_mean=mean, latency_spread=spread, seed=1
+        ),
+    )
+    for _ in range(100):
+        assert low <= signer.latency() <= high
+
+
+def test_chaos_config_invalid():
+    with pytest.raises(ValueError):
+        ChaosConfig(latency_distribution="unknown")
+    with pytest.raises(ValueError):
+        ChaosConfig(drop_rate=1.5)
+
+
+def test_fake_signer_cli():
+    with patch("pubtools.sign.testing.fake_signer.Container") as patched_container:
+        with patch("pubtools.sign.testing.fake_signer.Process") as patched_process:
+            result = CliRunner().invoke(
+                fake_signer,
+                [
+                    "--broker-url",
+                    "localhost:5672",
+                    "--listen-to",
+                    "topic://Topic.sign",
+                    "--send-to",
+                    "topic://Topic.signed",
+                    "--embedded-broker",
+                    "--drop-rate",
+                    "0.5",
+                    "--seed",
+                    "1",
+                ],
+            )
+    assert result.exit_code == 0, result.output
+    assert json.loads(result.output) == {}
+    patched_process.return_value.start.assert_called_once()
+    patched_process.return_value.terminate.assert_called_once()
+    signer = patched_container.call_args_list[-1][0][0]
+    assert signer.chaos == ChaosConfig(drop_rate=0.5, seed=1)
+    assert signer.broker_urls == ["localhost:5672"]
+
+
+def test_fake_signer_reorder_flush():
+    signer = FakeSigner([], "", "", chaos=ChaosConfig(reorder_window=3, seed=1))
+    signer.container = Mock()
+    signer.sender = Mock(credit=10)
+    signer._release("reply-1")
+    signer._release("reply-2")
+    assert signer.sender.send.call_count == 0
+    assert signer.flush_scheduled
+    signer.container.schedule.assert_called_once()
+    signer._flush()
+    assert sorted(x[0][0] for x in signer.sender.send.call_args_list) == ["reply-1", "reply-2"]
+    assert signer.reorder_buffer == []
+    assert not signer.flush_scheduled
+
+
+def test_fake_signer_certificates(f_client_certificate, f_ca_certificate):
+    with patch("proton.SSLDomain") as patched_ssl_domain:
+        FakeSigner([], "", "", cert=f_client_certificate, ca_cert=f_ca_certificate)
+    patched_ssl_domain.return_value.set_credentials.assert_called_once_with(
+        f_client_certificate, f_client_certificate, None
+    )
+    patched_ssl_domain.return_value.set_trusted_ca_db.assert_called_once_with(f_ca_certificate)
+
+
+def test_fake_signer_main():
+    with patch("pubtools.sign.testing.fake_signer.fake_signer") as patched:
+        fake_signer_main()
+        patched.assert_called_once()
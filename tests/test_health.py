@@ -0,0 +1,91 @@
+from unittest.mock import patch
+
+from pubtools.sign.clients.health import BrokerHealth
+from pubtools.sign.state import StateFile
+
+
+def _health(tmp_path, scores=None, **kwargs):
+    state = StateFile(str(tmp_path / "brokers.json"))
+    if scores:
+        with state.update() as data:
+            data.update(scores)
+    return BrokerHealth(state, **kwargs)
+
+
+def test_broker_health_order(tmp_path):
+    health = _health(
+        tmp_path,
+        {
+            "amqps://slow:5671": {"connect": 0.5, "rtt": 1.0},
+            "amqps://fast:5671": {"connect": 0.1, "rtt": 0.2},
+            "amqps://failed:5671": {"connect": 0.01, "failures": 1, "failed_at": 1000.0},
+        },
+        cooldown=60,
+    )
+    urls = ["amqps://slow:5671", "amqps://failed:5671", "amqps://fast:5671", "amqps://new:5671"]
+    with patch("time.time", return_value=1030.0):
+        assert health.order(urls) == [
+            "amqps://new:5671",
+            "amqps://fast:5671",
+            "amqps://slow:5671",
+            "amqps://failed:5671",
+        ]
+    # after cooldown the broker is used again
+    with patch("time.time", return_value=1061.0):
+        assert health.order(urls)[:2] == ["amqps://new:5671", "amqps://failed:5671"]
+
+
+def test_broker_health_order_pinned(tmp_path):
+    health = _health(
+        tmp_path,
+        {
+            "amqps://pinned:5671": {"connect": 0.5, "rtt": 1.0},
+            "amqps://slow:5671": {"connect": 0.3, "rtt": 0.5},
+            "amqps://fast:5671": {"connect": 0.1, "rtt": 0.2},
+        },
+        cooldown=60,
+        pinned=True,
+    )
+    urls = ["amqps://pinned:5671", "amqps://slow:5671", "amqps://fast:5671"]
+    assert health.order(urls) == [
+        "amqps://pinned:5671",
+        "amqps://fast:5671",
+        "amqps://slow:5671",
+    ]
+    health.record_failure("amqps://pinned:5671")
+    with patch("time.time", return_value=1000.0):
+        health.save()
+    # failed pinned broker is used only for failover until the cooldown passes
+    with patch("time.time", return_value=1030.0):
+        assert health.order(urls) == [
+            "amqps://fast:5671",
+            "amqps://slow:5671",
+            "amqps://pinned:5671",
+        ]
+    with patch("time.time", return_value=1061.0):
+        assert health.order(urls)[0] == "amqps://pinned:5671"
+    assert health.order([]) == []
+
+
+def test_broker_health_save(tmp_path):
+    health = _health(
+        tmp_path,
+        {"amqps://a:5671": {"connect": 1.0, "failures": 2, "failed_at": 1000.0}},
+        smoothing=0.5,
+    )
+    health.save()
+    health.record_latency("amqps://a:5671", "connect", 0.5)
+    health.record_latency("amqps://a:5671", "rtt", 0.1)
+    health.record_latency("amqps://a:5671", "rtt", 0.3)
+    health.record_failure("amqps://b:5671")
+    with patch("time.time", return_value=2000.0):
+        health.save()
+    assert health.state.load() == {
+        "amqps://a:5671": {"connect": 0.75, "rtt": 0.2},
+        "amqps://b:5671": {"failures": 1, "failed_at": 2000.0},
+    }
+
+    health.record_failure("amqps://b:5671")
+    with patch("time.time", return_value=3000.0):
+        health.save()
+    assert health.state.load()["amqps://b:5671"] == {"failures": 2, "failed_at": 3000.0}
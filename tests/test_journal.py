@@ -0,0 +1,83 @@
+import pytest
+
+from pubtools.sign.clients.journal import Journal, journal_shards, shard_journal, start_shards
+from pubtools.sign.models.msg import MsgMessage, MsgReply
+from pubtools.sign.operations import ClearSignOperation
+
+
+def _messages():
+    return [
+        MsgMessage(
+            headers={"mtype": "clearsig_signature"},
+            address="topic://Topic.sign",
+            body={"request_id": f"id-{x}", "claim_file": f"input-{x}"},
+        )
+        for x in range(3)
+    ]
+
+
+def _operation(inputs=("input-0", "input-1", "input-2")):
+    return ClearSignOperation(inputs=list(inputs), signing_key="test-key", task_id="1")
+
+
+def test_journal_start(tmp_path):
+    journal = Journal(str(tmp_path / "journal.db"))
+    assert not journal.started
+    assert not journal.sent
+    journal.start(_operation(), _messages())
+    assert journal.started
+    assert not journal.sent
+    journal.mark_sent()
+    assert journal.sent
+    assert journal.messages() == _messages()
+    journal.close()
+
+
+def test_journal_start_twice(tmp_path):
+    journal = Journal(str(tmp_path / "journal.db"))
+    journal.start(_operation(), _messages())
+    with pytest.raises(ValueError, match="already contains an operation"):
+        journal.start(_operation(), _messages())
+    journal.close()
+
+
+def test_journal_replies_persisted(tmp_path):
+    journal = Journal(str(tmp_path / "journal.db"))
+    journal.start(_operation(), _messages())
+    journal.record_reply("id-1", MsgReply('{"msg": {"request_id": "id-1"}}', {"mtype": "test"}))
+    journal.record_reply(
+        "id-1", MsgReply('{"msg": {"request_id": "id-1", "dup": true}}', {"mtype": "test"})
+    )
+    journal.close()
+
+    journal = Journal(str(tmp_path / "journal.db"))
+    assert journal.replies() == {
+        "id-1": ({"msg": {"request_id": "id-1", "dup": True}}, {"mtype": "test"})
+    }
+    journal.close()
+
+
+def test_journal_check_operation(tmp_path):
+    journal = Journal(str(tmp_path / "journal.db"))
+    with pytest.raises(ValueError, match="doesn't contain any operation"):
+        journal.check_operation(_operation())
+    journal.start(_operation(), _messages())
+    journal.check_operation(_operation())
+    with pytest.raises(ValueError, match="different operation"):
+        journal.check_operation(_operation(inputs=["other"]))
+    journal.close()
+
+
+def test_journal_shards(tmp_path):
+    path = str(tmp_path / "journal.db")
+    start_shards(path, 3)
+    assert journal_shards(path) == 3
+    assert shard_journal(path, 1) == f"{path}.1"
+    with pytest.raises(ValueError, match="already contains an operation"):
+        start_shards(path, 3)
+
+    path = str(tmp_path / "unsharded.db")
+    Journal(path).close()
+    assert journal_shards(path) is None
+    open(path, "w").close()
+    assert journal_shards(path) is None
@@ -0,0 +1,42 @@
+import pytest
+
+from pubtools.sign.clients.latency import SignerLatency
+from pubtools.sign.state import StateFile
+
+
+def _latency(tmp_path, scores=None, **kwargs):
+    state = StateFile(str(tmp_path / "signers.json"))
+    if scores:
+        with state.update() as data:
+            data.update(scores)
+    return SignerLatency(state, **kwargs)
+
+
+def _timeout(latency, count, key="signer"):
+    return latency.timeout(key, count, margin=2, min_timeout=10, max_timeout=600, default=60)
+
+
+def test_signer_latency_timeout(tmp_path):
+    latency = _latency(tmp_path, {"signer": {"latency": 4.0, "interval": 0.5}})
+    assert _timeout(latency, 1) == 10
+    assert _timeout(latency, 11) == pytest.approx(18.0)
+    assert _timeout(latency, 1000) == 600
+    assert _timeout(latency, 1000, key="unknown") == 60
+
+
+def test_signer_latency_record(tmp_path):
+    latency = _latency(tmp_path, smoothing=0.5)
+    latency.record("signer", 2.0)
+    assert latency.state.load() == {"signer": {"latency": 2.0}}
+    assert _timeout(latency, 100) == 10
+    latency.record("signer", 4.0, 1.0)
+    assert latency.state.load() == {"signer": {"latency": 3.0, "interval": 1.0}}
+    latency.record("signer", 1.0, 0.5)
+    assert latency.state.load() == {"signer": {"latency": 2.0, "interval": 0.75}}
+
+
+def test_signer_latency_record_timeout(tmp_path):
+    latency = _latency(tmp_path, {"signer": {"latency": 2.0, "interval": 0.5}})
+    latency.record_timeout("signer")
+    latency.record_timeout("unknown")
+    assert latency.state.load() == {"signer": {"latency": 4.0, "interval": 1.0}}
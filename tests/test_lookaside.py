@@ -0,0 +1,119 @@
+import base64
+import json
+import os
+
+import pytest
+
+from pubtools.sign.results.lookaside import LookasideStore, empty_summary, signature_dir
+from pubtools.sign.results.store import SignatureRecord
+
+DIGEST = "sha256:" + "a" * 64
+
+
+def _reply(signature, errors=None):
+    return (
+        {
+            "msg": {
+                "signed_claim": base64.b64encode(signature).decode("latin1"),
+                "errors": errors or [],
+            }
+        },
+        {},
+    )
+
+
+@pytest.mark.parametrize(
+    "reference,expected",
+    [
+        ("registry.example.com/ns/repo:tag", "ns/repo"),
+        ("registry.example.com:5000/ns/repo@sha256:abcd", "ns/repo"),
+        ("localhost/repo:latest", "repo"),
+        ("ns/repo:tag", "ns/repo"),
+        ("repo", "repo"),
+    ],
+)
+def test_signature_dir(reference, expected):
+    assert signature_dir("/root", reference, DIGEST) == f"/root/{expected}@sha256={'a' * 64}"
+
+
+@pytest.mark.parametrize(
+    "reference,digest",
+    [
+        ("registry.example.com/ns/../repo:tag", DIGEST),
+        ("registry.example.com//repo:tag", DIGEST),
+        ("registry.example.com/ns/repo:tag", "abcd"),
+        ("registry.example.com/ns/repo:tag", "sha256:../abcd"),
+    ],
+)
+def test_signature_dir_invalid(reference, digest):
+    with pytest.raises(ValueError):
+        signature_dir("/root", reference, digest)
+
+
+def test_lookaside_store(tmp_path):
+    references = [
+        "registry.example.com/ns/repo:1",
+        "registry.example.com/ns/repo:2",
+        "registry.example.com/ns/other:1",
+        "registry.example.com/ns/../escape:1",
+        "registry.example.com/ns/failed:1",
+        "registry.example.com/ns/missing:1",
+    ]
+    existing = tmp_path / f"ns/other@sha256={'a' * 64}"
+    existing.mkdir(parents=True)
+    (existing / "signature-1").write_bytes(b"other-signature")
+    (existing / "signature-2").write_bytes(b"existing-signature")
+    (existing / "unrelated").write_bytes(b"unrelated")
+
+    store = LookasideStore(
+        ["1", "2", "3", "4", "5", "6"], references, [DIGEST] * 6, str(tmp_path), workers=2
+    )
+    store["1"] = _reply(b"signature-1")
+    store["1"] = _reply(b"duplicate reply")
+    store["2"] = _reply(b"signature-2")
+    store["3"] = _reply(b"existing-signature")
+    store["4"] = _reply(b"escape")
+    store["5"] = _reply(b"", errors=["signing failed"])
+    store.flush()
+
+    repo = tmp_path / f"ns/repo@sha256={'a' * 64}"
+    assert sorted(os.listdir(repo)) == ["signature-1", "signature-2"]
+    assert {(repo / name).read_bytes() for name in os.listdir(repo)} == {
+        b"signature-1",
+        b"signature-2",
+    }
+    assert store[2] == str(existing / "signature-2")
+    assert store[5] == ""
+    assert store[3] == ""
+    summary = store.summary()
+    assert json.loads(json.dumps(summary)) == summary
+    assert summary["written"] == 2
+    assert summary["existing"] == 1
+    assert summary["failed"] == 2
+    assert summary["missing"] == 1
+    assert summary["root"] == str(tmp_path)
+    assert len(summary["failures"]) == 2
+
+
+def test_lookaside_store_concurrent_writer(tmp_path):
+    references = ["registry.example.com/ns/repo:1", "registry.example.com/ns/repo:2"]
+    store = LookasideStore(["1", "2"], references, [DIGEST] * 2, str(tmp_path), workers=1)
+    store["1"] = _reply(b"signature-1")
+    store._executor.shutdown(wait=True)
+    # signature written by another process after the directory was loaded
+    repo = tmp_path / f"ns/repo@sha256={'a' * 64}"
+    (repo / "signature-2").write_bytes(b"other process")
+    store._write(1, SignatureRecord("2", base64.b64encode(b"signature-2").decode("latin1"), []))
+    assert store[1] == str(repo / "signature-3")
+    assert (repo / "signature-3").read_bytes() == b"signature-2"
+
+
+def test_empty_summary():
+    assert empty_summary("/root", 3) == {
+        "written": 0,
+        "existing": 0,
+        "failed": 0,
+        "root": "/root",
+        "missing": 3,
+        "failures": [],
+    }
@@ -1,8 +1,10 @@
 from unittest.mock import Mock
 
+import pytest
+
 
 from pubtools.sign.clients.msg import _MsgClient
-from pubtools.sign.models.msg import MsgError
+from pubtools.sign.models.msg import MsgError, MsgMessage, MsgReply
 
 
 def test_msg_handler_errors():
@@ -34,3 +36,36 @@ def test_msg_handler_errors():
             source=mock_error.connection,
         )
     ]
+
+
+def test_msg_reply():
+    reply = MsgReply('{"msg": {"request_id": "1"}}', {"mtype": "test"})
+    assert reply._message is None
+    assert repr(reply) == (
+        "MsgReply(raw='{\"msg\": {\"request_id\": \"1\"}}', headers={'mtype': 'test'})"
+    )
+    assert reply.headers == {"mtype": "test"}
+    assert reply[0] == {"msg": {"request_id": "1"}}
+    assert reply[1] == {"mtype": "test"}
+    assert len(reply) == 2
+    outer_message, headers = reply
+    assert outer_message is reply.message
+    # decoded body replaces the raw one
+    assert reply._raw is None
+    assert reply.raw == '{"msg": {"request_id": "1"}}'
+    assert reply == ({"msg": {"request_id": "1"}}, {"mtype": "test"})
+    assert reply == MsgReply("{}", {"mtype": "test"}, message={"msg": {"request_id": "1"}})
+    assert reply != "signed"
+
+
+def test_msg_message():
+    message = MsgMessage(headers={"mtype": "test"}, address="topic://Topic.sign", body={"a": 1})
+    assert message == MsgMessage({"mtype": "test"}, "topic://Topic.sign", {"a": 1})
+    assert message != MsgMessage({"mtype": "test"}, "topic://Topic.sign", {"a": 1}, reply_to="q")
+    assert message != ({"mtype": "test"}, "topic://Topic.sign", {"a": 1})
+    assert repr(message) == (
+        "MsgMessage(headers={'mtype': 'test'}, address='topic://Topic.sign', body={'a': 1}, "
+        "reply_to=None, correlation_id=None)"
+    )
+    with pytest.raises(AttributeError):
+        message.other = 1
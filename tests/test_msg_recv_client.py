@@ -1,10 +1,13 @@
-from unittest.mock import patch
+from unittest.mock import Mock, patch
 import time
 from threading import Thread
 
 from pubtools.sign.clients.msg_send_client import SendClient, _SendClient
 from pubtools.sign.clients.msg_recv_client import RecvClient, _RecvClient
 from pubtools.sign.models.msg import MsgMessage
+from pubtools.sign.clients.journal import Journal
+from pubtools.sign.clients.breaker import CircuitBreaker, broker_circuit
+from pubtools.sign.state import StateFile
 
 
 def test_recv_client_zero_messages(
@@ -79,6 +82,52 @@ def test_recv_client_recv_message(
     trc.join()
 
 
+def test_recv_client_recv_message_journal(
+    f_cleanup_msgsigner_messages,
+    f_qpid_broker,
+    f_msgsigner_listen_to_topic,
+    f_fake_msgsigner,
+    f_msgsigner_send_to_queue,
+    tmp_path,
+):
+    qpid_broker, port = f_qpid_broker
+    message = MsgMessage(
+        headers={"mtype": "test"},
+        address=f_msgsigner_listen_to_topic,
+        body={"msg": {"message": "test_message", "request_id": "1"}},
+    )
+
+    sender = SendClient([message], [f"localhost:{port}"], "", "", 10, [])
+    errors = []
+    journal = Journal(str(tmp_path / "journal.db"))
+    receiver = RecvClient(
+        f_msgsigner_send_to_queue,
+        ["1"],
+        "request_id",
+        [f"localhost:{port}"],
+        "",
+        "",
+        60.0,
+        2,
+        errors,
+        journal=journal,
+    )
+
+    tsc = Thread(target=sender.run, args=())
+    trc = Thread(target=receiver.run, args=())
+
+    trc.start()
+    tsc.start()
+    tsc.join()
+    trc.join()
+
+    assert errors == []
+    assert journal.replies() == {
+        "1": ({"msg": {"message": "test_message", "request_id": "1"}}, {"mtype": "test"})
+    }
+    journal.close()
+
+
 def test_recv_client_timeout(
     f_cleanup_msgsigner_messages,
     f_qpid_broker,
@@ -321,3 +370,153 @@ def test_recv_client_recv_message_timeout(
         sender.stop()
         tsc.join()
         trc.join()
+
+
+def test_recv_client_correlation_id_stray_not_decoded():
+    errors = []
+    recv = {}
+    client = _RecvClient(
+        "queue://replies",
+        ["1"],
+        "request_id",
+        ["localhost:5672"],
+        "",
+        "",
+        10,
+        recv,
+        errors,
+        match_correlation_id=True,
+    )
+    event = Mock()
+    event.message.correlation_id = "other"
+    event.message.body = "not a json"
+    client.on_message(event)
+    assert recv == {}
+
+    client.timer_task = Mock()
+    event.message.correlation_id = "1"
+    event.message.body = '{"msg": {"request_id": "1"}}'
+    event.message.properties = {"mtype": "test"}
+    with patch.object(client, "accept") as patched_accept:
+        client.on_message(event)
+    patched_accept.assert_called_once_with(event.delivery)
+    assert recv == {"1": ({"msg": {"request_id": "1"}}, {"mtype": "test"})}
+    event.connection.close.assert_called_once()
+
+
+def test_recv_client_selector():
+    client = _RecvClient(
+        "queue://replies",
+        ["1"],
+        "request_id",
+        ["localhost:5672"],
+        "",
+        "",
+        10,
+        {},
+        [],
+        selector="pub_task_id = '1'",
+    )
+    event = Mock()
+    client.on_start(event)
+    options = event.container.create_receiver.call_args[1]["options"]
+    link = Mock()
+    options.apply(link)
+    link.source.filter.put_dict.assert_called_once()
+    assert "pub_task_id = '1'" in str(link.source.filter.put_dict.call_args)
+
+
+def test_recv_client_id_header():
+    recv = {}
+    client = _RecvClient(
+        "queue://replies",
+        ["1", "2"],
+        "request_id",
+        ["localhost:5672"],
+        "",
+        "",
+        10,
+        recv,
+        [],
+        id_header="request_id",
+    )
+    event = Mock()
+    event.message.properties = {"request_id": "other"}
+    event.message.body = "not a json"
+    client.on_message(event)
+    assert recv == {}
+
+    # replies without the header are decoded
+    event.message.properties = {}
+    event.message.body = '{"msg": {"request_id": "1"}}'
+    with patch.object(client, "accept"):
+        client.on_message(event)
+    assert recv["1"]._message == {"msg": {"request_id": "1"}}
+    assert recv["1"]._raw is None
+
+    event.message.properties = {"request_id": "2"}
+    event.message.body = '{"msg": {"request_id": "2"}}'
+    client.timer_task = Mock()
+    with patch.object(client, "accept"):
+        client.on_message(event)
+    assert recv["2"]._message is None
+    assert recv["2"] == ({"msg": {"request_id": "2"}}, {"request_id": "2"})
+
+
+def test_recv_client_circuit_open(tmp_path):
+    breaker = CircuitBreaker(StateFile(str(tmp_path / "circuits.json")), threshold=1)
+    breaker.record({broker_circuit(["localhost:5672"]): True})
+    errors = []
+    receiver = RecvClient(
+        "queue://replies",
+        ["1"],
+        "request_id",
+        ["localhost:5672"],
+        "",
+        "",
+        10.0,
+        5,
+        errors,
+        breaker=breaker,
+    )
+    with patch("proton.reactor.Container.run") as patched_run:
+        assert receiver.run() == errors
+    patched_run.assert_not_called()
+    assert [error.name for error in errors] == ["CircuitOpen"]
+
+
+def test_recv_client_service_times():
+    receiver = RecvClient("queue://replies", ["1", "2", "3"], "request_id", [], "", "", 10, 1, [])
+    client = receiver._client
+    event = Mock()
+    with patch("pubtools.sign.clients.msg_recv_client.time") as patched_time:
+        patched_time.monotonic.side_effect = [100.0, 102.0, 103.0, 103.5]
+        client.on_start(event)
+        for request_id in ("1", "2", "1", "3"):
+            event.message.body = f'{{"msg": {{"request_id": "{request_id}"}}}}'
+            event.message.properties = {}
+            assert receiver.service_times is None
+            with patch.object(client, "accept"):
+                client.on_message(event)
+    assert receiver.service_times == (2.0, 0.75)
+
+    single = RecvClient("queue://replies", ["1"], "request_id", [], "", "", 10, 1, [])
+    with patch("pubtools.sign.clients.msg_recv_client.time") as patched_time:
+        patched_time.monotonic.side_effect = [100.0, 101.0]
+        single._client.on_start(event)
+        event.message.body = '{"msg": {"request_id": "1"}}'
+        with patch.object(single._client, "accept"):
+            single._client.on_message(event)
+    assert single.service_times == (1.0, None)
+
+    # latency is measured from start of sending the requests when known
+    sent = RecvClient("queue://replies", ["1"], "request_id", [], "", "", 10, 1, [], sent_at=97.0)
+    with patch("pubtools.sign.clients.msg_recv_client.time") as patched_time:
+        patched_time.monotonic.side_effect = [101.0]
+        sent._client.on_start(event)
+        with patch.object(sent._client, "accept"):
+            sent._client.on_message(event)
+    assert sent.service_times == (4.0, None)
+    assert (
+        RecvClient("queue://replies", [], "request_id", [], "", "", 10, 1, []).service_times is None
+    )
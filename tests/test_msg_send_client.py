@@ -1,7 +1,20 @@
-from unittest.mock import patch
+import gc
+import socket
+import time
+import weakref
+from unittest.mock import Mock, patch
 
-from pubtools.sign.clients.msg_send_client import SendClient, _SendClient
-from pubtools.sign.models.msg import MsgMessage
+from proton import Endpoint, Message
+
+
+from pubtools.sign.clients.breaker import CircuitBreaker, is_broker_error, topic_circuit
+from pubtools.sign.clients.health import BrokerHealth
+from pubtools.sign.clients.msg import _ConnectTimer, ssl_domain
+from pubtools.sign.clients.msg_recv_client import _RecvClient
+from pubtools.sign.clients.msg_send_client import SendClient, _SendClient, encode_message
+from pubtools.sign.clients.ratelimit import RateLimiter
+from pubtools.sign.models.msg import MsgError, MsgMessage
+from pubtools.sign.state import StateFile
 
 import json
 
@@ -67,3 +80,393 @@ def test_send_client_errors(
             [message1], [f"localhost:{port}"], f_client_certificate, f_ca_certificate, 1, errors
         )
         assert sc.run() == ["errors", "1"]
+
+
+def test_send_client_collectable(
+    f_cleanup_msgsigner_messages,
+    f_qpid_broker,
+    f_msgsigner_listen_to_topic,
+    f_fake_msgsigner,
+):
+    qpid_broker, port = f_qpid_broker
+    message = MsgMessage(
+        headers={}, address=f_msgsigner_listen_to_topic, body={"message": "test_message"}
+    )
+    sc = SendClient([message], [f"localhost:{port}"], "", "", 10, [])
+    assert sc.run() == []
+    assert sc._client._frames == []
+    assert sc._client.messages == []
+    assert sc._client._in_flight == {}
+    client = weakref.ref(sc._client)
+    container = weakref.ref(sc)
+    del sc
+    gc.collect()
+    assert client() is None
+    assert container() is None
+
+
+def test_send_client_broker_health(
+    f_cleanup_msgsigner_messages,
+    f_qpid_broker,
+    f_msgsigner_listen_to_topic,
+    f_fake_msgsigner,
+    tmp_path,
+):
+    qpid_broker, port = f_qpid_broker
+    message = MsgMessage(
+        headers={}, address=f_msgsigner_listen_to_topic, body={"message": "test_message"}
+    )
+    health = BrokerHealth(StateFile(str(tmp_path / "brokers.json")))
+    sc = SendClient([message], [f"localhost:{port}"], "", "", 10, [], health=health)
+    assert sc.run() == []
+    health.save()
+    score = health.state.load()[f"amqp://localhost:{port}"]
+    assert set(score) == {"connect", "rtt"}
+
+
+def test_send_client_broker_failure():
+    health = Mock()
+    client = _SendClient([], ["amqps://broker-01:5671"], "", "", [], health=health)
+    event = Mock()
+    event.connection.url = "amqps://broker-01:5671"
+    client.on_connection_opened(event)
+    health.record_latency.assert_not_called()
+    client.on_transport_error(event)
+    health.record_failure.assert_called_once_with("amqps://broker-01:5671")
+
+
+def test_send_client_circuit_open(tmp_path):
+    message = MsgMessage(headers={}, address="topic://Topic.sign", body={"message": "test"})
+    breaker = CircuitBreaker(StateFile(str(tmp_path / "circuits.json")), threshold=1)
+    breaker.record({topic_circuit("topic://Topic.sign"): True})
+    errors = []
+    sc = SendClient([message], ["localhost:5672"], "", "", 10, errors, breaker=breaker)
+    with patch("proton.reactor.Container.run") as patched_run:
+        assert sc.run() == errors
+    patched_run.assert_not_called()
+    assert [error.name for error in errors] == ["CircuitOpen"]
+
+
+def test_send_client_connect_timeout(
+    f_cleanup_msgsigner_messages,
+    f_qpid_broker,
+    f_msgsigner_listen_to_topic,
+    f_fake_msgsigner,
+    tmp_path,
+):
+    qpid_broker, port = f_qpid_broker
+    message = MsgMessage(
+        headers={}, address=f_msgsigner_listen_to_topic, body={"message": "test_message"}
+    )
+    # accepts tcp connections but never answers
+    dead_broker = socket.socket()
+    dead_broker.bind(("localhost", 0))
+    dead_broker.listen()
+    dead_port = dead_broker.getsockname()[1]
+    health = Mock()
+    health.order.side_effect = lambda urls: urls
+    sc = SendClient(
+        [message],
+        [f"localhost:{dead_port}", f"localhost:{port}"],
+        "",
+        "",
+        1,
+        [],
+        health=health,
+        heartbeat=5,
+        connect_timeout=0.5,
+    )
+    started = time.monotonic()
+    assert sc.run() == []
+    assert time.monotonic() - started < 5
+    dead_broker.close()
+    health.record_failure.assert_called_once_with(f"amqp://localhost:{dead_port}")
+    msgsigner, _, received_messages = f_fake_msgsigner
+    assert [x.body for x in received_messages] == [json.dumps(message.body)]
+
+
+def test_connect_timer():
+    client = Mock()
+    connection = Mock()
+    event = Mock()
+    timer = _ConnectTimer(client, connection)
+    for state in (Endpoint.REMOTE_ACTIVE, Endpoint.LOCAL_CLOSED):
+        connection.state = state
+        timer.on_timer_task(event)
+    connection.transport.close_tail.assert_not_called()
+    event.container.schedule.assert_not_called()
+
+    client.health = None
+    client.broker_urls = ["amqp://broker-01:5672", "amqp://broker-02:5672"]
+    client._connect_timeouts = 0
+    client.errors = []
+    connection.state = Endpoint.LOCAL_ACTIVE | Endpoint.REMOTE_UNINIT
+    timer.on_timer_task(event)
+    connection.transport.close_tail.assert_called_once()
+    connection.transport.close_head.assert_called_once()
+    event.container.schedule.assert_called_once_with(client.connect_timeout, timer)
+
+    # proton waits before reconnecting, the timer is re-armed
+    transport = connection.transport
+    connection.transport = None
+    timer.on_timer_task(event)
+    assert event.container.schedule.call_count == 2
+    assert client._connect_timeouts == 1
+
+    connection.transport = transport
+    timer.on_timer_task(event)
+    transport.close_tail.assert_called_once()
+    connection.close.assert_called_once()
+    event.container.stop.assert_called_once()
+    assert [error.name for error in client.errors] == ["ConnectTimeout"]
+
+
+def test_send_client_all_brokers_dead():
+    # accept tcp connections but never answer
+    dead_brokers = []
+    for _ in range(2):
+        dead_broker = socket.socket()
+        dead_broker.bind(("localhost", 0))
+        dead_broker.listen()
+        dead_brokers.append(dead_broker)
+    message = MsgMessage(headers={}, address="topic://Topic.sign", body={"message": "test"})
+    errors = []
+    sc = SendClient(
+        [message],
+        [f"localhost:{dead_broker.getsockname()[1]}" for dead_broker in dead_brokers],
+        "",
+        "",
+        1,
+        errors,
+        connect_timeout=0.3,
+    )
+    started = time.monotonic()
+    try:
+        assert sc.run() == errors
+    finally:
+        for dead_broker in dead_brokers:
+            dead_broker.close()
+    assert time.monotonic() - started < 5
+    assert [error.name for error in errors] == ["ConnectTimeout"]
+    # the breaker blames the brokers
+    assert is_broker_error(errors[0])
+
+
+def test_ssl_domain_shared():
+    with patch("proton.SSLDomain") as patched_ssl_domain:
+        patched_ssl_domain.side_effect = lambda mode: Mock()
+        domain = ssl_domain("/tmp/test-cert.pem", "/tmp/test-ca.pem")
+        send_client = _SendClient([], [], "/tmp/test-cert.pem", "/tmp/test-ca.pem", [])
+        recv_client = _RecvClient(
+            "queue://replies",
+            [],
+            "request_id",
+            [],
+            "/tmp/test-cert.pem",
+            "/tmp/test-ca.pem",
+            1,
+            {},
+            [],
+        )
+        other = ssl_domain("/tmp/test-cert.pem", None)
+    assert send_client.ssl_domain is domain
+    assert recv_client.ssl_domain is domain
+    assert other is not domain
+    domain.set_credentials.assert_called_once_with("/tmp/test-cert.pem", "/tmp/test-cert.pem", None)
+    domain.set_trusted_ca_db.assert_called_once_with("/tmp/test-ca.pem")
+    other.set_trusted_ca_db.assert_not_called()
+
+
+def test_encode_message():
+    message = MsgMessage(
+        headers={"mtype": "test"},
+        address="topic://Topic.sign",
+        body={"message": "test"},
+        reply_to="queue://replies",
+        correlation_id="1234",
+    )
+    decoded = Message()
+    decoded.decode(encode_message(message))
+    assert decoded.properties == {"mtype": "test"}
+    assert decoded.address == "topic://Topic.sign"
+    assert decoded.body == json.dumps({"message": "test"})
+    assert decoded.reply_to == "queue://replies"
+    assert decoded.correlation_id == "1234"
+    assert decoded.priority == Message.DEFAULT_PRIORITY
+    assert decoded.ttl == 0
+
+    decoded.decode(encode_message(message, priority=7, ttl=1.5))
+    assert decoded.priority == 7
+    assert decoded.ttl == 1.5
+
+
+def _delivery_event(tag):
+    event = Mock()
+    event.delivery.tag = tag
+    return event
+
+
+def test_send_client_resend_unsettled():
+    messages = [
+        MsgMessage(headers={}, address="topic://Topic.sign", body={"message": x}) for x in range(4)
+    ]
+    with patch(
+        "pubtools.sign.clients.msg_send_client.encode_message", side_effect=encode_message
+    ) as patched_encode:
+        client = _SendClient(messages, [], "", "", [])
+        event = Mock()
+        event.sender.delivery.side_effect = lambda tag: Mock(tag=tag)
+        event.sender.delivery_tag.side_effect = [b"1", b"2", b"3", b"4", b"5", b"6", b"7"]
+        for _ in range(4):
+            client.on_sendable(event)
+        client.on_accepted(_delivery_event(b"2"))
+        client.on_settled(_delivery_event(b"2"))
+        client.on_rejected(_delivery_event(b"4"))
+        client.on_settled(_delivery_event(b"4"))
+        client.on_disconnected(event)
+        # late outcome of delivery from the lost connection
+        client.on_accepted(_delivery_event(b"1"))
+        for _ in range(3):
+            client.on_sendable(event)
+        client.on_accepted(_delivery_event(b"6"))
+        last = _delivery_event(b"5")
+        client.on_accepted(last)
+    assert patched_encode.call_count == 4
+    assert [c.args[0] for c in event.sender.stream.call_args_list] == [
+        encode_message(messages[x]) for x in (0, 1, 2, 3, 0, 2)
+    ]
+    assert event.sender.advance.call_count == 6
+    assert client.sent == 6
+    assert client.resent == 2
+    assert client.confirmed == 4
+    assert [error.name for error in client.errors] == ["MessageRejected"]
+    last.connection.close.assert_called_once()
+
+    client.on_disconnected(event)
+    assert client.resent == 2
+
+
+def test_send_client_released():
+    messages = [
+        MsgMessage(headers={}, address="topic://Topic.sign", body={"message": x}) for x in range(2)
+    ]
+    client = _SendClient(messages, [], "", "", [])
+    event = Mock()
+    event.sender.delivery.side_effect = lambda tag: Mock(tag=tag)
+    event.sender.delivery_tag.side_effect = [b"1", b"2", b"3"]
+    client.sender = event.sender
+    client.on_sendable(event)
+    released = _delivery_event(b"1")
+    released.container = event.container
+    client.on_released(released)
+    client.on_settled(released)
+    # late outcome of released delivery
+    client.on_released(released)
+    client.on_accepted(_delivery_event(b"2"))
+    client.on_accepted(_delivery_event(b"3"))
+    assert [c.args[0] for c in event.sender.stream.call_args_list] == [
+        encode_message(messages[x]) for x in (0, 1, 0)
+    ]
+    assert client.resent == 1
+    assert client.confirmed == 2
+    assert client.errors == []
+
+
+def test_send_client_rejected():
+    messages = [
+        MsgMessage(headers={}, address="topic://Topic.sign", body={"message": x}) for x in range(3)
+    ]
+    errors = []
+    client = _SendClient(messages, [], "", "", errors)
+    event = Mock()
+    event.sender.delivery.side_effect = lambda tag: Mock(tag=tag)
+    event.sender.delivery_tag.side_effect = [b"1", b"2", b"3"]
+    client.on_sendable(event)
+    rejected = _delivery_event(b"1")
+    rejected.delivery.remote.condition = "amqp:unauthorized-access"
+    client.on_rejected(rejected)
+    client.on_settled(rejected)
+    # late outcome of rejected delivery
+    client.on_rejected(rejected)
+    unknown = _delivery_event(b"2")
+    client.on_settled(unknown)
+    client.on_accepted(_delivery_event(b"3"))
+    assert [(error.name, error.description) for error in errors] == [
+        ("MessageRejected", "amqp:unauthorized-access"),
+        ("MessageRejected", "Message settled by the broker without outcome"),
+    ]
+    # rejections blame the topic, not the broker
+    assert not any(is_broker_error(error) for error in errors)
+    assert client.rejected == errors
+    assert client.confirmed == 3
+    unknown.connection.close.assert_not_called()
+
+
+def test_send_client_rejected_after_retry():
+    message = MsgMessage(headers={}, address="topic://Topic.sign", body={"message": "test"})
+    errors = []
+    sc = SendClient([message], ["localhost:5672"], "", "", 2, errors)
+    rejected = MsgError(name="MessageRejected", description="rejected", source=None)
+
+    def run():
+        if not errors:
+            errors.append(rejected)
+            sc._client.rejected.append(rejected)
+
+    with patch("proton.reactor.Container.run", side_effect=run):
+        assert sc.run() == [rejected]
+
+
+def test_send_client_report_resent(caplog):
+    message = MsgMessage(headers={}, address="topic://Topic.sign", body={"message": "test"})
+    sc = SendClient([message], ["localhost:5672"], "", "", 1, [])
+    with patch("proton.reactor.Container.run"):
+        assert sc.run() == []
+        sc._client.resent = 1
+        assert sc.run() == []
+    assert sc.resent == 1
+    assert caplog.messages == ["1 of 1 messages were sent more than once"]
+
+
+def test_send_client_throttled():
+    messages = [
+        MsgMessage(headers={}, address="topic://Topic.sign", body={"message": x}) for x in range(3)
+    ]
+    limiter = Mock()
+    limiter.acquire.side_effect = [(0, 0.5), (2, 0), (0, 0.25), (1, 0)]
+    client = _SendClient(messages, [], "", "", [], limiter=limiter)
+    event = Mock()
+    client.sender = event.sender
+    client.on_sendable(event)
+    event.container.schedule.assert_called_once_with(0.5, client)
+    client.on_sendable(event)
+    assert limiter.acquire.call_count == 1
+    client.on_timer_task(event)
+    assert event.sender.stream.call_count == 2
+    event.container.schedule.assert_called_with(0.25, client)
+    client.on_timer_task(event)
+    assert [c.args[0] for c in limiter.acquire.call_args_list] == [3, 3, 1, 1]
+    assert [c.args[0] for c in event.sender.stream.call_args_list] == [
+        encode_message(message) for message in messages
+    ]
+
+
+def test_send_client_rate_limit(
+    f_cleanup_msgsigner_messages,
+    f_qpid_broker,
+    f_msgsigner_listen_to_topic,
+    f_fake_msgsigner,
+    tmp_path,
+):
+    qpid_broker, port = f_qpid_broker
+    messages = [
+        MsgMessage(headers={}, address=f_msgsigner_listen_to_topic, body={"message": x})
+        for x in range(8)
+    ]
+    limiter = RateLimiter(StateFile(str(tmp_path / "ratelimits.json")), {"environment:test": 5})
+    sc = SendClient(messages, [f"localhost:{port}"], "", "", 1, [], limiter=limiter)
+    started = time.monotonic()
+    assert sc.run() == []
+    assert time.monotonic() - started >= 0.5
+    msgsigner, _, received_messages = f_fake_msgsigner
+    assert sorted(json.loads(x.body)["message"] for x in received_messages) == list(range(8))
@@ -1,5 +1,8 @@
 import base64
 import json
+import os
+import time
+import uuid
 
 from click.testing import CliRunner
 import pytest
@@ -20,11 +23,23 @@ from pubtools.sign.signers.msgsigner import (
     msg_clear_sign_main,
     msg_container_sign_main,
     _get_config_file,
+    _sign_shard,
+    _split_operation,
+    _MessageFactory,
+    _random_request_ids,
 )
+from pubtools.sign.cache import cache_dir
 from pubtools.sign.conf.conf import load_config
-from pubtools.sign.models.msg import MsgMessage
+from pubtools.sign.models.msg import MsgMessage, MsgReply
+from pubtools.sign.clients.breaker import CircuitBreaker
+from pubtools.sign.clients.health import BrokerHealth
+from pubtools.sign.clients.journal import Journal
+from pubtools.sign.clients.msg_send_client import _SendClient
 from pubtools.sign.exceptions import UnsupportedOperation
 from pubtools.sign.results.signing_results import SigningResults
+from pubtools.sign.results.store import ChainedStore, DetachedStore, DiskStore, SignatureRecord
+from pubtools.sign.results.lookaside import LookasideStore, empty_summary
+from pubtools.sign.state import state_file
 
 
 def test_msg_container_sign(f_msg_signer, f_config_msg_signer_ok):
@@ -153,20 +168,30 @@ def test_get_config_no_configuration_found():
             _get_config_file("/non-existining/file")
 
 
-def test__construct_signing_message(f_config_msg_signer_ok):
+def test_deterministic_request_id(f_config_msg_signer_ok):
     signer = MsgSigner()
     signer.load_config(load_config(f_config_msg_signer_ok))
-    with patch("uuid.uuid4", return_value="1234-5678-abcd-efgh"):
-        with patch("pubtools.sign.signers.msgsigner.isodate_now") as patched_date:
-            patched_date.return_value = "created-date-Z"
-            ret = signer._construct_signing_message("some-claim", "some-signing-key", {})
-            assert ret == {
-                "sig_key_id": "some-signing-key",
-                "claim_file": "some-claim",
-                "request_id": "1234-5678-abcd-efgh",
-                "created": "created-date-Z",
-                "requested_by": "pubtools-sign-test",
-            }
+    signer.deterministic_request_id = True
+    operation = ClearSignOperation(
+        inputs=["hello", "world", "hello"], signing_key="test-signing-key", task_id="1"
+    )
+
+    with patch("pubtools.sign.signers.msgsigner.SendClient") as patched_send_client:
+        with patch("pubtools.sign.signers.msgsigner.RecvClient"):
+            patched_send_client.return_value.run.return_value = []
+            signer.clear_sign(operation)
+            signer.clear_sign(operation)
+
+    first, second = [
+        [message.body["request_id"] for message in call[1]["messages"]]
+        for call in patched_send_client.call_args_list
+    ]
+    assert first == second
+    assert len(set(first)) == 3
+
+    other_task = ClearSignOperation(inputs=["hello"], signing_key="test-signing-key", task_id="2")
+    assert signer._request_id("hello", other_task) != first[0]
+    assert signer._request_id("hello", operation) == first[0]
 
 
 def test__construct_headers(f_config_msg_signer_ok):
@@ -191,36 +216,6 @@ def test_operations():
     assert signer.operations() == [ContainerSignOperation, ClearSignOperation]
 
 
-def test_create_msg_message(f_config_msg_signer_ok):
-    signer = MsgSigner()
-    signer.load_config(load_config(f_config_msg_signer_ok))
-
-    data = "test-data"
-    with patch("uuid.uuid4", return_value="1234-5678-abcd-efgh"):
-        with patch("pubtools.sign.signers.msgsigner.isodate_now") as patched_date:
-            patched_date.return_value = "created-date-Z"
-            operation = ClearSignOperation(
-                inputs=["test-data-inputs"], signing_key="test-key", task_id="1"
-            )
-            assert signer._create_msg_message(data, operation, "test-sign") == MsgMessage(
-                headers={
-                    "service": "pubtools-sign",
-                    "environment": "prod",
-                    "owner_id": "pubtools-sign-test",
-                    "mtype": "test-sign",
-                    "source": "metadata",
-                },
-                address="topic://Topic.sign",
-                body={
-                    "sig_key_id": "test-key",
-                    "claim_file": "test-data",
-                    "request_id": "1234-5678-abcd-efgh",
-                    "created": "created-date-Z",
-                    "requested_by": "pubtools-sign-test",
-                },
-            )
-
-
 def test_sign(f_config_msg_signer_ok):
     signer = MsgSigner()
     signer.load_config(load_config(f_config_msg_signer_ok))
@@ -268,8 +263,27 @@ def test_create_manifest_claim_message():
     )
 
 
-@patch("uuid.uuid4", return_value="1234-5678-abcd-efgh")
-def test_clear_sign(patched_uuid, f_config_msg_signer_ok):
+def test_create_manifest_claim_messages():
+    digests = ["sha256:" + "a" * 64, 'quote"back\\slash', "\u0159\x01", ""]
+    references = ["registry.example.com/ns/repo:1", "\u00fc/\u2603:tag", "", "x" * 1000]
+    assert MsgSigner.create_manifest_claim_messages("some-key", digests, references) == [
+        MsgSigner.create_manifest_claim_message("some-key", digest, reference)
+        for digest, reference in zip(digests, references)
+    ]
+    assert MsgSigner.create_manifest_claim_messages("some-key", [], []) == []
+
+
+def _recv_error(patched_recv_client):
+    def _run():
+        patched_recv_client.call_args[1]["errors"].append(
+            MsgError(name="TestError", description="test error description", source="test-source")
+        )
+
+    return _run
+
+
+@patch("pubtools.sign.signers.msgsigner._random_request_ids", return_value=["1234-5678-abcd-efgh"])
+def test_clear_sign(patched_request_ids, f_config_msg_signer_ok):
     clear_sign_operation = ClearSignOperation(
         inputs=["hello world"],
         signing_key="test-signing-key",
@@ -277,6 +291,7 @@ def test_clear_sign(patched_uuid, f_config_msg_signer_ok):
     )
     with patch("pubtools.sign.signers.msgsigner.SendClient") as patched_send_client:
         with patch("pubtools.sign.signers.msgsigner.RecvClient") as patched_recv_client:
+            patched_send_client.return_value.resent = 0
             patched_send_client.return_value.run.return_value = []
             patched_recv_client.return_value.run.return_value = []
             patched_recv_client.return_value.recv = {"1234-5678-abcd-efgh": "signed:'hello world'"}
@@ -296,8 +311,8 @@ def test_clear_sign(patched_uuid, f_config_msg_signer_ok):
             )
 
 
-@patch("uuid.uuid4", return_value="1234-5678-abcd-efgh")
-def test_clear_sign_recv_errors(patched_uuid, f_config_msg_signer_ok):
+@patch("pubtools.sign.signers.msgsigner._random_request_ids", return_value=["1234-5678-abcd-efgh"])
+def test_clear_sign_recv_errors(patched_request_ids, f_config_msg_signer_ok):
     clear_sign_operation = ClearSignOperation(
         inputs=["hello world"],
         signing_key="test-signing-key",
@@ -305,12 +320,9 @@ def test_clear_sign_recv_errors(patched_uuid, f_config_msg_signer_ok):
     )
     with patch("pubtools.sign.signers.msgsigner.SendClient") as patched_send_client:
         with patch("pubtools.sign.signers.msgsigner.RecvClient") as patched_recv_client:
+            patched_send_client.return_value.resent = 0
             patched_send_client.return_value.run.return_value = []
-            patched_recv_client.return_value.errors = [
-                MsgError(
-                    name="TestError", description="test error description", source="test-source"
-                )
-            ]
+            patched_recv_client.return_value.run.side_effect = _recv_error(patched_recv_client)
             patched_recv_client.return_value.recv = {"1234-5678-abcd-efgh": "signed:'hello world'"}
 
             signer = MsgSigner()
@@ -327,8 +339,8 @@ def test_clear_sign_recv_errors(patched_uuid, f_config_msg_signer_ok):
             )
 
 
-@patch("uuid.uuid4", return_value="1234-5678-abcd-efgh")
-def test_clear_sign_send_errors(patched_uuid, f_config_msg_signer_ok):
+@patch("pubtools.sign.signers.msgsigner._random_request_ids", return_value=["1234-5678-abcd-efgh"])
+def test_clear_sign_send_errors(patched_request_ids, f_config_msg_signer_ok):
     clear_sign_operation = ClearSignOperation(
         inputs=["hello world"],
         signing_key="test-signing-key",
@@ -336,6 +348,7 @@ def test_clear_sign_send_errors(patched_uuid, f_config_msg_signer_ok):
     )
     with patch("pubtools.sign.signers.msgsigner.SendClient") as patched_send_client:
         with patch("pubtools.sign.signers.msgsigner.RecvClient") as patched_recv_client:
+            patched_send_client.return_value.resent = 0
             patched_send_client.return_value.run.return_value = [
                 MsgError(
                     name="TestError", description="test error description", source="test-source"
@@ -358,8 +371,8 @@ def test_clear_sign_send_errors(patched_uuid, f_config_msg_signer_ok):
             )
 
 
-@patch("uuid.uuid4", return_value="1234-5678-abcd-efgh")
-def test_container_sign(patched_uuid, f_config_msg_signer_ok):
+@patch("pubtools.sign.signers.msgsigner._random_request_ids", return_value=["1234-5678-abcd-efgh"])
+def test_container_sign(patched_request_ids, f_config_msg_signer_ok):
     container_sign_operation = ContainerSignOperation(
         task_id="1",
         digests=["sha256:abcdefg"],
@@ -369,6 +382,7 @@ def test_container_sign(patched_uuid, f_config_msg_signer_ok):
 
     with patch("pubtools.sign.signers.msgsigner.SendClient") as patched_send_client:
         with patch("pubtools.sign.signers.msgsigner.RecvClient") as patched_recv_client:
+            patched_send_client.return_value.resent = 0
             patched_send_client.return_value.run.return_value = []
             patched_recv_client.return_value.run.return_value = []
             patched_recv_client.return_value.recv = {"1234-5678-abcd-efgh": "signed:'claim'"}
@@ -388,8 +402,8 @@ def test_container_sign(patched_uuid, f_config_msg_signer_ok):
             )
 
 
-@patch("uuid.uuid4", return_value="1234-5678-abcd-efgh")
-def test_container_sign_recv_errors(patched_uuid, f_config_msg_signer_ok):
+@patch("pubtools.sign.signers.msgsigner._random_request_ids", return_value=["1234-5678-abcd-efgh"])
+def test_container_sign_recv_errors(patched_request_ids, f_config_msg_signer_ok):
     container_sign_operation = ContainerSignOperation(
         task_id="1",
         digests=["sha256:abcdefg"],
@@ -399,12 +413,9 @@ def test_container_sign_recv_errors(patched_uuid, f_config_msg_signer_ok):
 
     with patch("pubtools.sign.signers.msgsigner.SendClient") as patched_send_client:
         with patch("pubtools.sign.signers.msgsigner.RecvClient") as patched_recv_client:
+            patched_send_client.return_value.resent = 0
             patched_send_client.return_value.run.return_value = []
-            patched_recv_client.return_value.errors = [
-                MsgError(
-                    name="TestError", description="test error description", source="test-source"
-                )
-            ]
+            patched_recv_client.return_value.run.side_effect = _recv_error(patched_recv_client)
             patched_recv_client.return_value.recv = {"1234-5678-abcd-efgh": "signed:'hello world'"}
 
             signer = MsgSigner()
@@ -423,8 +434,8 @@ def test_container_sign_recv_errors(patched_uuid, f_config_msg_signer_ok):
             )
 
 
-@patch("uuid.uuid4", return_value="1234-5678-abcd-efgh")
-def test_container_sign_send_errors(patched_uuid, f_config_msg_signer_ok):
+@patch("pubtools.sign.signers.msgsigner._random_request_ids", return_value=["1234-5678-abcd-efgh"])
+def test_container_sign_send_errors(patched_request_ids, f_config_msg_signer_ok):
     container_sign_operation = ContainerSignOperation(
         task_id="1",
         digests=["sha256:abcdefg"],
@@ -433,6 +444,7 @@ def test_container_sign_send_errors(patched_uuid, f_config_msg_signer_ok):
     )
     with patch("pubtools.sign.signers.msgsigner.SendClient") as patched_send_client:
         with patch("pubtools.sign.signers.msgsigner.RecvClient") as patched_recv_client:
+            patched_send_client.return_value.resent = 0
             patched_send_client.return_value.run.return_value = [
                 MsgError(
                     name="TestError", description="test error description", source="test-source"
@@ -457,8 +469,8 @@ def test_container_sign_send_errors(patched_uuid, f_config_msg_signer_ok):
             )
 
 
-@patch("uuid.uuid4", return_value="1234-5678-abcd-efgh")
-def test_container_sign_wrong_inputs(patched_uuid, f_config_msg_signer_ok):
+@patch("pubtools.sign.signers.msgsigner._random_request_ids", return_value=["1234-5678-abcd-efgh"])
+def test_container_sign_wrong_inputs(patched_request_ids, f_config_msg_signer_ok):
     container_sign_operation = ContainerSignOperation(
         task_id="1",
         digests=["sha256:abcdefg"],
@@ -488,7 +500,108 @@ def test_msgsig_doc_arguments():
             "message_id_key": {
                 "description": "Attribute name in message body which should be used as message id"
             },
+            "message_id_header": {
+                "description": "Reply property with message id, replies providing it are matched "
+                "without decoding their body"
+            },
             "log_level": {"description": "Log level"},
+            "result_store": {
+                "description": "How received replies are stored in operation results: replies "
+                "(full replies), compact (only signatures, errors and headers) or disk (compact "
+                "records spilled to a temporary file and loaded on access)"
+            },
+            "result_store_dir": {
+                "description": "Directory for temporary files of disk result store"
+            },
+            "reply_headers": {"description": "Keep reply headers in compact results"},
+            "reply_queue": {
+                "description": "Address of queue created for replies of each signing session, "
+                "replies are then matched by correlation id. Session id is derived from the "
+                "operation and its chunk, so signing the operation again reuses its queues. "
+                "Queues are left on the broker, which should delete them when they're idle"
+            },
+            "reply_selector": {
+                "description": "Selector attached to the reply receiver, so the broker delivers "
+                "only replies of the operation"
+            },
+            "deterministic_request_id": {
+                "description": "Derive request id from signing key, claim and task id instead of "
+                "random uuid, so replies to any previous attempt of the operation are accepted"
+            },
+            "shards": {
+                "description": "Number of processes the operation is split to and signed in "
+                "parallel"
+            },
+            "pin_brokers": {
+                "description": "Connect each shard to a different messaging broker first"
+            },
+            "state_dir": {
+                "description": "Directory with state shared by signing processes on the host, "
+                "broker health scores are kept there"
+            },
+            "broker_cooldown": {
+                "description": "Seconds a failed broker is used only for failover, requires "
+                "state_dir"
+            },
+            "circuit_threshold": {
+                "description": "Number of consecutive failed attempts on brokers or a topic "
+                "after which further attempts fail fast, 0 disables the circuit breaker, requires "
+                "state_dir"
+            },
+            "circuit_reset_timeout": {
+                "description": "Seconds after which a single attempt probes whether failing "
+                "brokers or topic recovered"
+            },
+            "heartbeat": {
+                "description": "Connection idle timeout in seconds, broker is asked for "
+                "heartbeats so a dead connection is detected within it"
+            },
+            "connect_timeout": {
+                "description": "Seconds to wait for a broker connection before failing over to "
+                "the next broker"
+            },
+            "chunk_size": {
+                "description": "Maximal number of requests sent and received in one messaging "
+                "session, larger operations are signed in pipelined chunks, 0 means unlimited"
+            },
+            "chunk_bytes": {
+                "description": "Maximal size of request bodies in bytes sent in one messaging "
+                "session, 0 means unlimited"
+            },
+            "adaptive_timeout": {
+                "description": "Derive receive timeout from number of requests and signing "
+                "service latency observed in previous runs instead of static timeout, requires "
+                "state_dir"
+            },
+            "min_timeout": {"description": "Lower bound of adaptive receive timeout in seconds"},
+            "max_timeout": {
+                "description": "Upper bound of adaptive receive timeout in seconds, static "
+                "timeout when not set"
+            },
+            "timeout_margin": {
+                "description": "Factor the expected time of replies is multiplied by in adaptive "
+                "receive timeout"
+            },
+            "rate_limit": {
+                "description": "Maximal number of signing requests per second sent to the "
+                "environment by all signing processes on the host"
+            },
+            "key_rate_limits": {
+                "description": "Signing keys mapped to maximal number of signing requests per "
+                "second sent with the key by all signing processes on the host"
+            },
+            "clear_sign_priority": {
+                "description": "Priority (0-9) of clear sign requests, broker default when not set"
+            },
+            "container_sign_priority": {
+                "description": "Priority (0-9) of container sign requests, broker default when "
+                "not set"
+            },
+            "request_ttl": {
+                "description": "Expire signing requests after receive timeout and expected "
+                "time of sending under rate limits, so the broker drops requests whose replies "
+                "are no longer awaited"
+            },
         },
         "examples": {
             "msg_signer": {
@@ -504,7 +617,33 @@ def test_msgsig_doc_arguments():
                 "timeout": 1,
                 "retries": 3,
                 "message_id_key": "123",
+                "message_id_header": "request_id",
                 "log_level": "debug",
+                "result_store": "compact",
+                "result_store_dir": "/var/tmp",
+                "reply_headers": False,
+                "reply_queue": "queue://Consumer.{creator}.{task_id}.replies.{session_id}",
+                "reply_selector": "pub_task_id = '{task_id}'",
+                "deterministic_request_id": False,
+                "shards": 4,
+                "pin_brokers": True,
+                "state_dir": "~/.cache/pubtools-sign",
+                "broker_cooldown": 60,
+                "circuit_threshold": 5,
+                "circuit_reset_timeout": 60,
+                "heartbeat": 10,
+                "connect_timeout": 5,
+                "chunk_size": 10000,
+                "chunk_bytes": 50000000,
+                "adaptive_timeout": True,
+                "min_timeout": 10,
+                "max_timeout": 3600,
+                "timeout_margin": 2.0,
+                "rate_limit": 100,
+                "key_rate_limits": {"container-signing-key": 50},
+                "clear_sign_priority": 7,
+                "container_sign_priority": 4,
+                "request_ttl": True,
             }
         },
     }
@@ -515,6 +654,16 @@ def test_msgsigresult_to_dict():
         "status": "status",
         "error_message": "error_message",
     }
+    assert MsgSignerResults(status="ok", error_message="", shards=[{"shard": 0}]).to_dict() == {
+        "status": "ok",
+        "error_message": "",
+        "shards": [{"shard": 0}],
+    }
+    assert MsgSignerResults(status="ok", error_message="", resent=2).to_dict() == {
+        "status": "ok",
+        "error_message": "",
+        "resent": 2,
+    }
 
 
 def test_msgsigresult_doc_arguments():
@@ -526,3 +675,1185 @@ def test_msgsigresult_doc_arguments():
             "sample": {"status": "ok", "error_message": ""},
         }
     }
+
+
+def _journal_operation():
+    return ClearSignOperation(
+        inputs=["hello world", "hello again"], signing_key="test-signing-key", task_id="1"
+    )
+
+
+def _journal_signer(f_config_msg_signer_ok, journal, resume=False):
+    signer = MsgSigner()
+    signer.load_config(load_config(f_config_msg_signer_ok))
+    signer.journal = journal
+    signer.resume = resume
+    return signer
+
+
+def _start_journal(path, signer, operation, sent=True):
+    journal = Journal(path)
+    messages = _MessageFactory(signer, operation, "clearsig_signature").create(operation.inputs)
+    journal.start(operation, messages)
+    journal.record_reply(
+        messages[0].body["request_id"], MsgReply('{"msg": {"signed_data": "signed 1"}}', {})
+    )
+    if sent:
+        journal.mark_sent()
+    journal.close()
+    return [message.body["request_id"] for message in messages]
+
+
+def test_clear_sign_journal(f_config_msg_signer_ok, tmp_path):
+    path = str(tmp_path / "journal.db")
+    with patch("pubtools.sign.signers.msgsigner.SendClient") as patched_send_client:
+        with patch("pubtools.sign.signers.msgsigner.RecvClient") as patched_recv_client:
+            patched_send_client.return_value.run.return_value = []
+            signer = _journal_signer(f_config_msg_signer_ok, path)
+            message_ids = []
+
+            def _recv(**kwargs):
+                message_ids.extend(kwargs["message_ids"])
+                assert isinstance(kwargs["journal"], Journal)
+                patched_recv_client.return_value.recv = {
+                    message_ids[1]: "signed 2",
+                    message_ids[0]: "signed 1",
+                }
+                return patched_recv_client.return_value
+
+            patched_recv_client.side_effect = _recv
+            res = signer.clear_sign(_journal_operation())
+
+    assert res.operation_result.outputs == ["signed 1", "signed 2"]
+    journal = Journal(path)
+    assert journal.sent
+    assert [message.body["request_id"] for message in journal.messages()] == message_ids
+    journal.close()
+
+
+def test_clear_sign_journal_send_errors(f_config_msg_signer_ok, tmp_path):
+    path = str(tmp_path / "journal.db")
+    with patch("pubtools.sign.signers.msgsigner.SendClient") as patched_send_client:
+        with patch("pubtools.sign.signers.msgsigner.RecvClient"):
+            patched_send_client.return_value.run.return_value = [
+                MsgError(name="TestError", description="test error description", source="test")
+            ]
+            signer = _journal_signer(f_config_msg_signer_ok, path)
+            res = signer.clear_sign(_journal_operation())
+
+    assert res.signer_results.status == "error"
+    journal = Journal(path)
+    assert journal.started
+    assert not journal.sent
+    journal.close()
+
+
+def test_clear_sign_resume(f_config_msg_signer_ok, tmp_path):
+    path = str(tmp_path / "journal.db")
+    operation = _journal_operation()
+    signer = _journal_signer(f_config_msg_signer_ok, path, resume=True)
+    message_ids = _start_journal(path, signer, operation)
+    with patch("pubtools.sign.signers.msgsigner.SendClient") as patched_send_client:
+        with patch("pubtools.sign.signers.msgsigner.RecvClient") as patched_recv_client:
+            patched_recv_client.return_value.recv = {message_ids[1]: "signed 2"}
+            res = signer.clear_sign(operation)
+
+    patched_send_client.assert_not_called()
+    assert patched_recv_client.call_args[1]["message_ids"] == [message_ids[1]]
+    assert res.signer_results.status == "ok"
+    assert res.operation_result.outputs == [({"msg": {"signed_data": "signed 1"}}, {}), "signed 2"]
+
+
+def test_clear_sign_resume_not_sent(f_config_msg_signer_ok, tmp_path):
+    path = str(tmp_path / "journal.db")
+    operation = _journal_operation()
+    signer = _journal_signer(f_config_msg_signer_ok, path, resume=True)
+    message_ids = _start_journal(path, signer, operation, sent=False)
+    with patch("pubtools.sign.signers.msgsigner.SendClient") as patched_send_client:
+        with patch("pubtools.sign.signers.msgsigner.RecvClient") as patched_recv_client:
+            patched_send_client.return_value.run.return_value = []
+            patched_recv_client.return_value.recv = {message_ids[1]: "signed 2"}
+            signer.clear_sign(operation)
+
+    assert [
+        message.body["request_id"] for message in patched_send_client.call_args[1]["messages"]
+    ] == [message_ids[1]]
+    journal = Journal(path)
+    assert journal.sent
+    journal.close()
+
+
+def test_clear_sign_resume_different_operation(f_config_msg_signer_ok, tmp_path):
+    path = str(tmp_path / "journal.db")
+    signer = _journal_signer(f_config_msg_signer_ok, path, resume=True)
+    _start_journal(path, signer, _journal_operation())
+    with pytest.raises(ValueError, match="different operation"):
+        signer.clear_sign(
+            ClearSignOperation(inputs=["other"], signing_key="test-signing-key", task_id="1")
+        )
+
+
+class _ChunkClients:
+    """Fake messaging clients replying to chunks of signing requests."""
+
+    def __init__(self, total, send_errors=(), recv_errors=(), pipelined=False, reply=None):
+        self.total = total
+        self.reply = reply or (lambda request_id: f"signed {request_id}")
+        self.send_errors = send_errors
+        self.recv_errors = recv_errors
+        self.pipelined = pipelined
+        self.sent = []
+        self.received = []
+        self.sent_at = []
+        self.overlapped = []
+
+    def send_client(self, **kwargs):
+        request_ids = [message.body["request_id"] for message in kwargs["messages"]]
+        client = Mock(resent=1)
+
+        def run():
+            self.sent.append(request_ids)
+            if request_ids[0] in self.send_errors:
+                return [MsgError(name="SendError", description="send failed", source=None)]
+            return []
+
+        client.run.side_effect = run
+        return client
+
+    def recv_client(self, **kwargs):
+        request_ids = kwargs["message_ids"]
+        assert kwargs["recv"] is None
+        self.received.append((request_ids, kwargs["topic"]))
+        self.sent_at.append(kwargs["sent_at"])
+        number = len(self.received)
+        client = Mock()
+        client.recv = {}
+
+        def run():
+            if self.pipelined and number < self.total:
+                # replies are received until the next chunk is sent
+                deadline = time.monotonic() + 5
+                while len(self.sent) <= number and time.monotonic() < deadline:
+                    time.sleep(0.01)
+                self.overlapped.append(len(self.sent) > number)
+            if request_ids[0] in self.recv_errors:
+                kwargs["errors"].append(
+                    MsgError(name="TestError", description="test error description", source=None)
+                )
+                request_ids_ok = request_ids[:1]
+            else:
+                request_ids_ok = request_ids
+            client.recv = {request_id: self.reply(request_id) for request_id in request_ids_ok}
+
+        client.run.side_effect = run
+        return client
+
+    def patch(self):
+        send = patch("pubtools.sign.signers.msgsigner.SendClient", side_effect=self.send_client)
+        recv = patch("pubtools.sign.signers.msgsigner.RecvClient", side_effect=self.recv_client)
+        return send, recv
+
+
+def _chunk_signer(f_config_msg_signer_ok, **attrs):
+    signer = MsgSigner()
+    signer.load_config(load_config(f_config_msg_signer_ok))
+    for name, value in attrs.items():
+        setattr(signer, name, value)
+    return signer
+
+
+@patch(
+    "pubtools.sign.signers.msgsigner._random_request_ids",
+    side_effect=lambda count: [f"id-{x}" for x in range(count)],
+)
+def test_clear_sign_chunks(patched_request_ids, f_config_msg_signer_ok, tmp_path):
+    path = str(tmp_path / "journal.db")
+    signer = _chunk_signer(
+        f_config_msg_signer_ok,
+        chunk_size=2,
+        reply_queue="queue://replies.{session_id}",
+        journal=path,
+    )
+    clients = _ChunkClients(3, pipelined=True)
+    send, recv = clients.patch()
+    with send, recv:
+        res = signer.clear_sign(
+            ClearSignOperation(
+                inputs=[f"data-{x}" for x in range(5)], signing_key="test-signing-key", task_id="1"
+            )
+        )
+
+    assert res.signer_results == MsgSignerResults(status="ok", error_message="", resent=3)
+    assert res.operation_result.outputs == [f"signed id-{x}" for x in range(5)]
+    assert clients.sent == [["id-0", "id-1"], ["id-2", "id-3"], ["id-4"]]
+    assert [request_ids for request_ids, _ in clients.received] == clients.sent
+    topics = [topic for _, topic in clients.received]
+    assert len(set(topics)) == 3
+    assert all(topic.startswith("queue://replies.") for topic in topics)
+    assert clients.overlapped == [True, True]
+    # latency of every chunk is measured from start of its sending
+    assert clients.sent_at == sorted(clients.sent_at)
+    assert all(isinstance(sent_at, float) for sent_at in clients.sent_at)
+    journal = Journal(path)
+    assert journal.sent
+    assert [message.reply_to for message in journal.messages()] == [
+        topics[0],
+        topics[0],
+        topics[1],
+        topics[1],
+        topics[2],
+    ]
+    journal.close()
+
+
+@patch(
+    "pubtools.sign.signers.msgsigner._random_request_ids",
+    side_effect=lambda count: [f"id-{x}" for x in range(count)],
+)
+def test_clear_sign_chunk_errors(patched_request_ids, f_config_msg_signer_ok, tmp_path):
+    path = str(tmp_path / "journal.db")
+    signer = _chunk_signer(f_config_msg_signer_ok, chunk_size=2, journal=path)
+    clients = _ChunkClients(3, send_errors={"id-2"}, recv_errors={"id-4"})
+    send, recv = clients.patch()
+    with send, recv:
+        res = signer.clear_sign(
+            ClearSignOperation(
+                inputs=[f"data-{x}" for x in range(6)], signing_key="test-signing-key", task_id="1"
+            )
+        )
+
+    assert res.signer_results == MsgSignerResults(
+        status="error",
+        error_message="Chunk 2: SendError : send failed\n"
+        "Chunk 3: TestError : test error description\n",
+        resent=3,
+    )
+    assert res.operation_result.outputs == ["signed id-0", "signed id-1", "", "", "signed id-4", ""]
+    assert [request_ids for request_ids, _ in clients.received] == [
+        ["id-0", "id-1"],
+        ["id-4", "id-5"],
+    ]
+    journal = Journal(path)
+    assert not journal.sent
+    journal.close()
+
+
+def test_clear_sign_chunks_resume(f_config_msg_signer_ok, tmp_path):
+    path = str(tmp_path / "journal.db")
+    operation = ClearSignOperation(
+        inputs=[f"data-{x}" for x in range(4)], signing_key="test-signing-key", task_id="1"
+    )
+    signer = _chunk_signer(
+        f_config_msg_signer_ok,
+        chunk_bytes=400,
+        journal=path,
+        resume=True,
+        result_store="compact",
+    )
+    message_ids = _start_journal(path, signer, operation)
+    clients = _ChunkClients(
+        2, reply=lambda request_id: ({"msg": {"signed_data": f"signed {request_id}"}}, {})
+    )
+    send, recv = clients.patch()
+    with send, recv:
+        res = signer.clear_sign(operation)
+
+    assert clients.sent == []
+    assert [request_ids for request_ids, _ in clients.received] == [
+        message_ids[1:3],
+        message_ids[3:],
+    ]
+    assert clients.sent_at == [None, None]
+    assert res.signer_results.status == "ok"
+    assert [record.signature for record in res.operation_result.outputs] == ["signed 1"] + [
+        f"signed {request_id}" for request_id in message_ids[1:]
+    ]
+
+
+@patch(
+    "pubtools.sign.signers.msgsigner._random_request_ids",
+    side_effect=lambda count: [f"id-{x}" for x in range(count)],
+)
+def test_clear_sign_adaptive_timeout(patched_request_ids, f_config_msg_signer_ok, tmp_path):
+    signer = _chunk_signer(
+        f_config_msg_signer_ok,
+        state_dir=str(tmp_path),
+        adaptive_timeout=True,
+        min_timeout=1,
+        max_timeout=600,
+    )
+    operation = ClearSignOperation(
+        inputs=[f"data-{x}" for x in range(3)], signing_key="test-signing-key", task_id="1"
+    )
+    key = "ClearSignOperation:prod:topic://Topic.sign"
+    with patch("pubtools.sign.signers.msgsigner.SendClient") as patched_send_client:
+        with patch("pubtools.sign.signers.msgsigner.RecvClient") as patched_recv_client:
+            patched_send_client.return_value.run.return_value = []
+            patched_recv_client.return_value.recv = {f"id-{x}": "signed" for x in range(3)}
+            patched_recv_client.return_value.service_times = (2.0, 0.5)
+            with patch("pubtools.sign.signers.msgsigner.time.monotonic", return_value=50.0):
+                signer.clear_sign(operation)
+            assert patched_recv_client.call_args[1]["timeout"] == 1
+            assert patched_recv_client.call_args[1]["sent_at"] == 50.0
+            assert signer._signer_latency().state.load() == {key: {"latency": 2.0, "interval": 0.5}}
+
+            signer.clear_sign(operation)
+            assert patched_recv_client.call_args[1]["timeout"] == 6.0
+
+            patched_recv_client.return_value.run.side_effect = (
+                lambda: patched_recv_client.call_args[1]["errors"].append(
+                    MsgError(name="MessagingTimeout", description="Out of time", source=None)
+                )
+            )
+            res = signer.clear_sign(operation)
+            assert res.signer_results.status == "error"
+            assert signer._signer_latency().state.load()[key]["latency"] == pytest.approx(4.0)
+
+            patched_recv_client.return_value.run.side_effect = _recv_error(patched_recv_client)
+            signer.clear_sign(operation)
+            assert signer._signer_latency().state.load()[key]["latency"] == pytest.approx(4.0)
+
+
+def test_rate_limiter(f_config_msg_signer_ok, tmp_path):
+    signer = _chunk_signer(f_config_msg_signer_ok)
+    operation = ClearSignOperation(inputs=["data"], signing_key="test-signing-key", task_id="1")
+    assert signer._rate_limiter(operation) is None
+
+    signer.rate_limit = 100
+    signer.key_rate_limits = {"test-signing-key": 10, "other-key": 20}
+    limiter = signer._rate_limiter(operation)
+    assert limiter.rates == {"environment:prod": 100, "key:prod:test-signing-key": 10}
+    assert limiter.state.path == os.path.join(cache_dir(), "ratelimits.json")
+
+    signer.rate_limit = None
+    signer.state_dir = str(tmp_path)
+    limiter = signer._rate_limiter(operation)
+    assert limiter.rates == {"key:prod:test-signing-key": 10}
+    assert limiter.state.path == str(tmp_path / "ratelimits.json")
+    with patch("pubtools.sign.signers.msgsigner.SendClient") as patched_send_client:
+        with patch("pubtools.sign.signers.msgsigner.RecvClient"):
+            patched_send_client.return_value.run.return_value = []
+            signer.clear_sign(operation)
+    assert patched_send_client.call_args[1]["limiter"].rates == limiter.rates
+
+
+def test_sign_priority_ttl(f_config_msg_signer_ok):
+    signer = _chunk_signer(f_config_msg_signer_ok, clear_sign_priority=7, container_sign_priority=2)
+    with patch("pubtools.sign.signers.msgsigner.SendClient") as patched_send_client:
+        with patch("pubtools.sign.signers.msgsigner.RecvClient"):
+            patched_send_client.return_value.run.return_value = []
+            signer.clear_sign(
+                ClearSignOperation(inputs=["data"], signing_key="test-signing-key", task_id="1")
+            )
+            assert patched_send_client.call_args[1]["priority"] == 7
+            assert patched_send_client.call_args[1]["ttl"] is None
+
+            signer.request_ttl = True
+            signer.container_sign(
+                ContainerSignOperation(
+                    task_id="1",
+                    digests=["sha256:abcdefg"],
+                    references=["some-registry/namespace/repo:tag"],
+                    signing_key="test-signing-key",
+                )
+            )
+            assert patched_send_client.call_args[1]["priority"] == 2
+            assert patched_send_client.call_args[1]["ttl"] == 1
+
+            # expected time of sending under the strictest rate limit extends the ttl
+            signer.rate_limit = 4
+            signer.key_rate_limits = {"test-signing-key": 2}
+            signer.clear_sign(
+                ClearSignOperation(
+                    inputs=["data-1", "data-2", "data-3"],
+                    signing_key="test-signing-key",
+                    task_id="1",
+                )
+            )
+            assert patched_send_client.call_args[1]["ttl"] == 2.5
+
+
+def test_chunk_messages(f_config_msg_signer_ok):
+    signer = _chunk_signer(f_config_msg_signer_ok)
+    operation = ContainerSignOperation(
+        digests=[], references=[], signing_key="test-signing-key", task_id="1"
+    )
+    messages = [
+        MsgMessage(headers={}, address="topic://Topic.sign", body={"claim_file": "x" * size})
+        for size in (10, 10, 30, 10, 10)
+    ]
+    messages[4].reply_to = "queue://replies"
+    assert signer._chunk_messages(operation, []) == []
+    assert signer._chunk_messages(operation, messages) == [messages[:4], messages[4:]]
+    signer.chunk_size = 2
+    assert signer._chunk_messages(operation, messages) == [
+        messages[:2],
+        messages[2:4],
+        messages[4:],
+    ]
+    signer.chunk_size = 0
+    signer.chunk_bytes = 80
+    assert signer._chunk_messages(operation, messages) == [
+        messages[:2],
+        messages[2:4],
+        messages[4:],
+    ]
+    # size of the body is estimated from the claim, json is encoded once
+    with patch("pubtools.sign.signers.msgsigner.json.dumps", wraps=json.dumps) as patched_dumps:
+        signer._chunk_messages(operation, messages)
+    assert patched_dumps.call_count == 1
+    signer.chunk_bytes = 10
+    assert signer._chunk_messages(operation, messages) == [[message] for message in messages]
+
+
+def test_chunk_messages_clear_sign(f_config_msg_signer_ok):
+    signer = _chunk_signer(f_config_msg_signer_ok, chunk_bytes=2000)
+    operation = ClearSignOperation(inputs=[], signing_key="test-signing-key", task_id="1")
+    claims = ["plain", 'say "hi"\n' * 20, "žluťoučký kůň\t" * 20, "€" * 50, "x" * 300] * 4
+    messages = [
+        MsgMessage(headers={}, address="topic://Topic.sign", body={"claim_file": claim})
+        for claim in claims
+    ]
+    chunks = signer._chunk_messages(operation, messages)
+    assert [message for chunk in chunks for message in chunk] == messages
+    sizes = [sum(len(json.dumps(message.body)) for message in chunk) for chunk in chunks]
+    assert max(sizes) <= 2000
+    # chunks are filled up, escaped claims are not underestimated nor overestimated
+    for next_chunk, size in zip(chunks[1:], sizes):
+        assert size + len(json.dumps(next_chunk[0].body)) > 2000
+
+
+def test__msg_clearsign_sign_journal(f_msg_signer, f_config_msg_signer_ok):
+    _msg_clear_sign(
+        ["hello world"],
+        signing_key="test-signing-key",
+        task_id="1",
+        config=f_config_msg_signer_ok,
+        resume="journal.db",
+    )
+    assert f_msg_signer.return_value.journal == "journal.db"
+    assert f_msg_signer.return_value.resume is True
+
+
+def test_msg_container_sign_journal(f_msg_signer, f_config_msg_signer_ok, tmp_path):
+    args = [
+        "--signing-key",
+        "test-signing-key",
+        "--digest",
+        "some-digest",
+        "--reference",
+        "some-reference",
+        "--task-id",
+        "1",
+        "--config",
+        f_config_msg_signer_ok,
+        "--journal",
+        str(tmp_path / "journal.db"),
+    ]
+    result = CliRunner().invoke(msg_container_sign, args)
+    assert result.exit_code == 0, result.output
+    assert f_msg_signer.return_value.journal == str(tmp_path / "journal.db")
+    assert f_msg_signer.return_value.resume is False
+
+    result = CliRunner().invoke(msg_container_sign, args + ["--resume", f_config_msg_signer_ok])
+    assert result.exit_code == 2
+    assert "mutually exclusive" in result.output
+
+
+def test_clear_sign_reply_queue(f_config_msg_signer_ok, tmp_path):
+    path = str(tmp_path / "journal.db")
+    signer = _journal_signer(f_config_msg_signer_ok, path)
+    signer.reply_queue = "queue://replies.{task_id}.{session_id}"
+    signer.deterministic_request_id = True
+    with patch("pubtools.sign.signers.msgsigner.SendClient") as patched_send_client:
+        with patch("pubtools.sign.signers.msgsigner.RecvClient") as patched_recv_client:
+            with patch.object(signer, "_session_id", return_value="session"):
+                patched_send_client.return_value.run.return_value = []
+                signer.clear_sign(_journal_operation())
+
+    messages = patched_send_client.call_args[1]["messages"]
+    assert {message.reply_to for message in messages} == {"queue://replies.1.session"}
+    assert [message.correlation_id for message in messages] == [
+        message.body["request_id"] for message in messages
+    ]
+    assert patched_recv_client.call_args[1]["topic"] == "queue://replies.1.session"
+    assert patched_recv_client.call_args[1]["match_correlation_id"] is True
+    assert patched_recv_client.call_args[1]["selector"] is None
+
+    # resumed session listens on the queue of the original session
+    signer.resume = True
+    with patch("pubtools.sign.signers.msgsigner.SendClient"):
+        with patch("pubtools.sign.signers.msgsigner.RecvClient") as patched_recv_client:
+            signer.clear_sign(_journal_operation())
+    assert patched_recv_client.call_args[1]["topic"] == "queue://replies.1.session"
+
+
+def test_clear_sign_reply_queue_retry(f_config_msg_signer_ok):
+    signer = MsgSigner()
+    signer.load_config(load_config(f_config_msg_signer_ok))
+    signer.reply_queue = "queue://replies.{session_id}"
+    signer.chunk_size = 1
+    reply_queues = []
+    for _ in range(2):
+        with patch("pubtools.sign.signers.msgsigner.SendClient") as patched_send_client:
+            with patch("pubtools.sign.signers.msgsigner.RecvClient"):
+                patched_send_client.return_value.run.return_value = []
+                signer.clear_sign(_journal_operation())
+        reply_queues.append(
+            [call[1]["messages"][0].reply_to for call in patched_send_client.call_args_list]
+        )
+    # operation signed again uses the queues of the previous attempt
+    assert reply_queues[0] == reply_queues[1]
+    assert len(set(reply_queues[0])) == len(_journal_operation().inputs)
+    operation = _journal_operation()
+    messages = [MsgMessage(headers={}, address="", body={"claim_file": "claim"})]
+    session_id = signer._session_id(operation, 0, messages)
+    assert signer._session_id(operation, 1, messages) != session_id
+    messages[0].body["claim_file"] = "other"
+    assert signer._session_id(operation, 0, messages) != session_id
+
+
+def test_clear_sign_reply_selector(f_config_msg_signer_ok):
+    signer = MsgSigner()
+    signer.load_config(load_config(f_config_msg_signer_ok))
+    signer.reply_selector = "pub_task_id = '{task_id}'"
+    with patch("pubtools.sign.signers.msgsigner.SendClient") as patched_send_client:
+        with patch("pubtools.sign.signers.msgsigner.RecvClient") as patched_recv_client:
+            patched_send_client.return_value.run.return_value = []
+            signer.clear_sign(_journal_operation())
+    assert patched_recv_client.call_args[1]["selector"] == "pub_task_id = '1'"
+
+
+def test__msg_clearsign_sign_replies(f_msg_signer, f_config_msg_signer_ok):
+    f_msg_signer.return_value.sign.return_value.operation_result.outputs = [
+        MsgReply('{"msg": "signed"}', {"mtype": "test"}),
+        "",
+    ]
+    res = _msg_clear_sign(
+        ["hello world", "hello"],
+        signing_key="test-signing-key",
+        task_id="1",
+        config=f_config_msg_signer_ok,
+    )
+    assert json.loads(json.dumps(res["operation_results"])) == [
+        [{"msg": "signed"}, {"mtype": "test"}],
+        "",
+    ]
+
+
+def test_clear_sign_message_id_header(f_config_msg_signer_ok):
+    signer = MsgSigner()
+    signer.load_config(load_config(f_config_msg_signer_ok))
+    signer.message_id_header = "request_id"
+    with patch("pubtools.sign.signers.msgsigner.SendClient") as patched_send_client:
+        with patch("pubtools.sign.signers.msgsigner.RecvClient") as patched_recv_client:
+            patched_send_client.return_value.run.return_value = []
+            signer.clear_sign(_journal_operation())
+    assert patched_recv_client.call_args[1]["id_header"] == "request_id"
+
+
+def test_clear_sign_compact_results(f_config_msg_signer_ok, tmp_path):
+    path = str(tmp_path / "journal.db")
+    operation = _journal_operation()
+    signer = _journal_signer(f_config_msg_signer_ok, path, resume=True)
+    signer.result_store = "compact"
+    signer.reply_headers = False
+    message_ids = _start_journal(path, signer, operation)
+    with patch("pubtools.sign.signers.msgsigner.SendClient"):
+        with patch("pubtools.sign.signers.msgsigner.RecvClient") as patched_recv_client:
+
+            def _run():
+                patched_recv_client.call_args[1]["recv"][message_ids[1]] = MsgReply(
+                    '{"msg": {"signed_data": "signed 2", "errors": []}}', {"mtype": "test"}
+                )
+
+            patched_recv_client.return_value.run.side_effect = _run
+            res = signer.clear_sign(operation)
+
+    assert res.signer_results.status == "ok"
+    assert res.operation_result.outputs == [
+        SignatureRecord(message_ids[0], "signed 1", [], None),
+        SignatureRecord(message_ids[1], "signed 2", [], None),
+    ]
+
+
+def test_clear_sign_compact_results_errors(f_config_msg_signer_ok):
+    signer = MsgSigner()
+    signer.load_config(load_config(f_config_msg_signer_ok))
+    signer.result_store = "compact"
+    with patch("pubtools.sign.signers.msgsigner.SendClient") as patched_send_client:
+        with patch("pubtools.sign.signers.msgsigner.RecvClient") as patched_recv_client:
+            patched_send_client.return_value.run.return_value = []
+            patched_recv_client.return_value.run.side_effect = _recv_error(patched_recv_client)
+            res = signer.clear_sign(_journal_operation())
+    assert res.signer_results.status == "error"
+    assert res.operation_result.outputs == ["", ""]
+
+
+def test__msg_clearsign_sign_compact_results(f_msg_signer, f_config_msg_signer_ok):
+    f_msg_signer.return_value.sign.return_value.operation_result.outputs = [
+        SignatureRecord("1", "signed", [], {"mtype": "test"})
+    ]
+    res = _msg_clear_sign(
+        ["hello world"], signing_key="test-signing-key", task_id="1", config=f_config_msg_signer_ok
+    )
+    assert res["operation_results"] == [
+        {"request_id": "1", "signature": "signed", "errors": [], "headers": {"mtype": "test"}}
+    ]
+
+
+def test_clear_sign_disk_results(f_config_msg_signer_ok, tmp_path):
+    signer = MsgSigner()
+    signer.load_config(load_config(f_config_msg_signer_ok))
+    signer.result_store = "disk"
+    signer.result_store_dir = str(tmp_path)
+    with patch("pubtools.sign.signers.msgsigner.SendClient") as patched_send_client:
+        with patch("pubtools.sign.signers.msgsigner.RecvClient") as patched_recv_client:
+            patched_send_client.return_value.run.return_value = []
+
+            def _run():
+                recv = patched_recv_client.call_args[1]["recv"]
+                recv[patched_recv_client.call_args[1]["message_ids"][1]] = MsgReply(
+                    '{"msg": {"signed_data": "signed 2", "errors": []}}', {"mtype": "test"}
+                )
+
+            patched_recv_client.return_value.run.side_effect = _run
+            res = signer.clear_sign(_journal_operation())
+
+    outputs = res.operation_result.outputs
+    assert isinstance(outputs, DiskStore)
+    assert outputs[0] == ""
+    assert outputs[1].signature == "signed 2"
+    assert outputs[1].headers == {"mtype": "test"}
+    outputs.close()
+
+
+def test_container_sign_lookaside(f_config_msg_signer_ok, tmp_path):
+    signer = MsgSigner()
+    signer.load_config(load_config(f_config_msg_signer_ok))
+    signer.lookaside_root = str(tmp_path)
+    operation = ContainerSignOperation(
+        task_id="1",
+        digests=["sha256:abcd", "sha256:efgh"],
+        references=["registry.example.com/ns/repo:1", "registry.example.com/ns/repo:2"],
+        signing_key="test-signing-key",
+    )
+    with patch("pubtools.sign.signers.msgsigner.SendClient") as patched_send_client:
+        with patch("pubtools.sign.signers.msgsigner.RecvClient") as patched_recv_client:
+            patched_send_client.return_value.run.return_value = []
+
+            def _run():
+                recv = patched_recv_client.call_args[1]["recv"]
+                recv[patched_recv_client.call_args[1]["message_ids"][0]] = MsgReply(
+                    '{"msg": {"signed_claim": "c2lnbmF0dXJl", "errors": []}}', {}
+                )
+                patched_recv_client.call_args[1]["errors"].append(
+                    MsgError(name="MessagingTimeout", description="timeout", source=None)
+                )
+
+            patched_recv_client.return_value.run.side_effect = _run
+            res = signer.container_sign(operation)
+
+    assert res.signer_results.status == "error"
+    signed_claims = res.operation_result.signed_claims
+    assert signed_claims[0] == str(tmp_path / "ns/repo@sha256=abcd/signature-1")
+    assert (tmp_path / "ns/repo@sha256=abcd/signature-1").read_bytes() == b"signature"
+    assert signed_claims.summary()["missing"] == 1
+
+
+def test_msg_container_sign_lookaside(f_msg_signer, f_config_msg_signer_ok, tmp_path):
+    args = [
+        "--signing-key",
+        "test-signing-key",
+        "--digest",
+        "sha256:abcd",
+        "--reference",
+        "registry.example.com/ns/repo:1",
+        "--task-id",
+        "1",
+        "--config",
+        f_config_msg_signer_ok,
+        "--lookaside-root",
+        str(tmp_path),
+    ]
+    store = LookasideStore(
+        ["1"], ["registry.example.com/ns/repo:1"], ["sha256:abcd"], str(tmp_path)
+    )
+    f_msg_signer.return_value.sign.return_value.operation_result.signed_claims = store
+    res = msg_container_sign.callback(
+        signing_key="test-signing-key",
+        task_id="1",
+        config=f_config_msg_signer_ok,
+        digest=("sha256:abcd",),
+        reference=("registry.example.com/ns/repo:1",),
+        lookaside_root=str(tmp_path),
+        lookaside_workers=2,
+    )
+    assert res["lookaside"] == store.summary()
+    assert "operation_results" not in res
+    assert f_msg_signer.return_value.lookaside_workers == 2
+
+    # signing failed before any reply was received
+    f_msg_signer.return_value.sign.return_value.operation_result.signed_claims = [""]
+    f_msg_signer.return_value.sign.return_value.signer_results.shards = None
+    result = CliRunner().invoke(msg_container_sign, args)
+    assert result.exit_code == 0, result.output
+    res = msg_container_sign.callback(
+        signing_key="test-signing-key",
+        task_id="1",
+        config=f_config_msg_signer_ok,
+        digest=("sha256:abcd",),
+        reference=("registry.example.com/ns/repo:1",),
+        lookaside_root=str(tmp_path),
+    )
+    assert res["lookaside"] == empty_summary(str(tmp_path), 1)
+
+
+def _shard_clear_sign(signer, operation):
+    failed = "fail" in operation.inputs
+    return SigningResults(
+        signer=signer,
+        operation=operation,
+        signer_results=MsgSignerResults(
+            status="error" if failed else "ok",
+            error_message=f"{operation.inputs[0]} failed\n" if failed else "",
+            resent=1,
+        ),
+        operation_result=ClearSignResult(
+            signing_key=operation.signing_key,
+            outputs=[
+                f"{signer.messaging_brokers[0]} {signer.journal} {x}" for x in operation.inputs
+            ],
+        ),
+    )
+
+
+def _shard_container_sign(signer, operation):
+    return SigningResults(
+        signer=signer,
+        operation=operation,
+        signer_results=MsgSignerResults(status="ok", error_message=""),
+        operation_result=ContainerSignResult(
+            signing_key=operation.signing_key,
+            signed_claims=[f"{signer.shards} {x}" for x in operation.references],
+        ),
+    )
+
+
+def test_split_operation():
+    operation = ClearSignOperation(
+        inputs=["1", "2", "3", "4", "5"], signing_key="test-signing-key", task_id="1"
+    )
+    assert [op.inputs for op in _split_operation(operation, 2)] == [["1", "2"], ["3", "4", "5"]]
+    assert [op.inputs for op in _split_operation(operation, 8)] == [
+        ["1"],
+        ["2"],
+        ["3"],
+        ["4"],
+        ["5"],
+    ]
+    operation = ContainerSignOperation(
+        digests=["d1", "d2", "d3"],
+        references=["r1", "r2", "r3"],
+        signing_key="test-signing-key",
+        task_id="1",
+    )
+    shard_operations = _split_operation(operation, 2)
+    assert [(op.digests, op.references) for op in shard_operations] == [
+        (["d1"], ["r1"]),
+        (["d2", "d3"], ["r2", "r3"]),
+    ]
+    assert all(op.signing_key == "test-signing-key" for op in shard_operations)
+    with pytest.raises(ValueError):
+        _split_operation(
+            ContainerSignOperation(
+                digests=["d1"], references=[], signing_key="test-signing-key", task_id="1"
+            ),
+            2,
+        )
+
+
+def test_shard_signer_pinned_health(f_config_msg_signer_ok, tmp_path):
+    signer = MsgSigner()
+    signer.load_config(load_config(f_config_msg_signer_ok))
+    signer.pin_brokers = True
+    signer.state_dir = str(tmp_path)
+    with state_file(signer.state_dir, "brokers").update() as scores:
+        scores["amqps://broker-01:5671"] = {"connect": 0.1, "rtt": 0.1}
+        scores["amqps://broker-02:5671"] = {"connect": 1.0, "rtt": 1.0}
+    event = Mock()
+    urls = []
+    for shard in range(2):
+        shard_signer = signer._shard_signer(shard)
+        client = _SendClient(
+            [], shard_signer.messaging_brokers, "", "", [], health=shard_signer._broker_health()
+        )
+        client._connect(event)
+        urls.append(event.container.connect.call_args[1]["urls"])
+    # slower broker keeps its shard, the faster one is not used by all shards
+    assert urls == [
+        ["amqps://broker-01:5671", "amqps://broker-02:5671"],
+        ["amqps://broker-02:5671", "amqps://broker-01:5671"],
+    ]
+
+
+def test_clear_sign_sharded(f_config_msg_signer_ok, tmp_path):
+    path = str(tmp_path / "journal.db")
+    signer = MsgSigner()
+    signer.load_config(load_config(f_config_msg_signer_ok))
+    signer.shards = 3
+    signer.pin_brokers = True
+    signer.journal = path
+    operation = ClearSignOperation(
+        inputs=["1", "fail", "3", "4", "5", "6"], signing_key="test-signing-key", task_id="1"
+    )
+    with patch(
+        "pubtools.sign.signers.msgsigner.MsgSigner.clear_sign",
+        autospec=True,
+        side_effect=_shard_clear_sign,
+    ):
+        res = signer.sign(operation)
+
+    assert res.operation_result.outputs == [
+        f"amqps://broker-01:5671 {path}.0 1",
+        f"amqps://broker-01:5671 {path}.0 fail",
+        f"amqps://broker-02:5671 {path}.1 3",
+        f"amqps://broker-02:5671 {path}.1 4",
+        f"amqps://broker-01:5671 {path}.2 5",
+        f"amqps://broker-01:5671 {path}.2 6",
+    ]
+    assert res.operation_result.signing_key == "test-signing-key"
+    assert res.signer_results.status == "error"
+    assert res.signer_results.error_message == "1 failed\n"
+    assert res.signer_results.resent == 3
+    shards = res.signer_results.shards
+    assert [(s["shard"], s["size"], s["broker"], s["status"]) for s in shards] == [
+        (0, 2, "amqps://broker-01:5671", "error"),
+        (1, 2, "amqps://broker-02:5671", "ok"),
+        (2, 2, "amqps://broker-01:5671", "ok"),
+    ]
+    assert all(s["duration"] >= 0 and s["throughput"] >= 0 for s in shards)
+    # the signer itself is not modified
+    assert signer.journal == path
+    assert signer.messaging_brokers == ["amqps://broker-01:5671", "amqps://broker-02:5671"]
+
+
+def _resume_clear_sign(signer, operation):
+    journal = Journal(signer.journal)
+    if signer.resume:
+        journal.check_operation(operation)
+    else:
+        journal.start(operation, [])
+    journal.close()
+    return SigningResults(
+        signer=signer,
+        operation=operation,
+        signer_results=MsgSignerResults(status="ok", error_message=""),
+        operation_result=ClearSignResult(
+            signing_key=operation.signing_key,
+            outputs=[f"{signer.journal} {signer.resume} {x}" for x in operation.inputs],
+        ),
+    )
+
+
+def test_clear_sign_sharded_resume(f_config_msg_signer_ok, tmp_path):
+    path = str(tmp_path / "journal.db")
+    operation = ClearSignOperation(
+        inputs=["1", "2", "3", "4"], signing_key="test-signing-key", task_id="1"
+    )
+    with patch(
+        "pubtools.sign.signers.msgsigner.MsgSigner.clear_sign",
+        autospec=True,
+        side_effect=_resume_clear_sign,
+    ):
+        signer = _journal_signer(f_config_msg_signer_ok, path)
+        signer.shards = 2
+        assert signer.sign(operation).operation_result.outputs == [
+            f"{path}.0 False 1",
+            f"{path}.0 False 2",
+            f"{path}.1 False 3",
+            f"{path}.1 False 4",
+        ]
+        with pytest.raises(ValueError, match="already contains an operation"):
+            signer.sign(operation)
+
+        # shards of the journal are resumed regardless of shards of the signer
+        for shards in (1, 3):
+            signer = _journal_signer(f_config_msg_signer_ok, path, resume=True)
+            signer.shards = shards
+            assert signer.sign(operation).operation_result.outputs == [
+                f"{path}.0 True 1",
+                f"{path}.0 True 2",
+                f"{path}.1 True 3",
+                f"{path}.1 True 4",
+            ]
+
+        # journal of an operation which wasn't split is resumed without shards
+        path = str(tmp_path / "unsharded.db")
+        signer = _journal_signer(f_config_msg_signer_ok, path)
+        signer.sign(operation)
+        signer = _journal_signer(f_config_msg_signer_ok, path, resume=True)
+        signer.shards = 2
+        assert signer.sign(operation).operation_result.outputs == [
+            f"{path} True {x}" for x in operation.inputs
+        ]
+
+        # operation clamped to one shard is resumed from its shard journal
+        path = str(tmp_path / "one-shard.db")
+        single = ClearSignOperation(inputs=["1"], signing_key="test-signing-key", task_id="1")
+        signer = _journal_signer(f_config_msg_signer_ok, path)
+        signer.shards = 4
+        assert signer.sign(single).operation_result.outputs == [f"{path}.0 False 1"]
+        signer = _journal_signer(f_config_msg_signer_ok, path, resume=True)
+        assert signer.sign(single).operation_result.outputs == [f"{path}.0 True 1"]
+
+
+def test_container_sign_sharded(f_config_msg_signer_ok):
+    signer = MsgSigner()
+    signer.load_config(load_config(f_config_msg_signer_ok))
+    signer.shards = 2
+    operation = ContainerSignOperation(
+        digests=["d1", "d2", "d3"],
+        references=["r1", "r2", "r3"],
+        signing_key="test-signing-key",
+        task_id="1",
+    )
+    with patch(
+        "pubtools.sign.signers.msgsigner.MsgSigner.container_sign",
+        autospec=True,
+        side_effect=_shard_container_sign,
+    ):
+        res = signer.sign(operation)
+
+    assert res.operation_result.signed_claims == ["1 r1", "1 r2", "1 r3"]
+    assert res.signer_results.status == "ok"
+    assert [s["broker"] for s in res.signer_results.shards] == ["amqps://broker-01:5671"] * 2
+
+
+def test_sign_shard_stores(f_config_msg_signer_ok, tmp_path):
+    signer = MsgSigner()
+    signer.load_config(load_config(f_config_msg_signer_ok))
+    operation = ContainerSignOperation(
+        digests=["sha256:abcd"],
+        references=["registry.example.com/ns/repo:1"],
+        signing_key="test-signing-key",
+        task_id="1",
+    )
+    store = LookasideStore(
+        ["1"], ["registry.example.com/ns/repo:1"], ["sha256:abcd"], str(tmp_path)
+    )
+    store.flush()
+    with patch("pubtools.sign.signers.msgsigner.MsgSigner.container_sign") as patched_sign:
+        patched_sign.return_value.signer_results = MsgSignerResults(status="ok", error_message="")
+        patched_sign.return_value.operation_result.signed_claims = store
+        with patch("time.monotonic", return_value=1.0):
+            signer_results, outputs, stats = _sign_shard(signer, 1, operation)
+    assert outputs == [""]
+    assert stats["throughput"] == 0.0
+    assert stats["lookaside"] == store.summary()
+
+    store = DiskStore(["1"], directory=str(tmp_path))
+    store["1"] = ({"msg": {"signed_data": "signed"}}, {})
+    with patch("pubtools.sign.signers.msgsigner.MsgSigner.clear_sign") as patched_sign:
+        patched_sign.return_value.signer_results = MsgSignerResults(status="ok", error_message="")
+        patched_sign.return_value.operation_result.outputs = store
+        signer_results, outputs, stats = _sign_shard(
+            signer,
+            0,
+            ClearSignOperation(inputs=["data"], signing_key="test-signing-key", task_id="1"),
+        )
+    # records of disk store are handed over in a file
+    assert isinstance(outputs, DetachedStore)
+    assert store.file.closed
+    assert DiskStore.attach(outputs) == [SignatureRecord("1", "signed", [], {})]
+    assert "lookaside" not in stats
+
+
+def _disk_clear_sign(signer, operation):
+    store = DiskStore(operation.inputs, directory=signer.result_store_dir)
+    for data in operation.inputs:
+        store[data] = ({"msg": {"signed_data": f"signed {data}"}}, {})
+    return SigningResults(
+        signer=signer,
+        operation=operation,
+        signer_results=MsgSignerResults(status="ok", error_message=""),
+        operation_result=ClearSignResult(signing_key=operation.signing_key, outputs=store),
+    )
+
+
+def test_clear_sign_sharded_disk_store(f_config_msg_signer_ok, tmp_path):
+    signer = MsgSigner()
+    signer.load_config(load_config(f_config_msg_signer_ok))
+    signer.shards = 2
+    signer.result_store_dir = str(tmp_path)
+    operation = ClearSignOperation(
+        inputs=["1", "2", "3"], signing_key="test-signing-key", task_id="1"
+    )
+    with patch(
+        "pubtools.sign.signers.msgsigner.MsgSigner.clear_sign",
+        autospec=True,
+        side_effect=_disk_clear_sign,
+    ):
+        outputs = signer.sign(operation).operation_result.outputs
+    # records of the shards stay on disk
+    assert isinstance(outputs, ChainedStore)
+    assert outputs == [SignatureRecord(x, f"signed {x}", [], {}) for x in operation.inputs]
+    outputs.close()
+    assert os.listdir(tmp_path) == []
+
+
+def test_msg_sign_shards_option(f_msg_signer, f_config_msg_signer_ok, tmp_path):
+    result = CliRunner().invoke(
+        msg_clear_sign,
+        [
+            "--signing-key",
+            "test-signing-key",
+            "--task-id",
+            "1",
+            "--config",
+            f_config_msg_signer_ok,
+            "--shards",
+            "4",
+            "hello",
+        ],
+    )
+    assert result.exit_code == 0, result.output
+    assert f_msg_signer.return_value.shards == 4
+
+    summary = dict(empty_summary(str(tmp_path), 2), written=1, missing=1, failures=[])
+    f_msg_signer.return_value.sign.return_value.operation_result.signed_claims = ["path", ""]
+    f_msg_signer.return_value.sign.return_value.signer_results.shards = [
+        {"shard": 0, "lookaside": dict(summary, failures=["r1: failed"], failed=1, missing=0)},
+        {"shard": 1, "lookaside": summary},
+    ]
+    res = msg_container_sign.callback(
+        signing_key="test-signing-key",
+        task_id="1",
+        config=f_config_msg_signer_ok,
+        digest=("sha256:abcd", "sha256:efgh"),
+        reference=("registry.example.com/ns/repo:1", "registry.example.com/ns/repo:2"),
+        lookaside_root=str(tmp_path),
+        shards=2,
+    )
+    assert f_msg_signer.return_value.shards == 2
+    assert res["lookaside"] == {
+        "written": 2,
+        "existing": 0,
+        "failed": 1,
+        "root": str(tmp_path),
+        "missing": 1,
+        "failures": ["r1: failed"],
+    }
+
+
+def test_clear_sign_broker_health(f_config_msg_signer_ok, tmp_path):
+    signer = MsgSigner()
+    signer.load_config(load_config(f_config_msg_signer_ok))
+    signer.state_dir = str(tmp_path)
+    with patch("pubtools.sign.signers.msgsigner.SendClient") as patched_send_client:
+        with patch("pubtools.sign.signers.msgsigner.RecvClient") as patched_recv_client:
+            patched_send_client.return_value.run.return_value = []
+            patched_recv_client.return_value.recv = {}
+
+            def _run():
+                patched_send_client.call_args[1]["health"].record_failure("amqps://broker-01:5671")
+
+            patched_recv_client.return_value.run.side_effect = _run
+            signer.clear_sign(_journal_operation())
+
+    health = patched_send_client.call_args[1]["health"]
+    assert isinstance(health, BrokerHealth)
+    assert patched_recv_client.call_args[1]["health"] is health
+    assert health.state.path == str(tmp_path / "brokers.json")
+    assert health.state.load()["amqps://broker-01:5671"]["failures"] == 1
+
+
+def test_clear_sign_circuit_breaker(f_config_msg_signer_ok, tmp_path):
+    signer = MsgSigner()
+    signer.load_config(load_config(f_config_msg_signer_ok))
+    with patch("pubtools.sign.signers.msgsigner.SendClient") as patched_send_client:
+        with patch("pubtools.sign.signers.msgsigner.RecvClient") as patched_recv_client:
+            patched_send_client.return_value.run.return_value = []
+            patched_recv_client.return_value.recv = {}
+            signer.clear_sign(_journal_operation())
+            assert patched_send_client.call_args[1]["breaker"] is None
+
+            signer.state_dir = str(tmp_path)
+            signer.circuit_threshold = 3
+            signer.circuit_reset_timeout = 10
+            signer.clear_sign(_journal_operation())
+
+    breaker = patched_send_client.call_args[1]["breaker"]
+    assert isinstance(breaker, CircuitBreaker)
+    assert patched_recv_client.call_args[1]["breaker"] is breaker
+    assert breaker.state.path == str(tmp_path / "circuits.json")
+    assert (breaker.threshold, breaker.reset_timeout) == (3, 10)
+
+
+def test_clear_sign_heartbeat(f_config_msg_signer_ok):
+    signer = MsgSigner()
+    signer.load_config(load_config(f_config_msg_signer_ok))
+    signer.heartbeat = 10
+    signer.connect_timeout = 5
+    with patch("pubtools.sign.signers.msgsigner.SendClient") as patched_send_client:
+        with patch("pubtools.sign.signers.msgsigner.RecvClient") as patched_recv_client:
+            patched_send_client.return_value.run.return_value = []
+            patched_recv_client.return_value.recv = {}
+            signer.clear_sign(_journal_operation())
+
+    for patched_client in (patched_send_client, patched_recv_client):
+        assert patched_client.call_args[1]["heartbeat"] == 10
+        assert patched_client.call_args[1]["connect_timeout"] == 5
+
+
+def test_get_cert_subject_cn_cached(f_config_msg_signer_ok, f_client_certificate, caplog):
+    signer = MsgSigner()
+    signer.load_config(load_config(f_config_msg_signer_ok))
+    assert signer.creator == "pubtools-sign-test"
+    assert "expired at 2025-08-27 12:44:05" in caplog.text
+    with patch("OpenSSL.crypto.load_certificate") as patched_load_certificate:
+        assert signer._get_cert_subject_cn() == "pubtools-sign-test"
+    patched_load_certificate.assert_not_called()
+
+
+def test_random_request_ids():
+    ids = _random_request_ids(1000)
+    assert len(set(ids)) == 1000
+    for request_id in ids:
+        parsed = uuid.UUID(request_id)
+        assert str(parsed) == request_id
+        assert parsed.version == 4
+        assert parsed.variant == uuid.RFC_4122
+    assert _random_request_ids(0) == []
+
+
+def test_message_factory(f_config_msg_signer_ok):
+    signer = MsgSigner()
+    signer.load_config(load_config(f_config_msg_signer_ok))
+    operation = ClearSignOperation(
+        inputs=["hello", "world", "hello"], signing_key="test-signing-key", task_id="1"
+    )
+    factory = _MessageFactory(signer, operation, "clearsig_signature", extra_attrs={"extra": "1"})
+    with patch("pubtools.sign.signers.msgsigner.isodate_now", return_value="created-date-Z"):
+        messages = factory.create(operation.inputs)
+    assert messages[0] == MsgMessage(
+        headers=signer._construct_headers("clearsig_signature", extra_attrs={"extra": "1"}),
+        address="topic://Topic.sign",
+        body={
+            "sig_key_id": "test-signing-key",
+            "claim_file": "hello",
+            "request_id": messages[0].body["request_id"],
+            "created": "created-date-Z",
+            "requested_by": "pubtools-sign-test",
+            "extra": "1",
+        },
+    )
+    assert all(message.headers is messages[0].headers for message in messages)
+    assert len({message.body["request_id"] for message in messages}) == 3
+
+    signer.deterministic_request_id = True
+    assert [message.body["request_id"] for message in factory.create(operation.inputs)] == [
+        signer._request_id("hello", operation, 0),
+        signer._request_id("world", operation, 0),
+        signer._request_id("hello", operation, 1),
+    ]
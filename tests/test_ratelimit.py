@@ -0,0 +1,37 @@
+from unittest.mock import patch
+
+import pytest
+
+from pubtools.sign.clients.ratelimit import RateLimiter
+from pubtools.sign.state import StateFile
+
+
+def _limiter(tmp_path, rates):
+    return RateLimiter(StateFile(str(tmp_path / "ratelimits.json")), rates)
+
+
+def test_rate_limiter_acquire(tmp_path):
+    limiter = _limiter(tmp_path, {"environment:prod": 10, "key:prod:key": 4})
+    with patch("time.time", return_value=1000.0):
+        assert limiter.acquire(3) == (3, 0)
+        assert limiter.acquire(3) == (1, 0)
+        granted, wait = limiter.acquire(3)
+        assert granted == 0
+        assert wait == pytest.approx(0.25)
+    with patch("time.time", return_value=1000.5):
+        assert limiter.acquire(3) == (2, 0)
+    assert limiter.state.load() == {
+        "environment:prod": {"tokens": pytest.approx(8.0), "updated": 1000.5},
+        "key:prod:key": {"tokens": pytest.approx(0.0), "updated": 1000.5},
+    }
+    # buckets are refilled up to one second worth of requests
+    with patch("time.time", return_value=2000.0):
+        assert limiter.acquire(100) == (4, 0)
+
+
+def test_rate_limiter_shared(tmp_path):
+    slow = _limiter(tmp_path, {"environment:prod": 0.5})
+    other = _limiter(tmp_path, {"environment:prod": 0.5})
+    with patch("time.time", return_value=1000.0):
+        assert slow.acquire(5) == (1, 0)
+        assert other.acquire(5) == (0, 2.0)
@@ -1,7 +1,13 @@
+import os
+
+import pytest
+
 from pubtools.sign.signers.msgsigner import (
     ContainerSignResult,
     ClearSignResult,
 )
+from pubtools.sign.models.msg import MsgReply
+from pubtools.sign.results.store import ChainedStore, CompactStore, DiskStore, SignatureRecord
 
 
 def test_containeroperation_result_to_dict():
@@ -16,3 +22,83 @@ def test_clearoperation_result_to_dict():
         "outputs": ["test"],
         "signing_key": "signing_key",
     }
+
+
+def test_signature_record():
+    reply = MsgReply('{"msg": {"signed_claim": "claim", "errors": ["e"]}}', {"mtype": "test"})
+    record = SignatureRecord.from_reply("1", reply)
+    assert record.to_dict() == {
+        "request_id": "1",
+        "signature": "claim",
+        "errors": ["e"],
+        "headers": {"mtype": "test"},
+    }
+    assert record == SignatureRecord("1", "claim", ["e"], {"mtype": "test"})
+    assert record != "claim"
+    assert repr(record).startswith("SignatureRecord({'request_id': '1'")
+    assert not hasattr(record, "__dict__")
+
+    record = SignatureRecord.from_reply("1", ({"msg": {"signed_data": "data"}}, {}), False)
+    assert record == SignatureRecord("1", "data", [], None)
+
+
+def test_compact_store():
+    store = CompactStore(["a", "b", "c"], keep_headers=False)
+    store["c"] = ({"msg": {"signed_claim": "claim-c", "errors": []}}, {"mtype": "test"})
+    assert len(store) == 3
+    assert store == ["", "", SignatureRecord("c", "claim-c", [], None)]
+    assert store[2].headers is None
+    assert list(store)[:2] == ["", ""]
+    assert store != "abc"
+    assert store.__eq__(1) is NotImplemented
+
+
+def test_disk_store(tmp_path):
+    store = DiskStore(["a", "b", "c"], directory=str(tmp_path))
+    store["b"] = ({"msg": {"signed_claim": "claim-b"}}, {"mtype": "test"})
+    store["a"] = ({"msg": {"signed_claim": "claim-a"}}, {"mtype": "test"})
+    store["b"] = ({"msg": {"signed_claim": "claim-b2"}}, {"mtype": "test"})
+    assert len(store) == 3
+    assert store[0] == SignatureRecord("a", "claim-a", [], {"mtype": "test"})
+    assert store[-2] == SignatureRecord("b", "claim-b2", [], {"mtype": "test"})
+    assert store[2] == ""
+    assert store[1:] == [SignatureRecord("b", "claim-b2", [], {"mtype": "test"}), ""]
+    with pytest.raises(IndexError):
+        store[3]
+    # records are appended, only offsets are kept in memory
+    assert list(store.offsets) == [store.offsets[0], store.offsets[1], -1]
+    assert store.offsets[1] > store.offsets[0]
+    store.close()
+
+
+def test_disk_store_detach(tmp_path):
+    store = DiskStore(["a", "b"], directory=str(tmp_path))
+    store["b"] = ({"msg": {"signed_claim": "claim-b"}}, {"mtype": "test"})
+    detached = store.detach()
+    assert store.file.closed
+    assert os.path.dirname(detached.path) == str(tmp_path)
+    attached = DiskStore.attach(detached)
+    # file is removed once it's attached
+    assert os.listdir(tmp_path) == []
+    assert attached == ["", SignatureRecord("b", "claim-b", [], {"mtype": "test"})]
+    attached.close()
+
+
+def test_chained_store(tmp_path):
+    stores = [DiskStore(["a"], directory=str(tmp_path)), DiskStore(["b", "c"])]
+    stores[0]["a"] = ({"msg": {"signed_claim": "claim-a"}}, {})
+    stores[1]["c"] = ({"msg": {"signed_claim": "claim-c"}}, {})
+    store = ChainedStore(stores)
+    records = [SignatureRecord("a", "claim-a", [], {}), "", SignatureRecord("c", "claim-c", [], {})]
+    assert len(store) == 3
+    assert store == records
+    assert [store[x] for x in range(3)] == records
+    assert store[-1] == records[2]
+    assert store[1:] == records[1:]
+    with pytest.raises(IndexError):
+        store[3]
+    assert store != "abc"
+    assert store.__eq__(1) is NotImplemented
+    store.close()
+    assert all(x.file.closed for x in stores)
+    assert len(ChainedStore([])) == 0
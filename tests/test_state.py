@@ -0,0 +1,27 @@
+import os
+
+from pubtools.sign.state import StateFile, state_file
+
+
+def test_state_file_update(tmp_path):
+    state = StateFile(str(tmp_path / "state" / "test.json"))
+    assert state.load() == {}
+    with state.update() as data:
+        data["key"] = {"value": 1}
+    with state.update() as data:
+        data["other"] = 2
+    assert state.load() == {"key": {"value": 1}, "other": 2}
+    assert sorted(os.listdir(tmp_path / "state")) == ["test.json", "test.json.lock"]
+
+
+def test_state_file_corrupted(tmp_path):
+    path = tmp_path / "test.json"
+    path.write_text("{not a json")
+    assert StateFile(str(path)).load() == {}
+    path.write_text("[1, 2]")
+    assert StateFile(str(path)).load() == {}
+
+
+def test_state_file_name(tmp_path, monkeypatch):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    assert state_file("~/state", "brokers").path == str(tmp_path / "state" / "brokers.json")
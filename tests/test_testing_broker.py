@@ -0,0 +1,52 @@
+import socket
+import time
+from threading import Thread
+from unittest.mock import Mock
+
+from proton import Message
+from proton.reactor import Container
+from proton.utils import BlockingConnection
+
+from pubtools.sign.testing.broker import Broker
+
+
+def test_broker_queues_and_dynamic_receivers():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(("", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    broker = Broker(f"localhost:{port}")
+    Thread(target=Container(broker).run, args=(), daemon=True).start()
+    time.sleep(0.5)
+
+    conn = BlockingConnection(f"localhost:{port}")
+    sender = conn.create_sender(None)
+    sender.send(Message(address="queue://stored", body="stored"))
+    receiver = conn.create_receiver("queue://stored")
+    assert receiver.receive(timeout=5).body == "stored"
+    receiver.accept()
+    receiver.close()
+
+    dynamic = conn.create_receiver(None, dynamic=True)
+    address = dynamic.link.remote_source.address
+    assert address in broker.queues
+    named_sender = conn.create_sender(address)
+    named_sender.send(Message(body="dynamic"))
+    assert dynamic.receive(timeout=5).body == "dynamic"
+    dynamic.accept()
+    dynamic.close()
+    assert address not in broker.queues
+
+    conn.close()
+
+
+def test_broker_disconnected_consumers():
+    broker = Broker("localhost:0")
+    link = Mock(is_sender=True)
+    link.source.address = "queue://abandoned"
+    link.next.return_value = None
+    broker._queue("queue://abandoned").subscribe(link)
+    event = Mock()
+    event.connection.link_head.return_value = link
+    broker.on_disconnected(event)
+    assert broker.queues == {}